@@ -1,303 +1,942 @@
-import os
-import re
-import pandas as pd
-from datetime import datetime
-from typing import Optional
-
-from fastapi import FastAPI, Depends
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
-from fastapi.openapi.utils import get_openapi
-
-from app.utils.logger import info, error
-from app.services.db_service import db_connect, get_um_pendente, mark_finalizado
-from app.services.playwright_service import baixar_excel_por_id
-from app.services.data_service import tratar_df, inserir_mysql
-from app.api.logs import router as logs_router
-from app.auth.dependencies import get_current_user
-
-
-# ============================================================
-# MODELOS DE RESPOSTA
-# ============================================================
-
-class StatusResponse(BaseModel):
-    status: str
-    msg: str
-    db: Optional[str] = None
-    pendentes: Optional[int] = None
-    ultimo_processamento: Optional[str] = None
-
-
-class ProcessarResponse(BaseModel):
-    status: str
-    id: int | None = None
-    titulo: str | None = None
-    arquivo: str | None = None
-    meta: dict | None = None
-    insercao: dict | None = None
-    detalhe: str | None = None
-    etapa: str | None = None
-    observacao: str | None = None
-    tentativas: int | None = None
-    tentativas_limite: bool | None = None
-
-
-# ============================================================
-# APP CONFIG
-# ============================================================
-
-app = FastAPI(
-    title="Relatório CLT API",
-    version="1.2.0",
-    description="API para automação de relatórios CLT da ConectPromotora.",
-    license_info={"name": "Uso interno - GS Consig"}
-)
-
-app.include_router(logs_router)
-
-
-# ============================================================
-# PROTEGENDO DOCS COM LOGIN
-# ============================================================
-
-@app.get("/docs", include_in_schema=False)
-async def custom_swagger_ui(user=Depends(get_current_user)):
-    return get_swagger_ui_html(openapi_url=app.openapi_url, title=app.title + " - Docs")
-
-
-@app.get("/redoc", include_in_schema=False)
-async def custom_redoc(user=Depends(get_current_user)):
-    return get_redoc_html(openapi_url=app.openapi_url, title=app.title + " - ReDoc")
-
-
-@app.get("/openapi.json", include_in_schema=False)
-async def custom_openapi(user=Depends(get_current_user)):
-    return get_openapi(title=app.title, version=app.version, routes=app.routes)
-
-
-# ============================================================
-# ENDPOINTS (TODOS EXIGEM LOGIN)
-# ============================================================
-
-@app.get("/", tags=["Status"], response_model=StatusResponse)
-@app.get("/status", tags=["Status"], response_model=StatusResponse)
-def root(user=Depends(get_current_user)):
-    """Verifica se a API está rodando + status básico do DB"""
-    try:
-        conn = db_connect()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM controle_consultas WHERE status IS NULL OR status NOT IN ('FINALIZADO','Finalizado')")
-        pendentes = cur.fetchone()[0]
-        cur.execute("SELECT MAX(data_criacao) FROM controle_consultas WHERE status='FINALIZADO'")
-        ultimo = cur.fetchone()[0]
-        cur.close(); conn.close()
-        return {
-            "status": "ok",
-            "msg": "Relatório CLT API em execução 🚀",
-            "db": "conectado",
-            "pendentes": pendentes,
-            "ultimo_processamento": str(ultimo) if ultimo else None
-        }
-    except Exception as e:
-        return {"status": "erro", "msg": f"Falha ao conectar DB: {e}", "db": "falha"}
-
-
-@app.get("/pendentes", tags=["Consultas"])
-def listar_pendentes(user=Depends(get_current_user)):
-    """Lista registros pendentes de processamento"""
-    conn = db_connect()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT id, titulo_consulta, banco, quantidade, data_criacao
-        FROM controle_consultas
-        WHERE status IS NULL OR status NOT IN ('FINALIZADO','Finalizado')
-        ORDER BY id DESC
-    """)
-    rows = cur.fetchall()
-    cur.close(); conn.close()
-    return {"total": len(rows), "registros": rows}
-
-
-@app.post("/processar", tags=["Processamento"], response_model=ProcessarResponse)
-async def processar(user=Depends(get_current_user)):
-    """Processa o **próximo pendente** encontrado"""
-    conn = db_connect()
-    pendente = get_um_pendente(conn)
-    if not pendente:
-        return {"status": "sem_pendentes", "msg": "Nenhum registro pendente encontrado."}
-    return await _executar_fluxo(conn, pendente)
-
-
-@app.post("/processar/{row_id}", tags=["Processamento"], response_model=ProcessarResponse)
-async def processar_por_id(row_id: int, user=Depends(get_current_user)):
-    """Processa um **registro específico** pelo ID"""
-    conn = db_connect()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM controle_consultas WHERE id=%s", (row_id,))
-    pendente = cur.fetchone()
-    cur.close()
-    if not pendente:
-        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
-    return await _executar_fluxo(conn, pendente)
-
-
-@app.get("/historico", tags=["Consultas"])
-def historico(user=Depends(get_current_user)):
-    """Lista registros já finalizados"""
-    conn = db_connect()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("""
-        SELECT id, titulo_consulta, banco, quantidade, data_criacao, status, observacao
-        FROM controle_consultas
-        WHERE status IN ('FINALIZADO','Finalizado')
-        ORDER BY data_criacao DESC
-        LIMIT 50
-    """)
-    rows = cur.fetchall()
-    cur.close(); conn.close()
-    return {"total": len(rows), "historico": rows}
-
-
-@app.post("/reprocessar/{row_id}", tags=["Processamento"], response_model=ProcessarResponse)
-async def reprocessar(row_id: int, user=Depends(get_current_user)):
-    """Reprocessa manualmente um registro específico"""
-    conn = db_connect()
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM controle_consultas WHERE id=%s", (row_id,))
-    pendente = cur.fetchone()
-    cur.close()
-    if not pendente:
-        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
-    return await _executar_fluxo(conn, pendente, reprocessar=True)
-
-
-@app.get("/download/{row_id}", tags=["Arquivos"])
-def download(row_id: int, user=Depends(get_current_user)):
-    """Retorna o arquivo Excel correspondente a um registro já processado"""
-    safe_name = f"{row_id}.xlsx"
-    file_path = os.path.join("downloads", safe_name)
-    if not os.path.exists(file_path):
-        return {"status": "erro", "msg": f"Arquivo para ID {row_id} não encontrado"}
-    return FileResponse(file_path, filename=safe_name, media_type="application/vnd.ms-excel")
-
-
-@app.get("/metrics", tags=["Status"])
-def metrics(user=Depends(get_current_user)):
-    """Estatísticas gerais do processamento"""
-    conn = db_connect()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM controle_consultas WHERE status='FINALIZADO'")
-    total_finalizados = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM controle_consultas WHERE status IS NULL OR status NOT IN ('FINALIZADO','Finalizado')")
-    pendentes = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM controle_consultas WHERE status='ERRO'")
-    erros = cur.fetchone()[0] if cur.description else 0
-    cur.close(); conn.close()
-    return {
-        "total_processados": total_finalizados,
-        "pendentes": pendentes,
-        "falhas": erros
-    }
-
-
-# ============================================================
-# FUNÇÃO INTERNA PARA EXECUTAR FLUXO
-# ============================================================
-
-def mark_erro(conn, row_id, etapa, detalhe, limite_tentativas=3):
-    cur = conn.cursor()
-    cur.execute("SELECT observacao FROM controle_consultas WHERE id=%s", (row_id,))
-    obs = cur.fetchone()[0] or ""
-    match = re.search(r"tentativas=(\d+)", obs)
-    tentativas = int(match.group(1)) if match else 0
-    tentativas += 1
-
-    nova_obs = f"tentativas={tentativas} | {etapa}: {detalhe}"
-    cur.execute("""
-        UPDATE controle_consultas
-        SET status='ERRO', observacao=%s
-        WHERE id=%s
-    """, (nova_obs, row_id))
-    conn.commit()
-    cur.close()
-    return tentativas >= limite_tentativas, tentativas
-
-
-async def _executar_fluxo(conn, pendente, reprocessar: bool = False, limite_tentativas=3):
-    row_id = pendente["id"]
-    titulo = pendente["titulo_consulta"]
-    try:
-        # 1) baixar excel
-        path = await baixar_excel_por_id(row_id, titulo)
-        if not path:
-            limite, tentativas = mark_erro(conn, row_id, "download", "Falha ao baixar arquivo", limite_tentativas)
-            msg = f"Falha ao baixar arquivo (tentativas={tentativas})"
-            if limite:
-                msg += " | Limite de tentativas atingido."
-            return {
-                "status": "erro",
-                "etapa": "download",
-                "detalhe": msg,
-                "tentativas": tentativas,
-                "tentativas_limite": limite
-            }
-
-        # 2) tratar + inserir
-        info("Lendo relatório com pandas...")
-        df = pd.read_excel(path)
-        df, meta = tratar_df(df)
-        insert_result = inserir_mysql(df)
-        if not insert_result.get("ok"):
-            limite, tentativas = mark_erro(conn, row_id, "inserir_mysql", insert_result.get("erro"), limite_tentativas)
-            msg = f"{insert_result.get('erro')} (tentativas={tentativas})"
-            if limite:
-                msg += " | Limite de tentativas atingido."
-            return {
-                "status": "erro",
-                "etapa": "inserir_mysql",
-                "detalhe": msg,
-                "tentativas": tentativas,
-                "tentativas_limite": limite
-            }
-
-        # 3) marcar finalizado se não for reprocessamento
-        if not reprocessar:
-            cur = conn.cursor()
-            cur.execute("SELECT observacao FROM controle_consultas WHERE id=%s", (row_id,))
-            obs = cur.fetchone()[0] or ""
-            match = re.search(r"tentativas=(\d+)", obs)
-            tentativas = int(match.group(1)) if match else 0
-            cur.execute("""
-                UPDATE controle_consultas
-                SET status='FINALIZADO', observacao=%s
-                WHERE id=%s
-            """, (f"SUCESSO após {tentativas} tentativas", row_id))
-            conn.commit()
-            cur.close()
-
-        return {
-            "status": "ok",
-            "id": row_id,
-            "titulo": titulo,
-            "arquivo": str(path),
-            "meta": meta,
-            "insercao": insert_result,
-            "observacao": f"SUCESSO após {tentativas} tentativas",
-            "tentativas": tentativas
-        }
-
-    except Exception as e:
-        limite, tentativas = mark_erro(conn, row_id, "processamento", str(e), limite_tentativas)
-        msg = f"{str(e)} (tentativas={tentativas})"
-        if limite:
-            msg += " | Limite de tentativas atingido."
-        error(f"Erro no processamento: {msg}")
-        return {
-            "status": "erro",
-            "etapa": "processamento",
-            "detalhe": msg,
-            "tentativas": tentativas,
-            "tentativas_limite": limite
-        }
+import os
+import json
+import time
+import asyncio
+import functools
+from datetime import datetime
+from contextlib import asynccontextmanager, nullcontext
+from typing import Optional, List, Literal
+
+from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from pydantic import BaseModel
+from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
+from fastapi.openapi.utils import get_openapi
+
+from app.utils.logger import ProcessLogger, info, warn, error
+from app.services.db_service import (
+    db_conexao, fechar_pool, garantir_schema, get_um_pendente, claim_pendentes, claim_por_id,
+    obter_contadores, invalidar_contadores, LeasePerdido, WORKER_ID,
+    RESERVADO, NAO_RESERVADO_EM_PROCESSAMENTO, NAO_RESERVADO_FINALIZADO, NAO_RESERVADO_LIMITE
+)
+from app.services.playwright_service import baixar_excel_por_id, baixar_excels_por_ids, browser_pool, exportador_http
+from app.services.lease_service import manter_lease, reaper
+from app.services.executor_service import executores
+from app.services.job_service import jobs
+from app.services.worker_service import worker, WORKER_AUTOSTART
+from app.services import checkpoint_service as checkpoints
+from app.services import cache_service
+from app.services import metricas_service as metricas
+from app.services.data_service import (
+    ler_e_tratar, blocos_tratados, processar_excel_em_chunks, inicio_valido, MODOS_INSERCAO, INSERCAO_MODO, EXCEL_STREAMING
+)
+from app.api.logs import router as logs_router
+from app.auth.dependencies import get_current_user
+
+
+# ============================================================
+# MODELOS DE RESPOSTA
+# ============================================================
+
+ModoInsercao = Literal["executemany", "bulk", "delta"]
+FormatoLista = Literal["json", "ndjson"]
+
+PAGINA_MAX = 1000
+NDJSON_LOTE = 500
+# /metrics/prometheus sem token (scrape interno); false = exige o mesmo Bearer dos outros endpoints
+PROMETHEUS_PUBLICO = os.getenv("PROMETHEUS_PUBLICO", "false").lower() in ("1","true","yes","y")
+
+
+class StatusResponse(BaseModel):
+    status: str
+    msg: str
+    db: Optional[str] = None
+    pendentes: Optional[int] = None
+    ultimo_processamento: Optional[str] = None
+
+
+class ProcessarResponse(BaseModel):
+    status: str
+    id: int | None = None
+    titulo: str | None = None
+    arquivo: str | None = None
+    meta: dict | None = None
+    insercao: dict | None = None
+    detalhe: str | None = None
+    etapa: str | None = None
+    observacao: str | None = None
+    tentativas: int | None = None
+    tentativas_limite: bool | None = None
+    tempos: dict | None = None
+    retomado: dict | None = None
+
+
+class LoteItemResponse(ProcessarResponse):
+    duracao_segundos: float | None = None
+
+
+class LoteResponse(BaseModel):
+    status: str
+    msg: str | None = None
+    total: int = 0
+    sucesso: int = 0
+    erros: int = 0
+    concurrency: int | None = None
+    duracao_segundos: float | None = None
+    duracao_media_segundos: float | None = None
+    duracao_max_segundos: float | None = None
+    download_sessao_unica: dict | None = None
+    resultados: List[LoteItemResponse] = []
+
+
+class JobResponse(BaseModel):
+    id: str
+    tipo: str
+    row_id: int
+    titulo: str | None = None
+    status: str
+    etapa: str | None = None
+    etapas: dict = {}
+    progresso: dict = {}
+    criado_em: str
+    iniciado_em: str | None = None
+    finalizado_em: str | None = None
+    duracao_segundos: float | None = None
+    detalhe: str | None = None
+
+
+class JobCriadoResponse(BaseModel):
+    status: str
+    msg: str | None = None
+    job: JobResponse | None = None
+
+
+# ============================================================
+# APP CONFIG
+# ============================================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        with db_conexao() as conn:
+            garantir_schema(conn)
+    except Exception as e:
+        error(f"Falha ao verificar schema do controle_consultas: {e}")
+    # Navegadores ficam abertos (e logados) durante toda a vida da API; se o Chromium não subir,
+    # a API sobe mesmo assim e o pool tenta de novo no primeiro download
+    await browser_pool.iniciar_ou_adiar()
+    executores.start()
+    jobs.carregar()
+    reaper.start()
+    if WORKER_AUTOSTART:
+        worker.start(_executar_fluxo)
+    try:
+        yield
+    finally:
+        # para de reservar e espera os lotes em andamento antes de derrubar navegadores e pools
+        await worker.stop()
+        await reaper.stop()
+        await jobs.stop()
+        await exportador_http.fechar()
+        await browser_pool.stop()
+        await executores.stop()
+        fechar_pool()
+
+
+app = FastAPI(
+    title="Relatório CLT API",
+    version="1.2.0",
+    description="API para automação de relatórios CLT da ConectPromotora.",
+    license_info={"name": "Uso interno - GS Consig"},
+    lifespan=lifespan
+)
+
+app.include_router(logs_router)
+
+
+# ============================================================
+# PROTEGENDO DOCS COM LOGIN
+# ============================================================
+
+@app.get("/docs", include_in_schema=False)
+async def custom_swagger_ui(user=Depends(get_current_user)):
+    return get_swagger_ui_html(openapi_url=app.openapi_url, title=app.title + " - Docs")
+
+
+@app.get("/redoc", include_in_schema=False)
+async def custom_redoc(user=Depends(get_current_user)):
+    return get_redoc_html(openapi_url=app.openapi_url, title=app.title + " - ReDoc")
+
+
+@app.get("/openapi.json", include_in_schema=False)
+async def custom_openapi(user=Depends(get_current_user)):
+    return get_openapi(title=app.title, version=app.version, routes=app.routes)
+
+
+# ============================================================
+# ENDPOINTS (TODOS EXIGEM LOGIN)
+# ============================================================
+
+@app.get("/", tags=["Status"], response_model=StatusResponse)
+@app.get("/status", tags=["Status"], response_model=StatusResponse)
+def root(user=Depends(get_current_user)):
+    """Verifica se a API está rodando + status básico do DB"""
+    try:
+        contadores = obter_contadores()
+        ultimo = contadores["ultimo_processamento"]
+        return {
+            "status": "ok",
+            "msg": "Relatório CLT API em execução 🚀",
+            "db": "conectado",
+            "pendentes": contadores["pendentes"],
+            "ultimo_processamento": str(ultimo) if ultimo else None
+        }
+    except Exception as e:
+        return {"status": "erro", "msg": f"Falha ao conectar DB: {e}", "db": "falha"}
+
+
+@app.get("/status/navegador", tags=["Status"])
+async def status_navegador(user=Depends(get_current_user)):
+    """Health check do pool de navegadores Playwright e do caminho de exportação HTTP"""
+    return {**await browser_pool.saude(), "export_http": exportador_http.saude()}
+
+
+@app.get("/status/executores", tags=["Status"])
+async def status_executores(user=Depends(get_current_user)):
+    """Pools de processos/threads e atraso do event loop"""
+    return executores.saude()
+
+
+@app.get("/status/cache", tags=["Status"])
+async def status_cache(user=Depends(get_current_user)):
+    """Entradas e tamanho do cache Parquet de lotes tratados"""
+    return await asyncio.to_thread(cache_service.resumo)
+
+
+@app.get("/pendentes", tags=["Consultas"])
+def listar_pendentes(
+    after_id: Optional[int] = Query(None, description="Cursor: retorna registros com id menor que este (ordem decrescente)"),
+    limit: Optional[int] = Query(None, ge=1, le=PAGINA_MAX, description="Tamanho da página (sem limit: lista completa, como antes)"),
+    formato: FormatoLista = Query("json", description="json (página) ou ndjson (stream linha a linha)"),
+    user=Depends(get_current_user)
+):
+    """Lista registros pendentes de processamento (paginação por cursor)"""
+    filtros = ["(status IS NULL OR status NOT IN ('FINALIZADO','Finalizado'))"]
+    params = []
+    if after_id is not None:
+        filtros.append("id < %s")
+        params.append(after_id)
+    sql = f"""
+        SELECT id, titulo_consulta, banco, quantidade, data_criacao
+        FROM controle_consultas
+        WHERE {' AND '.join(filtros)}
+        ORDER BY id DESC
+    """
+    if formato == "ndjson":
+        return _resposta_ndjson(sql, params, limit)
+
+    # sem limit mantém o contrato antigo: todos os pendentes, total = quantidade de pendentes
+    rows = _consultar_pagina(sql, params, limit)
+    proximo = {"after_id": rows[-1]["id"]} if limit and len(rows) == limit else None
+    return {"total": len(rows), "registros": rows, "proximo_cursor": proximo}
+
+
+@app.post("/processar", tags=["Processamento"], response_model=ProcessarResponse)
+async def processar(
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    user=Depends(get_current_user)
+):
+    """Processa o **próximo pendente** encontrado"""
+    pendente = await executores.db(_reservar_proximo)
+    if not pendente:
+        return {"status": "sem_pendentes", "msg": "Nenhum registro pendente encontrado."}
+    if "erro" in pendente:
+        return {"status": "erro", "etapa": "reserva", "detalhe": pendente["erro"]}
+    return await _executar_fluxo(pendente, modo_insercao=modo_insercao)
+
+
+@app.post("/processar/lote", tags=["Processamento"], response_model=LoteResponse)
+async def processar_lote(
+    max_registros: int = Query(10, ge=1, le=500, alias="max", description="Quantidade máxima de pendentes a processar"),
+    concurrency: int = Query(2, ge=1, le=20, description="Quantidade de lotes processados em paralelo"),
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    sessao_unica: bool = Query(False, description="Baixa todos os Excels numa única sessão do navegador antes de tratar/inserir"),
+    user=Depends(get_current_user)
+):
+    """Processa **vários pendentes** em paralelo (limitado por `concurrency`)"""
+    pendentes = await executores.db(_reservar_lote, max_registros)
+    if not pendentes:
+        return {"status": "sem_pendentes", "msg": "Nenhum registro pendente encontrado."}
+
+    download = asyncio.create_task(_baixar_em_sessao_unica(pendentes)) if sessao_unica else None
+    semaforo = asyncio.Semaphore(concurrency)
+
+    async def _processar_um(pendente):
+        inicio = time.perf_counter()
+        try:
+            # lease renovado desde a reserva: cobre a sessão única e a espera no semáforo
+            async with manter_lease(pendente["id"]):
+                arquivo = None
+                if download:
+                    arquivos, _ = await asyncio.shield(download)
+                    arquivo = arquivos.get(pendente["id"])
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    resultado = await _executar_fluxo(pendente, modo_insercao=modo_insercao, arquivo=arquivo)
+        except LeasePerdido as e:
+            resultado = _erro_lease(pendente, e)
+        resultado.setdefault("id", pendente["id"])
+        resultado.setdefault("titulo", pendente["titulo_consulta"])
+        resultado["duracao_segundos"] = round(time.perf_counter() - inicio, 3)
+        return resultado
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(_processar_um(p) for p in pendentes))
+    download_lote = download.result()[1] if download else None
+    duracoes = [r["duracao_segundos"] for r in resultados]
+    sucesso = sum(1 for r in resultados if r.get("status") in ("ok", "sem_alteracoes"))
+    return {
+        "status": "ok" if sucesso == len(resultados) else "parcial",
+        "total": len(resultados),
+        "sucesso": sucesso,
+        "erros": len(resultados) - sucesso,
+        "concurrency": concurrency,
+        "duracao_segundos": round(time.perf_counter() - inicio, 3),
+        "duracao_media_segundos": round(sum(duracoes) / len(duracoes), 3),
+        "duracao_max_segundos": max(duracoes),
+        "download_sessao_unica": download_lote,
+        "resultados": resultados
+    }
+
+
+@app.post("/processar/{row_id}", tags=["Processamento"], response_model=ProcessarResponse)
+async def processar_por_id(
+    row_id: int,
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    user=Depends(get_current_user)
+):
+    """Processa um **registro específico** pelo ID"""
+    pendente, situacao = await executores.db(_reservar_por_id, row_id)
+    if not pendente:
+        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
+    if situacao != RESERVADO:
+        return {"status": situacao, "id": row_id, "detalhe": _motivo_nao_reservado(row_id, situacao)}
+    return await _executar_fluxo(pendente, modo_insercao=modo_insercao)
+
+
+@app.get("/historico", tags=["Consultas"])
+def historico(
+    before_date: Optional[datetime] = Query(None, description="Cursor: registros com data_criacao anterior a esta"),
+    before_id: Optional[int] = Query(None, description="Cursor: desempate por id na mesma data_criacao; sem before_date, pagina os registros sem data_criacao"),
+    limit: Optional[int] = Query(None, ge=1, le=PAGINA_MAX, description="Tamanho da página (json: padrão 50; ndjson: sem limite)"),
+    formato: FormatoLista = Query("json", description="json (página) ou ndjson (stream linha a linha)"),
+    user=Depends(get_current_user)
+):
+    """Lista registros já finalizados (paginação por cursor)"""
+    filtros = ["status IN ('FINALIZADO','Finalizado')"]
+    params = []
+    # predicados sobre a coluna pura (usam índice em data_criacao); NULL ordena por último no DESC,
+    # então registros sem data formam a cauda da listagem, percorrida só por id
+    if before_date is not None and before_id is not None:
+        filtros.append("(data_criacao < %s OR (data_criacao = %s AND id < %s) OR data_criacao IS NULL)")
+        params += [before_date, before_date, before_id]
+    elif before_date is not None:
+        filtros.append("(data_criacao < %s OR data_criacao IS NULL)")
+        params.append(before_date)
+    elif before_id is not None:
+        filtros.append("data_criacao IS NULL AND id < %s")
+        params.append(before_id)
+    sql = f"""
+        SELECT id, titulo_consulta, banco, quantidade, data_criacao, status, observacao
+        FROM controle_consultas
+        WHERE {' AND '.join(filtros)}
+        ORDER BY data_criacao DESC, id DESC
+    """
+    if formato == "ndjson":
+        return _resposta_ndjson(sql, params, limit)
+
+    limit = limit or 50
+    rows = _consultar_pagina(sql, params, limit)
+    proximo = None
+    if len(rows) == limit:
+        ultimo = rows[-1]
+        data = ultimo["data_criacao"]
+        proximo = {"before_date": str(data) if data is not None else None, "before_id": ultimo["id"]}
+    return {"total": len(rows), "historico": rows, "proximo_cursor": proximo}
+
+
+@app.post("/reprocessar/{row_id}", tags=["Processamento"], response_model=ProcessarResponse)
+async def reprocessar(
+    row_id: int,
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    usar_cache: bool = Query(True, description="Usa o DataFrame tratado em cache (Parquet) sem baixar nem tratar de novo"),
+    user=Depends(get_current_user)
+):
+    """Reprocessa manualmente um registro específico"""
+    pendente = await executores.db(_buscar_registro, row_id)
+    if not pendente:
+        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
+    return await _executar_fluxo(pendente, reprocessar=True, modo_insercao=modo_insercao, usar_cache=usar_cache)
+
+
+@app.get("/download/{row_id}", tags=["Arquivos"])
+def download(row_id: int, user=Depends(get_current_user)):
+    """Retorna o arquivo Excel correspondente a um registro já processado"""
+    safe_name = f"{row_id}.xlsx"
+    file_path = os.path.join("downloads", safe_name)
+    if not os.path.exists(file_path):
+        return {"status": "erro", "msg": f"Arquivo para ID {row_id} não encontrado"}
+    return FileResponse(file_path, filename=safe_name, media_type="application/vnd.ms-excel")
+
+
+@app.get("/metrics", tags=["Status"])
+def metrics(user=Depends(get_current_user)):
+    """Estatísticas gerais do processamento"""
+    contadores = obter_contadores()
+    return {
+        "total_processados": contadores["finalizados"],
+        "pendentes": contadores["pendentes"],
+        "falhas": contadores["erros"],
+        "em_processamento": contadores["em_processamento"]
+    }
+
+
+@app.get("/metrics/prometheus", tags=["Status"],
+         dependencies=[] if PROMETHEUS_PUBLICO else [Depends(get_current_user)])
+async def metrics_prometheus():
+    """Métricas do pipeline no formato texto do Prometheus (histogramas por etapa, linhas, em andamento)"""
+    try:
+        metricas.atualizar_registros(await asyncio.to_thread(obter_contadores))
+    except Exception as e:
+        # sem banco o scrape continua: os gauges de registros ficam com o último valor lido
+        error(f"Falha ao atualizar contadores para o Prometheus: {e}")
+    return Response(metricas.exportar(), media_type=metricas.TIPO_CONTEUDO)
+
+
+# ============================================================
+# JOBS (PROCESSAMENTO EM BACKGROUND)
+# ============================================================
+
+def _criar_job(tipo, pendente, modo_insercao, reprocessar=False):
+    async def _executar(progresso):
+        return await _executar_fluxo(pendente, reprocessar=reprocessar, modo_insercao=modo_insercao, progresso=progresso)
+    # registro reservado: o lease é renovado também enquanto o job espera na fila (JOBS_CONCURRENCY)
+    reter = None if reprocessar else (lambda: manter_lease(pendente["id"]))
+    return jobs.criar(tipo, pendente["id"], pendente.get("titulo_consulta"), _executar, reter)
+
+
+@app.post("/jobs/processar", tags=["Jobs"], response_model=JobCriadoResponse)
+async def job_processar(
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    user=Depends(get_current_user)
+):
+    """Reserva o **próximo pendente** e processa em background; retorna o id do job na hora"""
+    pendente = await executores.db(_reservar_proximo)
+    if not pendente:
+        return {"status": "sem_pendentes", "msg": "Nenhum registro pendente encontrado."}
+    if "erro" in pendente:
+        return {"status": "erro", "msg": pendente["erro"]}
+    job = _criar_job("processar", pendente, modo_insercao)
+    return {"status": "aceito", "job": job.to_dict()}
+
+
+@app.post("/jobs/processar/{row_id}", tags=["Jobs"], response_model=JobCriadoResponse)
+async def job_processar_por_id(
+    row_id: int,
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    user=Depends(get_current_user)
+):
+    """Processa um registro específico em background (um retry devolve o job que já está rodando)"""
+    existente = jobs.ativo_para(row_id)
+    if existente:
+        return {"status": "em_andamento", "msg": f"Registro {row_id} já tem um job ativo", "job": existente.to_dict()}
+    pendente, situacao = await executores.db(_reservar_por_id, row_id)
+    if not pendente:
+        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
+    if situacao != RESERVADO:
+        return {"status": situacao, "msg": _motivo_nao_reservado(row_id, situacao)}
+    job = _criar_job("processar", pendente, modo_insercao)
+    return {"status": "aceito", "job": job.to_dict()}
+
+
+@app.post("/jobs/reprocessar/{row_id}", tags=["Jobs"], response_model=JobCriadoResponse)
+async def job_reprocessar(
+    row_id: int,
+    modo_insercao: ModoInsercao = Query(INSERCAO_MODO, description="executemany (upsert em chunks), bulk (LOAD DATA + merge) ou delta (só CPFs novos/alterados)"),
+    user=Depends(get_current_user)
+):
+    """Reprocessa um registro em background"""
+    existente = jobs.ativo_para(row_id)
+    if existente:
+        return {"status": "em_andamento", "msg": f"Registro {row_id} já tem um job ativo", "job": existente.to_dict()}
+    pendente = await executores.db(_buscar_registro, row_id)
+    if not pendente:
+        return {"status": "erro", "msg": f"Registro {row_id} não encontrado"}
+    job = _criar_job("reprocessar", pendente, modo_insercao, reprocessar=True)
+    return {"status": "aceito", "job": job.to_dict()}
+
+
+@app.get("/jobs", tags=["Jobs"])
+async def listar_jobs(
+    status: Optional[str] = Query(None, description="Filtra por status (na_fila, executando, concluido, erro, interrompido)"),
+    limit: int = Query(50, ge=1, le=500),
+    user=Depends(get_current_user)
+):
+    """Lista os jobs mais recentes com etapa atual e tempos"""
+    lista = [j.to_dict() for j in jobs.listar(status, limit)]
+    return {"total": len(lista), "resumo": jobs.resumo(), "jobs": lista}
+
+
+@app.get("/jobs/{job_id}", tags=["Jobs"], response_model=JobResponse)
+async def obter_job(job_id: str, user=Depends(get_current_user)):
+    """Status, etapa atual, progresso e tempos de um job"""
+    job = jobs.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} não encontrado")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/resultado", tags=["Jobs"], response_model=ProcessarResponse)
+async def resultado_job(job_id: str, user=Depends(get_current_user)):
+    """Resultado do processamento (mesmo formato de /processar) de um job finalizado"""
+    job = jobs.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} não encontrado")
+    if job.resultado is None:
+        return {"status": job.status, "id": job.row_id, "titulo": job.titulo, "etapa": job.etapa,
+                "detalhe": job.detalhe or "Job ainda não finalizado"}
+    return job.resultado
+
+
+# ============================================================
+# WORKER CONTÍNUO (ADMIN)
+# ============================================================
+
+@app.get("/worker/status", tags=["Worker"])
+async def worker_status(user=Depends(get_current_user)):
+    """Estado do worker, lotes em andamento, intervalo de polling atual e contadores"""
+    return worker.status()
+
+
+@app.post("/worker/start", tags=["Worker"])
+async def worker_start(user=Depends(get_current_user)):
+    """Inicia o loop que esvazia a fila de pendentes"""
+    iniciado = worker.start(_executar_fluxo)
+    return {"status": "ok" if iniciado else "ignorado", "worker": worker.status()}
+
+
+@app.post("/worker/stop", tags=["Worker"])
+async def worker_stop(
+    drenar: bool = Query(True, description="Espera os lotes em andamento terminarem antes de parar"),
+    user=Depends(get_current_user)
+):
+    """Para de reservar pendentes; o dreno dos lotes em andamento segue em background"""
+    solicitado = worker.solicitar_parada(drenar)
+    return {"status": "ok" if solicitado else "ignorado", "worker": worker.status()}
+
+
+@app.post("/worker/pause", tags=["Worker"])
+async def worker_pause(user=Depends(get_current_user)):
+    """Suspende novas reservas (lotes em andamento continuam)"""
+    pausado = worker.pause()
+    return {"status": "ok" if pausado else "ignorado", "worker": worker.status()}
+
+
+@app.post("/worker/resume", tags=["Worker"])
+async def worker_resume(user=Depends(get_current_user)):
+    """Retoma as reservas de um worker pausado"""
+    retomado = worker.resume()
+    return {"status": "ok" if retomado else "ignorado", "worker": worker.status()}
+
+
+# ============================================================
+# FUNÇÃO INTERNA PARA EXECUTAR FLUXO
+# ============================================================
+
+def _consultar_pagina(sql, params, limit=None):
+    if limit:
+        sql += " LIMIT %s"
+        params = (*params, limit)
+    with db_conexao() as conn:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+
+def _resposta_ndjson(sql, params, limit=None):
+    """Transmite o resultado como NDJSON conforme as linhas chegam do MySQL (cursor não bufferizado)"""
+    if limit:
+        sql += " LIMIT %s"
+        params = [*params, limit]
+
+    def _gerar():
+        with db_conexao() as conn:
+            cur = conn.cursor(dictionary=True)
+            completo = False
+            try:
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(NDJSON_LOTE)
+                    if not rows:
+                        break
+                    yield "".join(json.dumps(r, default=str, ensure_ascii=False) + "\n" for r in rows)
+                completo = True
+            finally:
+                if completo:
+                    cur.close()
+                else:
+                    # cliente desconectou no meio: a conexão ainda tem linhas pendentes, descarta do pool
+                    conn.invalidate()
+
+    return StreamingResponse(_gerar(), media_type="application/x-ndjson")
+
+
+def _reservar_proximo():
+    with db_conexao() as conn:
+        pendente = get_um_pendente(conn)
+    if pendente and "titulo_consulta" not in pendente:
+        # falha no banco: get_um_pendente devolve um erro_db_retorno no lugar do registro
+        return {"erro": f"{pendente['titulo']}: {pendente['mensagem']}"}
+    return pendente
+
+
+def _reservar_lote(limite):
+    with db_conexao() as conn:
+        return claim_pendentes(conn, limite)
+
+
+def _reservar_por_id(row_id):
+    with db_conexao() as conn:
+        return claim_por_id(conn, row_id)
+
+
+def _motivo_nao_reservado(row_id, situacao):
+    return {
+        NAO_RESERVADO_EM_PROCESSAMENTO: f"Registro {row_id} já está em processamento",
+        NAO_RESERVADO_FINALIZADO: f"Registro {row_id} já foi finalizado; use /reprocessar/{row_id}",
+        NAO_RESERVADO_LIMITE: f"Registro {row_id} atingiu o limite de tentativas; use /reprocessar/{row_id}",
+    }[situacao]
+
+
+def _buscar_registro(row_id):
+    with db_conexao() as conn:
+        cur = conn.cursor(dictionary=True)
+        cur.execute("SELECT * FROM controle_consultas WHERE id=%s", (row_id,))
+        registro = cur.fetchone()
+        cur.close()
+    return registro
+
+
+def _condicao_dono(worker_id):
+    """Com worker_id, o UPDATE só vale se o registro ainda estiver reservado por este worker"""
+    return (" AND worker_id=%s", (worker_id,)) if worker_id else ("", ())
+
+
+def mark_erro(row_id, etapa, detalhe, limite_tentativas=3, worker_id=None):
+    condicao, params = _condicao_dono(worker_id)
+    with db_conexao() as conn:
+        cur = conn.cursor()
+        # o MySQL aplica o SET da esquerda para a direita: a observacao já vê o contador incrementado
+        cur.execute(f"""
+            UPDATE controle_consultas
+            SET status='ERRO',
+                tentativas = tentativas + 1,
+                observacao = CONCAT('tentativas=', tentativas, ' | ', %s),
+                worker_id = NULL,
+                lease_expira_em = NULL
+            WHERE id=%s{condicao}
+        """, (f"{etapa}: {detalhe}", row_id, *params))
+        if cur.rowcount == 0 and worker_id:
+            conn.rollback()
+            cur.close()
+            raise LeasePerdido(row_id)
+        cur.execute("SELECT tentativas FROM controle_consultas WHERE id=%s", (row_id,))
+        tentativas = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    invalidar_contadores()
+    return tentativas >= limite_tentativas, tentativas
+
+
+def mark_finalizado_fluxo(row_id, hash_arquivo=None, worker_id=None):
+    condicao, params = _condicao_dono(worker_id)
+    with db_conexao() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            UPDATE controle_consultas
+            SET status='FINALIZADO',
+                observacao = CONCAT('SUCESSO após ', tentativas, ' tentativas'),
+                hash_arquivo = COALESCE(%s, hash_arquivo),
+                worker_id = NULL,
+                lease_expira_em = NULL
+            WHERE id=%s{condicao}
+        """, (hash_arquivo, row_id, *params))
+        if cur.rowcount == 0 and worker_id:
+            conn.rollback()
+            cur.close()
+            raise LeasePerdido(row_id)
+        cur.execute("SELECT tentativas FROM controle_consultas WHERE id=%s", (row_id,))
+        tentativas = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    invalidar_contadores()
+    return tentativas
+
+
+def registrar_hash_inserido(row_id, hash_arquivo):
+    """Reprocessamento com sucesso: só atualiza o hash do último Excel inserido"""
+    with db_conexao() as conn:
+        cur = conn.cursor()
+        cur.execute("UPDATE controle_consultas SET hash_arquivo=%s WHERE id=%s", (hash_arquivo, row_id))
+        conn.commit()
+        cur.close()
+
+
+async def _baixar_em_sessao_unica(pendentes):
+    """Exporta numa só sessão os lotes que ainda não têm download válido em checkpoint"""
+    faltantes = []
+    for pendente in pendentes:
+        if not await asyncio.to_thread(checkpoints.carregar, pendente["id"]):
+            faltantes.append((pendente["id"], pendente["titulo_consulta"]))
+    if not faltantes:
+        return {}, {"baixados": 0, "segundos": 0.0}
+
+    # os leases dos lotes já são renovados desde a reserva (processar_lote)
+    inicio = time.perf_counter()
+    try:
+        arquivos = await baixar_excels_por_ids(faltantes)
+    except Exception as e:
+        # sem arquivo da sessão única cada lote baixa o seu no próprio fluxo (registros seguem reservados e com lease)
+        duracao = time.perf_counter() - inicio
+        error(f"Sessão única falhou após {duracao:.1f}s, baixando lote a lote: {type(e).__name__}: {e}")
+        return {}, {"baixados": 0, "falhas": len(faltantes), "segundos": round(duracao, 3), "erro": str(e)}
+    duracao = time.perf_counter() - inicio
+    ok = sum(1 for a in arquivos.values() if not isinstance(a, dict))
+    info(f"Sessão única: {ok}/{len(faltantes)} Excel(s) baixados em {duracao:.1f}s")
+    return arquivos, {"baixados": ok, "falhas": len(faltantes) - ok, "segundos": round(duracao, 3)}
+
+
+async def _carregar_cache(row_id, hash_arquivo=None):
+    """(df, extra) da entrada em cache do lote; extra traz meta, arquivo e hash_arquivo"""
+    entrada = await asyncio.to_thread(cache_service.obter, row_id, hash_arquivo)
+    if not entrada:
+        return None, {}
+    df, extra = await asyncio.to_thread(cache_service.carregar, entrada)
+    extra["meta"] = extra.get("meta") or {}
+    return df, extra
+
+
+def _erro_lease(pendente, e: LeasePerdido):
+    # o registro é de outro worker agora: nada é marcado no controle_consultas
+    error(str(e))
+    return {"status": "erro", "id": pendente["id"], "titulo": pendente.get("titulo_consulta"),
+            "etapa": "lease", "detalhe": str(e)}
+
+
+async def _executar_fluxo(pendente, reprocessar: bool = False, limite_tentativas=3, streaming: bool = EXCEL_STREAMING,
+                          modo_insercao: str = INSERCAO_MODO, progresso=None, arquivo=None, usar_cache: bool = False):
+    # registros reservados (EM_PROCESSAMENTO) têm o lease renovado enquanto o fluxo roda
+    lease = nullcontext() if reprocessar else manter_lease(pendente["id"])
+    logger = ProcessLogger(f"lote_{pendente['id']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    logger.step("LOTE", f"Registro {pendente['id']} - {pendente.get('titulo_consulta')}")
+    try:
+        async with lease:
+            with metricas.em_andamento("lote"):
+                resultado = await _executar_etapas(pendente, reprocessar, limite_tentativas, streaming, modo_insercao,
+                                                   progresso or (lambda etapa, **dados: None), arquivo, logger, usar_cache)
+    except LeasePerdido as e:
+        resultado = _erro_lease(pendente, e)
+    # passos da navegação (login, menu, filtro, download) medidos pelo playwright_service
+    navegacao = {k: v for k, v in logger.tempos.items() if k.startswith("web_")}
+    if navegacao and resultado.get("tempos") is not None:
+        resultado["tempos"]["navegacao"] = navegacao
+    fim = logger.finish(resultado.get("status") in ("ok", "sem_alteracoes"))
+    metricas.registrar_lote(resultado.get("status") or "erro", fim["duration_seconds"])
+    return resultado
+
+
+async def _executar_etapas(pendente, reprocessar: bool, limite_tentativas: int, streaming: bool, modo_insercao: str,
+                           progresso, arquivo=None, logger: ProcessLogger = None, usar_cache: bool = False):
+    row_id = pendente["id"]
+    titulo = pendente["titulo_consulta"]
+    # registro reservado por este worker: marcações só valem enquanto o lease for nosso
+    dono = None if reprocessar else WORKER_ID
+    tempos = {}
+    retomado = {}
+    inicio_fluxo = time.perf_counter()
+    logger = logger or ProcessLogger(f"lote_{row_id}")
+
+    def _tempo(etapa, inicio):
+        segundos = time.perf_counter() - inicio
+        tempos[etapa] = round(segundos, 3)
+        logger.tempo(etapa, segundos)
+        metricas.observar(etapa, segundos)
+
+    async def _falha(etapa, detalhe):
+        limite, tentativas = await executores.db(mark_erro, row_id, etapa, detalhe, limite_tentativas, dono)
+        msg = f"{detalhe} (tentativas={tentativas})"
+        if limite:
+            msg += " | Limite de tentativas atingido."
+        tempos["total"] = round(time.perf_counter() - inicio_fluxo, 3)
+        return {
+            "status": "erro",
+            "etapa": etapa,
+            "detalhe": msg,
+            "tentativas": tentativas,
+            "tentativas_limite": limite,
+            "tempos": tempos
+        }
+
+    async def _retomada(total=None):
+        """inicio/ao_commit do executemany: continua do último chunk confirmado e registra cada novo commit"""
+        if modo_insercao != "executemany":
+            return {}
+        linhas = (cp.get("linhas_inseridas") or 0) if retomado.get("download") else 0
+        if not inicio_valido(linhas, total):
+            # checkpoint corrompido (ex.: gravado com o tempo do chunk): descarta e insere tudo
+            warn(f"Registro {row_id}: linhas_inseridas inválido no checkpoint ({linhas!r}), reiniciando a inserção")
+            await asyncio.to_thread(checkpoints.registrar_insercao, row_id, 0)
+            linhas = 0
+        if linhas:
+            retomado["linhas_inseridas"] = linhas
+        return {"inicio": linhas, "ao_commit": lambda n: checkpoints.registrar_insercao(row_id, n)}
+
+    async def _finalizar(hash_atual):
+        # 3) marcar finalizado se não for reprocessamento; guarda o hash do Excel inserido
+        tentativas = pendente.get("tentativas") or 0
+        inicio = time.perf_counter()
+        if not reprocessar:
+            tentativas = await executores.db(mark_finalizado_fluxo, row_id, hash_atual, dono)
+        elif hash_atual and hash_atual != pendente.get("hash_arquivo"):
+            await executores.db(registrar_hash_inserido, row_id, hash_atual)
+        _tempo("finalizacao", inicio)
+        await asyncio.to_thread(checkpoints.limpar, row_id)
+        tempos["total"] = round(time.perf_counter() - inicio_fluxo, 3)
+        return tentativas
+
+    try:
+        # checkpoint de uma tentativa anterior: retoma da etapa que falhou
+        cp = await asyncio.to_thread(checkpoints.carregar, row_id)
+
+        # 0) reprocessamento pelo cache: último DataFrame tratado do lote, sem download nem tratamento
+        df = None
+        baixado_agora = False
+        if usar_cache and arquivo is None:
+            inicio = time.perf_counter()
+            df, extra = await _carregar_cache(row_id)
+            if df is not None:
+                meta, path = extra["meta"], extra.get("arquivo")
+                cp = {"hash_arquivo": extra.get("hash_arquivo")}
+                retomado["cache"] = True
+                _tempo("leitura_tratamento", inicio)
+                info(f"Registro {row_id}: reprocessando a partir do cache ({len(df)} linhas)")
+
+        # 1) baixar excel (ou usar o arquivo já exportado na sessão única do lote)
+        progresso("download")
+        if df is None:
+            if arquivo is None and cp:
+                path = cp["arquivo"]
+                retomado["download"] = True
+                tempos["download"] = 0.0
+                info(f"Registro {row_id}: reaproveitando download do checkpoint ({path})")
+            else:
+                inicio = time.perf_counter()
+                path = arquivo if arquivo is not None else await baixar_excel_por_id(row_id, titulo, logger, row_id)
+                _tempo("download", inicio)
+                if not path or isinstance(path, dict):
+                    detalhe = path.get("mensagem") if isinstance(path, dict) else None
+                    return await _falha("download", detalhe or "Falha ao baixar arquivo")
+                cp = {"hash_arquivo": await asyncio.to_thread(checkpoints.registrar_download, row_id, path)}
+                baixado_agora = True
+
+        # Excel recém-baixado igual ao do último processamento com sucesso: nada mudou, não trata nem insere
+        # de novo. Reprocessamento manual e leitura do cache sempre inserem.
+        hash_atual = cp.get("hash_arquivo")
+        if baixado_agora and not reprocessar and hash_atual and hash_atual == pendente.get("hash_arquivo"):
+            info(f"Registro {row_id}: Excel idêntico ao último inserido ({hash_atual[:12]}), pulando tratamento e inserção")
+            progresso("finalizacao")
+            tentativas = await _finalizar(hash_atual)
+            return {
+                "status": "sem_alteracoes",
+                "id": row_id,
+                "titulo": titulo,
+                "arquivo": str(path) if path else None,
+                "observacao": "Sem alterações: arquivo idêntico ao último inserido",
+                "tentativas": tentativas,
+                "tempos": tempos,
+                "retomado": retomado or None
+            }
+
+        # 2) tratar + inserir (fora do event loop)
+        inserir = MODOS_INSERCAO[modo_insercao]
+        inicio = time.perf_counter()
+        if streaming and df is None:
+            # lê e insere bloco a bloco: memória constante independente do tamanho do export.
+            # leitura (openpyxl) + tratamento no pool de processos, inserção no de threads, em paralelo
+            progresso("tratamento_insercao")
+            kwargs = await _retomada()
+            with metricas.em_andamento("insercao"):
+                meta, insert_result = await executores.pipeline(
+                    functools.partial(blocos_tratados, str(path), row_id),
+                    lambda blocos: processar_excel_em_chunks(path, id_consulta=row_id, inserir=inserir, blocos=blocos, **kwargs)
+                )
+            _tempo("tratamento_insercao", inicio)
+        else:
+            progresso("leitura_tratamento")
+            if df is None:
+                # mesmo Excel (hash) já tratado antes: lê o Parquet em vez de refazer read_excel + tratar_df
+                df, extra = await _carregar_cache(row_id, hash_atual)
+                if df is not None:
+                    meta = extra["meta"]
+                    retomado["tratamento"] = True
+                else:
+                    with metricas.em_andamento("tratamento"):
+                        df, meta = await executores.cpu(ler_e_tratar, path, row_id)
+                    if not meta:
+                        return await _falha("tratamento_dados", df.get("mensagem"))
+                    # read_excel e tratar_df rodam no pool de processos: observados aqui pelos tempos da meta
+                    for etapa, segundos in meta.get("tempos", {}).items():
+                        metricas.observar(etapa, segundos)
+                    await asyncio.to_thread(cache_service.salvar, row_id, hash_atual, df, meta, path)
+                _tempo("leitura_tratamento", inicio)
+
+            progresso("insercao", linhas_excel=meta.get("linhas_excel"), linhas_tratadas=meta.get("linhas_tratadas"))
+            kwargs = await _retomada(len(df))
+            inicio = time.perf_counter()
+            with metricas.em_andamento("insercao"):
+                insert_result = await executores.db(inserir, df, **kwargs)
+            _tempo("insercao", inicio)
+            del df
+        if not insert_result.get("ok"):
+            return await _falha("inserir_mysql", insert_result.get("erro") or insert_result.get("mensagem"))
+
+        metricas.contar_linhas(excel=meta.get("linhas_excel"), tratadas=meta.get("linhas_tratadas"),
+                               dedup=meta.get("cpfs_dedup"), enviadas=insert_result.get("enviados"),
+                               novas=insert_result.get("novos"), atualizadas=insert_result.get("atualizados"),
+                               ignoradas=insert_result.get("ignorados"))
+        progresso("finalizacao", linhas_inseridas=insert_result.get("enviados"),
+                  novos=insert_result.get("novos"), atualizados=insert_result.get("atualizados"),
+                  ignorados=insert_result.get("ignorados"))
+        tentativas = await _finalizar(hash_atual)
+
+        return {
+            "status": "ok",
+            "id": row_id,
+            "titulo": titulo,
+            "arquivo": str(path),
+            "meta": meta,
+            "insercao": insert_result,
+            "observacao": f"SUCESSO após {tentativas} tentativas",
+            "tentativas": tentativas,
+            "tempos": tempos,
+            "retomado": retomado or None
+        }
+
+    except LeasePerdido:
+        raise
+    except Exception as e:
+        resultado = await _falha("processamento", str(e))
+        error(f"Erro no processamento: {resultado['detalhe']}")
+        return resultado
@@ -0,0 +1,278 @@
+import os
+import asyncio
+from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from playwright.async_api import async_playwright, Playwright, Browser, BrowserContext, Page, Route
+from app.utils.logger import ProcessLogger
+from app.services import metricas_service as metricas
+
+HEADLESS = os.getenv("HEADLESS", "true").lower() in ("1","true","yes","y")
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_TIMEOUT = float(os.getenv("BROWSER_POOL_TIMEOUT", "300"))
+# modo enxuto: tipos de recurso e hosts de analytics abortados antes de sair do navegador
+RECURSOS_BLOQUEADOS = {t.strip() for t in os.getenv("NAVEGACAO_BLOQUEAR_TIPOS", "image,font,media").split(",") if t.strip()}
+HOSTS_BLOQUEADOS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net",
+                    "facebook.net", "hotjar.com", "clarity.ms")
+
+# login(page, logger, id_consulta) -> None em caso de sucesso ou dict de erro
+LoginFn = Callable[[Page, Optional[ProcessLogger], Any], Awaitable[Optional[dict]]]
+# sessao_expirada(page) -> True quando a página caiu na tela de login
+SessaoExpiradaFn = Callable[[Page], Awaitable[bool]]
+
+
+class PoolSessaoErro(Exception):
+    """Falha ao obter uma página autenticada do pool (carrega o dict de erro do serviço)"""
+
+    def __init__(self, retorno: dict):
+        super().__init__(retorno.get("mensagem") if isinstance(retorno, dict) else str(retorno))
+        self.retorno = retorno
+
+
+class _Slot:
+    def __init__(self, indice: int):
+        self.indice = indice
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.geracao_sessao = -1
+        self.usos = 0
+
+
+class BrowserPool:
+    """
+    Pool de navegadores Chromium de vida longa.
+
+    Cada slot mantém um browser + context abertos entre downloads. O `storage_state`
+    autenticado é compartilhado entre os slots, então o login só é refeito quando a
+    sessão expira (o site redireciona para a tela de login).
+    """
+
+    def __init__(self, url_inicial: str, login: LoginFn, sessao_expirada: SessaoExpiradaFn,
+                 tamanho: int = BROWSER_POOL_SIZE, timeout: float = BROWSER_POOL_TIMEOUT,
+                 bloquear_recursos: bool = False):
+        self.url_inicial = url_inicial
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.bloquear_recursos = bloquear_recursos
+        self.requisicoes_bloqueadas = 0
+        self._login = login
+        self._sessao_expirada = sessao_expirada
+        self._playwright: Optional[Playwright] = None
+        self._slots: List[_Slot] = []
+        self._livres: Optional[asyncio.Queue] = None
+        self._login_lock: Optional[asyncio.Lock] = None
+        self._inicio_lock: Optional[asyncio.Lock] = None
+        self.erro_inicio: Optional[str] = None
+        self.storage_state: Optional[Dict[str, Any]] = None
+        self.geracao_sessao = 0
+        self.logins = 0
+        self.ultimo_login: Optional[datetime] = None
+
+    @property
+    def ativo(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self, logger: ProcessLogger = None):
+        if self.ativo or self.tamanho <= 0:
+            return
+        if logger:
+            logger.web(f"Iniciando pool de navegadores (tamanho={self.tamanho})")
+        else:
+            print(f"[WEB] Iniciando pool de navegadores (tamanho={self.tamanho})")
+        self._playwright = await async_playwright().start()
+        self._livres = asyncio.Queue()
+        self._login_lock = asyncio.Lock()
+        self._slots = [_Slot(i) for i in range(self.tamanho)]
+        try:
+            for slot in self._slots:
+                await self._garantir_browser(slot)
+                self._livres.put_nowait(slot)
+        except Exception:
+            # navegador não sobe (ex.: Chromium não instalado): volta ao estado inativo
+            await self.stop(logger)
+            raise
+        self.erro_inicio = None
+
+    async def iniciar_ou_adiar(self, logger: ProcessLogger = None) -> bool:
+        """start() sem derrubar quem chama: em caso de falha registra o erro e o pool tenta de novo no próximo uso"""
+        if self._inicio_lock is None:
+            self._inicio_lock = asyncio.Lock()
+        async with self._inicio_lock:
+            try:
+                await self.start(logger)
+            except Exception as e:
+                self.erro_inicio = f"{type(e).__name__}: {(str(e).splitlines() or [''])[0]}"
+                msg = f"Pool de navegadores não iniciou ({self.erro_inicio}); nova tentativa no próximo download"
+                if logger:
+                    logger.error(msg)
+                else:
+                    print(f"[ERROR] {msg}")
+        return self.ativo
+
+    async def stop(self, logger: ProcessLogger = None):
+        if not self.ativo:
+            return
+        if logger:
+            logger.web("Encerrando pool de navegadores")
+        else:
+            print("[WEB] Encerrando pool de navegadores")
+        for slot in self._slots:
+            await self._fechar_slot(slot)
+        self._slots = []
+        self._livres = None
+        await self._playwright.stop()
+        self._playwright = None
+
+    async def _garantir_browser(self, slot: _Slot):
+        if slot.browser is None or not slot.browser.is_connected():
+            await self._fechar_slot(slot)
+            with metricas.medir("navegador_inicio"):
+                slot.browser = await self._playwright.chromium.launch(headless=HEADLESS)
+
+    async def _garantir_context(self, slot: _Slot):
+        await self._garantir_browser(slot)
+        if slot.context is None or slot.geracao_sessao != self.geracao_sessao:
+            if slot.context is not None:
+                try:
+                    await slot.context.close()
+                except Exception:
+                    pass
+            slot.context = await slot.browser.new_context(accept_downloads=True, storage_state=self.storage_state)
+            await self._configurar_context(slot.context)
+            slot.geracao_sessao = self.geracao_sessao
+
+    async def _configurar_context(self, context: BrowserContext):
+        if self.bloquear_recursos:
+            await context.route("**/*", self._rotear)
+
+    async def _rotear(self, route: Route):
+        req = route.request
+        if req.resource_type in RECURSOS_BLOQUEADOS or any(h in req.url for h in HOSTS_BLOQUEADOS):
+            self.requisicoes_bloqueadas += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _fechar_slot(self, slot: _Slot):
+        for recurso in (slot.context, slot.browser):
+            if recurso is not None:
+                try:
+                    await recurso.close()
+                except Exception:
+                    pass
+        slot.context = None
+        slot.browser = None
+
+    async def _garantir_sessao(self, slot: _Slot, page: Page, logger: ProcessLogger = None, id_consulta=None) -> Page:
+        await page.goto(self.url_inicial, timeout=40000)
+        if not await self._sessao_expirada(page):
+            return page
+
+        async with self._login_lock:
+            # Outro slot pode ter renovado a sessão enquanto esperávamos o lock
+            if slot.geracao_sessao != self.geracao_sessao:
+                await page.close()
+                await self._garantir_context(slot)
+                page = await slot.context.new_page()
+                await page.goto(self.url_inicial, timeout=40000)
+                if not await self._sessao_expirada(page):
+                    return page
+
+            erro = await self._login(page, logger, id_consulta)
+            if isinstance(erro, dict):
+                raise PoolSessaoErro(erro)
+            self.storage_state = await slot.context.storage_state()
+            self.geracao_sessao += 1
+            slot.geracao_sessao = self.geracao_sessao
+            self.logins += 1
+            self.ultimo_login = datetime.now()
+        return page
+
+    @asynccontextmanager
+    async def pagina(self, logger: ProcessLogger = None, id_consulta=None):
+        """Entrega uma página já autenticada e devolve o slot ao pool ao sair"""
+        if not self.ativo and self.tamanho > 0:
+            await self.iniciar_ou_adiar(logger)
+        if not self.ativo:
+            async with self._pagina_avulsa(logger, id_consulta) as page:
+                yield page
+            return
+
+        try:
+            slot = await asyncio.wait_for(self._livres.get(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolSessaoErro({
+                "id": id_consulta,
+                "titulo": "Nenhum navegador livre no pool",
+                "etapa": "browser_pool",
+                "mensagem": f"Timeout de {self.timeout}s aguardando navegador."
+            })
+
+        page = None
+        try:
+            await self._garantir_context(slot)
+            page = await slot.context.new_page()
+            page = await self._garantir_sessao(slot, page, logger, id_consulta)
+            slot.usos += 1
+            yield page
+        except PoolSessaoErro:
+            raise
+        except Exception:
+            # Context em estado desconhecido: descarta para o próximo uso recriar
+            if slot.context is not None:
+                try:
+                    await slot.context.close()
+                except Exception:
+                    pass
+                slot.context = None
+            raise
+        finally:
+            if page is not None and not page.is_closed():
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            self._livres.put_nowait(slot)
+
+    @asynccontextmanager
+    async def _pagina_avulsa(self, logger: ProcessLogger = None, id_consulta=None):
+        """Fluxo sem pool (BROWSER_POOL_SIZE=0 ou scripts): navegador e login descartáveis"""
+        async with async_playwright() as p:
+            if logger:
+                logger.web("Iniciando navegador Playwright")
+            else:
+                print("[WEB] Iniciando navegador Playwright")
+            with metricas.medir("navegador_inicio"):
+                browser = await p.chromium.launch(headless=HEADLESS)
+            context = await browser.new_context(accept_downloads=True)
+            await self._configurar_context(context)
+            try:
+                page = await context.new_page()
+                erro = await self._login(page, logger, id_consulta)
+                if isinstance(erro, dict):
+                    raise PoolSessaoErro(erro)
+                yield page
+            finally:
+                await context.close()
+                await browser.close()
+
+    async def saude(self) -> Dict[str, Any]:
+        """Health check do pool (não navega, apenas inspeciona os slots)"""
+        if not self.ativo:
+            return {"ativo": False, "tamanho": self.tamanho, "erro_inicio": self.erro_inicio}
+        conectados = sum(1 for s in self._slots if s.browser is not None and s.browser.is_connected())
+        livres = self._livres.qsize()
+        return {
+            "ativo": True,
+            "tamanho": self.tamanho,
+            "livres": livres,
+            "em_uso": self.tamanho - livres,
+            "navegadores_conectados": conectados,
+            "sessao_autenticada": self.storage_state is not None,
+            "logins": self.logins,
+            "ultimo_login": self.ultimo_login.isoformat() if self.ultimo_login else None,
+            "usos_por_slot": [s.usos for s in self._slots],
+            "bloqueio_recursos": self.bloquear_recursos,
+            "requisicoes_bloqueadas": self.requisicoes_bloqueadas,
+            "saudavel": conectados == self.tamanho,
+        }
@@ -0,0 +1,118 @@
+import os
+import json
+import glob
+import threading
+from typing import Optional, Dict, Any, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.utils.logger import info, warn
+
+CACHE_ATIVO = os.getenv("CACHE_TRATADOS", "true").lower() in ("1","true","yes","y")
+CACHE_DIR = os.getenv("CACHE_DIR", "cache_tratados")
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "2048"))
+CACHE_COMPRESSAO = os.getenv("CACHE_COMPRESSAO", "zstd")
+
+# Saída do tratar_df por lote em Parquet: CACHE_DIR/{row_id}_{hash do xlsx}.parquet.
+# A meta do tratamento e o arquivo de origem vão nos metadados do schema.
+_META_CHAVE = b"relatorio_meta"
+_lock_evicao = threading.Lock()
+
+
+def _caminho(row_id: int, hash_arquivo: str) -> str:
+    return os.path.join(CACHE_DIR, f"{row_id}_{hash_arquivo[:16]}.parquet")
+
+
+def obter(row_id: int, hash_arquivo: str = None) -> Optional[str]:
+    """Entrada do cache para o lote; sem hash devolve a mais recente do row_id"""
+    if not CACHE_ATIVO:
+        return None
+    if hash_arquivo:
+        caminho = _caminho(row_id, hash_arquivo)
+        return caminho if os.path.exists(caminho) else None
+    candidatos = glob.glob(os.path.join(CACHE_DIR, f"{row_id}_*.parquet"))
+    return max(candidatos, key=os.path.getmtime) if candidatos else None
+
+
+def _tabela(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # coluna object com tipos misturados (ex.: matrícula ora número ora texto): grava como texto
+        df = df.copy()
+        for col in df.columns:
+            try:
+                pa.array(df[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[col] = df[col].map(lambda v: None if v is None else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def salvar(row_id: int, hash_arquivo: str, df: pd.DataFrame, meta: Dict[str, Any], arquivo=None) -> Optional[str]:
+    if not CACHE_ATIVO:
+        return None
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    caminho = _caminho(row_id, hash_arquivo)
+    try:
+        tabela = _tabela(df)
+        extra = {"meta": meta, "arquivo": str(arquivo) if arquivo else None, "hash_arquivo": hash_arquivo}
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}),
+            _META_CHAVE: json.dumps(extra, ensure_ascii=False, default=str).encode("utf-8"),
+        })
+        pq.write_table(tabela, caminho + ".tmp", compression=CACHE_COMPRESSAO)
+        os.replace(caminho + ".tmp", caminho)
+    except Exception as e:
+        warn(f"Falha ao gravar cache do registro {row_id}: {e}")
+        return None
+    _evictar()
+    return caminho
+
+
+def carregar(caminho: str) -> Tuple[Optional[pd.DataFrame], Dict[str, Any]]:
+    """Lê a entrada (memory-mapped) no mesmo formato que o tratar_df entrega: object com None"""
+    try:
+        tabela = pq.read_table(caminho, memory_map=True)
+    except Exception as e:
+        warn(f"Cache ilegível ({caminho}), ignorando: {e}")
+        return None, {}
+    extra = json.loads((tabela.schema.metadata or {}).get(_META_CHAVE, b"{}"))
+    df = tabela.to_pandas()
+    df = df.astype(object).where(pd.notna(df), None)
+    # marca como usado recentemente para a evicção LRU
+    os.utime(caminho)
+    return df, extra
+
+
+def _evictar():
+    """Apaga as entradas menos usadas até o diretório caber em CACHE_MAX_MB"""
+    limite = CACHE_MAX_MB * 1024 * 1024
+    with _lock_evicao:
+        entradas = []
+        for caminho in glob.glob(os.path.join(CACHE_DIR, "*.parquet")):
+            try:
+                st = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            entradas.append((st.st_mtime, st.st_size, caminho))
+        total = sum(e[1] for e in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= limite:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+                info(f"Cache: removido {os.path.basename(caminho)} ({tamanho / 1024 / 1024:.1f} MB)")
+            except FileNotFoundError:
+                pass
+
+
+def resumo() -> Dict[str, Any]:
+    arquivos = glob.glob(os.path.join(CACHE_DIR, "*.parquet"))
+    tamanho = sum(os.path.getsize(a) for a in arquivos if os.path.exists(a))
+    return {
+        "ativo": CACHE_ATIVO,
+        "entradas": len(arquivos),
+        "tamanho_mb": round(tamanho / 1024 / 1024, 2),
+        "limite_mb": CACHE_MAX_MB,
+    }
@@ -0,0 +1,75 @@
+import os
+import json
+from datetime import datetime, timedelta
+from contextlib import suppress
+from typing import Dict, Any
+from app.utils.logger import warn
+from app.utils.hash_utils import hash_arquivo
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "checkpoints")
+CHECKPOINT_TTL_HORAS = float(os.getenv("CHECKPOINT_TTL_HORAS", "24"))
+
+# Um checkpoint por lote (row_id) em CHECKPOINT_DIR/{row_id}.json:
+#   arquivo / hash_arquivo      -> download concluído
+#   linhas_inseridas            -> linhas confirmadas no MySQL (commit de cada chunk)
+# O DataFrame tratado fica no cache Parquet (cache_service), chaveado pelo mesmo hash.
+
+
+def _caminho(row_id: int) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{row_id}.json")
+
+
+def carregar(row_id: int) -> Dict[str, Any]:
+    """Checkpoint do lote, já validado: etapas cujo artefato sumiu ou mudou são descartadas"""
+    try:
+        with open(_caminho(row_id), encoding="utf-8") as f:
+            cp = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        warn(f"Checkpoint do registro {row_id} ilegível, ignorando: {e}")
+        return {}
+
+    atualizado = datetime.fromisoformat(cp.get("atualizado_em", "1970-01-01T00:00:00"))
+    if datetime.now() - atualizado > timedelta(hours=CHECKPOINT_TTL_HORAS):
+        limpar(row_id)
+        return {}
+
+    arquivo = cp.get("arquivo")
+    if not arquivo or not os.path.exists(arquivo) or hash_arquivo(arquivo) != cp.get("hash_arquivo"):
+        limpar(row_id)
+        return {}
+    return cp
+
+
+def salvar(row_id: int, **campos) -> Dict[str, Any]:
+    """Mescla os campos no checkpoint do lote (escrita atômica)"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    cp = {}
+    with suppress(FileNotFoundError, ValueError):
+        with open(_caminho(row_id), encoding="utf-8") as f:
+            cp = json.load(f)
+    cp.update(campos)
+    cp["row_id"] = row_id
+    cp["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    tmp = _caminho(row_id) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f, ensure_ascii=False, default=str)
+    os.replace(tmp, _caminho(row_id))
+    return cp
+
+
+def registrar_download(row_id: int, arquivo) -> str:
+    """Novo arquivo baixado: grava caminho + hash e zera o progresso da inserção"""
+    h = hash_arquivo(arquivo)
+    salvar(row_id, arquivo=str(arquivo), hash_arquivo=h, linhas_inseridas=0)
+    return h
+
+
+def registrar_insercao(row_id: int, linhas_inseridas: int):
+    salvar(row_id, linhas_inseridas=linhas_inseridas)
+
+
+def limpar(row_id: int):
+    with suppress(FileNotFoundError):
+        os.remove(_caminho(row_id))
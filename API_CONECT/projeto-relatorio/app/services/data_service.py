@@ -1,178 +1,822 @@
-import os
-import re
-import pandas as pd
-import numpy as np
-import mysql.connector
-from typing import Dict, Any, Tuple, List
-from app.utils.logger import ProcessLogger
-
-DB_HOST = os.getenv("DB_HOST")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
-
-EXPECTED_COLS = [
-    'lote','cpf','matricula','nome','nascimento','data_admissao',
-    'renda','valor_base_margem','valor_margem_disponivel','valor_parcela_clt',
-    'cnpj_empresa','elegivel_clt','cnae','erro_simulacao','data_criacao',
-    'data_modificacao','categoria_trabalhador','sexo','nome_empregador',
-    'nome_mae','profissao','cnae_descricao','emprestimos_legados',
-    'emprestimos_ativos_suspensos','banco_clt','prazo_maximo_clt',
-    'valor_liberado_clt','plataforma_id','manychat_id','disparo_lote',
-    'manychat_key','simulado'
-]
-
-RENAME_MAP = {
-    'Lote': 'lote','CPF': 'cpf','Matrícula': 'matricula','Nome': 'nome',
-    'Data Nascimento': 'nascimento','Data Admissão': 'data_admissao',
-    'Valor Renda': 'renda','Valor Base Margem': 'valor_base_margem',
-    'Valor Margem Disponível': 'valor_margem_disponivel',
-    'Valor Máximo Prestação': 'valor_parcela_clt','CNPJ Empresa': 'cnpj_empresa',
-    'Elegível': 'elegivel_clt','CNAE': 'cnae','Erro': 'erro_simulacao',
-    'Data Criação': 'data_criacao','Data Modificação': 'data_modificacao',
-    'Código Categoria Trabalhador': 'categoria_trabalhador','Sexo': 'sexo',
-    'Nome Empregador': 'nome_empregador','Nome Mãe': 'nome_mae',
-    'CBO Descrição': 'profissao','CNAE Descrição': 'cnae_descricao',
-    'Empréstimos Legados': 'emprestimos_legados',
-    'Qtd Empréstimos Ativos Suspensos': 'emprestimos_ativos_suspensos',
-    'Prazo Máximo': 'prazo_maximo_clt','Valor Liberado': 'valor_liberado_clt'
-}
-
-DECIMAL_LIMIT = 99999999.99
-DECIMAL_COLS = ['renda','valor_base_margem','valor_margem_disponivel','valor_parcela_clt','valor_liberado_clt']
-
-def erro_retorno(id_consulta, titulo, etapa, mensagem):
-    return {
-        "id": id_consulta,
-        "titulo": titulo,
-        "etapa": etapa,
-        "mensagem": mensagem
-    }
-
-def tratar_df(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-    try:
-        if logger:
-            logger.data("Ajustando colunas e limpando dados...")
-        else:
-            print("[DATA] Ajustando colunas e limpando dados...")
-            
-        original = len(df)
-
-        # renomear
-        df = df.rename(columns=RENAME_MAP)
-
-        # garantir todas as colunas esperadas
-        for col in EXPECTED_COLS:
-            if col not in df.columns:
-                df[col] = None
-        df = df[EXPECTED_COLS]
-
-        # CPF: apenas dígitos + zero-pad
-        if 'cpf' in df.columns:
-            df['cpf'] = (
-                df['cpf'].astype(str)
-                .str.replace(r'\D', '', regex=True)
-                .str.zfill(11)
-                .where(lambda s: s != '00000000000', np.nan)
-            )
-            # Excluir linhas onde CPF é nulo, vazio, 'nan', 'none', etc.
-            df = df[df['cpf'].notnull() & (df['cpf'] != '') & (df['cpf'].str.lower() != 'nan') & (df['cpf'].str.lower() != 'none')]
-
-        # datas
-        for col in ['nascimento','data_admissao','data_criacao','data_modificacao']:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True).dt.date
-
-        # booleanos → 1/0
-        if 'elegivel_clt' in df.columns:
-            df['elegivel_clt'] = df['elegivel_clt'].map({True:1, False:0, 'True':1, 'False':0})
-
-        # numéricos decimais seguros
-        for col in DECIMAL_COLS:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                df.loc[df[col].abs() > DECIMAL_LIMIT, col] = None
-
-        # strings vazias -> None
-        for col in df.columns:
-            if df[col].dtype == 'O':
-                df[col] = df[col].replace({'': None, 'nan': None, 'NaN': None, 'None': None})
-
-        # deduplicar por CPF (mantém a última)
-        antes = len(df)
-        df = df.drop_duplicates(subset=['cpf'], keep='last')
-        dedup = antes - len(df)
-        if dedup > 0:
-            if logger:
-                logger.warning(f"Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
-            else:
-                print(f"[WARNING] Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
-
-        # todos NaN/NaT → None
-        df = df.astype(object).where(pd.notna(df), None)
-
-        if logger:
-            logger.success(f"Excel: {original} linhas | Após tratamento: {len(df)} linhas")
-        else:
-            print(f"[SUCCESS] Excel: {original} linhas | Após tratamento: {len(df)} linhas")
-            
-        return df, {"linhas_excel": original, "linhas_tratadas": len(df), "cpfs_dedup": dedup}
-    except FileNotFoundError as e:
-        return erro_retorno(id_consulta, "Arquivo não encontrado", "tratamento_dados", str(e)), {}
-    except pd.errors.EmptyDataError as e:
-        return erro_retorno(id_consulta, "Arquivo vazio ou corrompido", "tratamento_dados", str(e)), {}
-    except Exception as e:
-        return erro_retorno(id_consulta, "Erro no processo de tratamento", "tratamento_dados", str(e)), {}
-
-def inserir_mysql(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None) -> Dict[str, Any]:
-    if logger:
-        logger.db("Preparando inserção no MySQL...")
-    else:
-        print("[DB] Preparando inserção no MySQL...")
-    
-    try:
-        conn = mysql.connector.connect(
-            host=DB_HOST, database=DB_NAME,
-            user=DB_USER, password=DB_PASS,
-            charset='utf8mb4', collation='utf8mb4_unicode_ci'
-        )
-        cur = conn.cursor()
-
-        colunas = list(df.columns)
-        placeholders = ','.join(['%s']*len(colunas))
-        colunas_str = ','.join([f'`{c}`' for c in colunas])
-        updates = ','.join([f"`{c}`=VALUES(`{c}`)" for c in colunas if c != 'cpf'])
-
-        sql = f"""
-        INSERT INTO consulta_dia_clt ({colunas_str})
-        VALUES ({placeholders})
-        ON DUPLICATE KEY UPDATE {updates}
-        """
-
-        # métricas de novos / existentes
-        cpfs = [str(x) for x in df['cpf'].tolist() if x]
-        existentes = set()
-        if cpfs:
-            placeholders_in = ",".join(["%s"] * len(cpfs))
-            cur.execute(f"SELECT cpf FROM consulta_dia_clt WHERE cpf IN ({placeholders_in})", cpfs)
-            existentes = {row[0] for row in cur.fetchall()}
-
-        vals = [tuple(row[c] for c in colunas) for _, row in df.iterrows()]
-        cur.executemany(sql, vals)
-        conn.commit()
-        rowcount = cur.rowcount
-
-        novos = len([c for c in cpfs if c not in existentes])
-        atualizados = len(cpfs) - novos
-
-        if logger:
-            logger.success(f"Inseridos/Atualizados com sucesso. Enviados: {len(df)} | novos: {novos} | atualizados: {atualizados}")
-        else:
-            print(f"[SUCCESS] Inseridos/Atualizados com sucesso. Enviados: {len(df)} | novos: {novos} | atualizados: {atualizados}")
-            
-        cur.close(); conn.close()
-        return {"enviados": len(df), "ok": True}
-    except mysql.connector.Error as e:
-        return erro_retorno(id_consulta, "Erro na conexão ou inserção de dados", "insercao_dados", str(e))
-    except Exception as e:
-        return erro_retorno(id_consulta, "Erro inesperado na inserção de dados", "insercao_dados", str(e))
+import os
+import re
+import csv
+import time
+import uuid
+import tempfile
+import pandas as pd
+import numpy as np
+import mysql.connector
+from itertools import islice
+from datetime import date, datetime
+from typing import Dict, Any, Tuple, List, Optional, Set, Iterable, Iterator, Callable
+from openpyxl import load_workbook
+from app.utils.logger import ProcessLogger
+from app.services.db_service import db_conexao, DB_LOCAL_INFILE_DIR
+from app.services import metricas_service as metricas
+
+EXPECTED_COLS = [
+    'lote','cpf','matricula','nome','nascimento','data_admissao',
+    'renda','valor_base_margem','valor_margem_disponivel','valor_parcela_clt',
+    'cnpj_empresa','elegivel_clt','cnae','erro_simulacao','data_criacao',
+    'data_modificacao','categoria_trabalhador','sexo','nome_empregador',
+    'nome_mae','profissao','cnae_descricao','emprestimos_legados',
+    'emprestimos_ativos_suspensos','banco_clt','prazo_maximo_clt',
+    'valor_liberado_clt','plataforma_id','manychat_id','disparo_lote',
+    'manychat_key','simulado'
+]
+
+RENAME_MAP = {
+    'Lote': 'lote','CPF': 'cpf','Matrícula': 'matricula','Nome': 'nome',
+    'Data Nascimento': 'nascimento','Data Admissão': 'data_admissao',
+    'Valor Renda': 'renda','Valor Base Margem': 'valor_base_margem',
+    'Valor Margem Disponível': 'valor_margem_disponivel',
+    'Valor Máximo Prestação': 'valor_parcela_clt','CNPJ Empresa': 'cnpj_empresa',
+    'Elegível': 'elegivel_clt','CNAE': 'cnae','Erro': 'erro_simulacao',
+    'Data Criação': 'data_criacao','Data Modificação': 'data_modificacao',
+    'Código Categoria Trabalhador': 'categoria_trabalhador','Sexo': 'sexo',
+    'Nome Empregador': 'nome_empregador','Nome Mãe': 'nome_mae',
+    'CBO Descrição': 'profissao','CNAE Descrição': 'cnae_descricao',
+    'Empréstimos Legados': 'emprestimos_legados',
+    'Qtd Empréstimos Ativos Suspensos': 'emprestimos_ativos_suspensos',
+    'Prazo Máximo': 'prazo_maximo_clt','Valor Liberado': 'valor_liberado_clt'
+}
+
+DECIMAL_LIMIT = 99999999.99
+DECIMAL_COLS = ['renda','valor_base_margem','valor_margem_disponivel','valor_parcela_clt','valor_liberado_clt']
+
+INSERT_CHUNK_SIZE = int(os.getenv("INSERT_CHUNK_SIZE", "5000"))
+INSERCAO_MODO = os.getenv("INSERCAO_MODO", "executemany")
+EXCEL_STREAMING = os.getenv("EXCEL_STREAMING", "false").lower() in ("1","true","yes","y")
+EXCEL_CHUNK_ROWS = int(os.getenv("EXCEL_CHUNK_ROWS", "20000"))
+# tratar_df_rapido (mesmo resultado do tratar_df, vetorizado; ganho medido ~1.1-1.3x); padrão = tratar_df original
+TRATAMENTO_RAPIDO = os.getenv("TRATAMENTO_RAPIDO", "false").lower() in ("1","true","yes","y")
+
+DATE_COLS = ['nascimento','data_admissao','data_criacao','data_modificacao']
+NULOS_TEXTO = ['', 'nan', 'NaN', 'None']
+
+def erro_retorno(id_consulta, titulo, etapa, mensagem):
+    return {
+        "id": id_consulta,
+        "titulo": titulo,
+        "etapa": etapa,
+        "mensagem": mensagem
+    }
+
+def _valor_canonico(v) -> str:
+    """Texto de um valor independente do dtype em que a coluna foi lida: 24, 24.0 e np.int64(24) → '24'"""
+    if isinstance(v, (bool, np.bool_)):
+        return '1' if v else '0'
+    if isinstance(v, (int, np.integer)):
+        return str(int(v))
+    if isinstance(v, (float, np.floating)):
+        f = float(v)
+        return str(int(f)) if f.is_integer() else repr(f)
+    if isinstance(v, datetime):
+        return pd.Timestamp(v).isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v)
+
+def _como_texto(s: pd.Series) -> np.ndarray:
+    """Valores canônicos da coluna (nulos → 'None'), com _valor_canonico uma vez por valor distinto"""
+    valores = s.to_numpy(dtype=object)
+    nulos = pd.isna(valores)
+    if not nulos.any():
+        codigos, unicos = pd.factorize(valores)
+        return _textos_canonicos(unicos)[codigos]
+    textos = np.empty(len(valores), dtype=object)
+    textos[nulos] = 'None'
+    preenchidos = valores[~nulos]
+    if len(preenchidos):
+        # factorize junta valores iguais de tipos diferentes (24 e 24.0): todos têm o mesmo texto canônico
+        codigos, unicos = pd.factorize(preenchidos)
+        textos[~nulos] = _textos_canonicos(unicos)[codigos]
+    return textos
+
+def _textos_canonicos(unicos: np.ndarray) -> np.ndarray:
+    """_valor_canonico de cada valor, vetorizado quando a coluna é só texto ou só número"""
+    tipo = pd.api.types.infer_dtype(unicos, skipna=False)
+    if tipo == 'string':
+        return unicos.astype(object)
+    if tipo in ('integer', 'floating', 'mixed-integer-float'):
+        f = unicos.astype(np.float64)
+        # inteiros exatos no float64 saem pelo numpy, frações pelo repr e inteiros enormes pelo _valor_canonico
+        integrais = np.isfinite(f) & (f == np.floor(f))
+        inteiros = integrais & (np.abs(f) < 2**53)
+        textos = np.empty(len(f), dtype=object)
+        textos[inteiros] = f[inteiros].astype(np.int64).astype(str)
+        textos[~integrais] = [repr(v) for v in f[~integrais].tolist()]
+        enormes = integrais & ~inteiros
+        if enormes.any():
+            textos[enormes] = [_valor_canonico(v) for v in unicos[enormes]]
+        return textos
+    return np.array([_valor_canonico(u) for u in unicos], dtype=object)
+
+def hash_linhas(df: pd.DataFrame) -> pd.Series:
+    """
+    Impressão digital estável (16 hex) das colunas tratadas de cada linha, usada pelo modo delta.
+    Depende só dos valores: a mesma linha dá o mesmo hash qualquer que seja o dtype inferido na leitura.
+    """
+    colunas = [c for c in EXPECTED_COLS if c in df.columns]
+    texto = pd.DataFrame({c: _como_texto(df[c]) for c in colunas}, index=df.index)
+    return pd.util.hash_pandas_object(texto, index=False).map("{:016x}".format)
+
+def tratar_df(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None, cpfs_vistos: Optional[Set[str]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    try:
+        if logger:
+            logger.data("Ajustando colunas e limpando dados...")
+        else:
+            print("[DATA] Ajustando colunas e limpando dados...")
+            
+        original = len(df)
+
+        # renomear
+        df = df.rename(columns=RENAME_MAP)
+
+        # garantir todas as colunas esperadas
+        for col in EXPECTED_COLS:
+            if col not in df.columns:
+                df[col] = None
+        df = df[EXPECTED_COLS]
+
+        # CPF: apenas dígitos + zero-pad
+        if 'cpf' in df.columns:
+            df['cpf'] = (
+                df['cpf'].astype(str)
+                .str.replace(r'\D', '', regex=True)
+                .str.zfill(11)
+                .where(lambda s: s != '00000000000', np.nan)
+            )
+            # Excluir linhas onde CPF é nulo, vazio, 'nan', 'none', etc.
+            df = df[df['cpf'].notnull() & (df['cpf'] != '') & (df['cpf'].str.lower() != 'nan') & (df['cpf'].str.lower() != 'none')]
+
+        # datas
+        for col in ['nascimento','data_admissao','data_criacao','data_modificacao']:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True).dt.date
+
+        # booleanos → 1/0
+        if 'elegivel_clt' in df.columns:
+            df['elegivel_clt'] = df['elegivel_clt'].map({True:1, False:0, 'True':1, 'False':0})
+
+        # numéricos decimais seguros
+        for col in DECIMAL_COLS:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+                df.loc[df[col].abs() > DECIMAL_LIMIT, col] = None
+
+        # strings vazias -> None
+        for col in df.columns:
+            if df[col].dtype == 'O':
+                df[col] = df[col].replace({'': None, 'nan': None, 'NaN': None, 'None': None})
+
+        # deduplicar por CPF (mantém a última)
+        antes = len(df)
+        df = df.drop_duplicates(subset=['cpf'], keep='last')
+        dedup = antes - len(df)
+        if dedup > 0:
+            if logger:
+                logger.warning(f"Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
+            else:
+                print(f"[WARNING] Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
+
+        # modo streaming: CPFs que já apareceram em chunks anteriores (a linha mais nova sobrescreve no upsert)
+        ja_vistos = None
+        if cpfs_vistos is not None:
+            ja_vistos = int(df['cpf'].isin(cpfs_vistos).sum())
+            cpfs_vistos.update(df['cpf'].tolist())
+
+        # todos NaN/NaT → None
+        df = df.astype(object).where(pd.notna(df), None)
+        df['hash_linha'] = hash_linhas(df)
+
+        if logger:
+            logger.success(f"Excel: {original} linhas | Após tratamento: {len(df)} linhas")
+        else:
+            print(f"[SUCCESS] Excel: {original} linhas | Após tratamento: {len(df)} linhas")
+            
+        meta = {"linhas_excel": original, "linhas_tratadas": len(df), "cpfs_dedup": dedup}
+        if ja_vistos is not None:
+            meta["cpfs_ja_vistos"] = ja_vistos
+        return df, meta
+    except FileNotFoundError as e:
+        return erro_retorno(id_consulta, "Arquivo não encontrado", "tratamento_dados", str(e)), {}
+    except pd.errors.EmptyDataError as e:
+        return erro_retorno(id_consulta, "Arquivo vazio ou corrompido", "tratamento_dados", str(e)), {}
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro no processo de tratamento", "tratamento_dados", str(e)), {}
+
+def _normalizar_cpf(s: pd.Series) -> pd.Series:
+    """Mesmo resultado do astype(str) → só dígitos → zfill(11) do tratar_df, sem regex nas linhas que já são só dígitos"""
+    if s.dtype.kind in 'iu' and not s.hasnans:
+        # inclui Int64 (nullable) sem NA; com NA vai pelo texto, onde '<NA>' vira CPF vazio como no tratar_df
+        numeros = s.to_numpy(dtype=np.int64 if s.dtype.kind == 'i' else np.uint64)
+        digitos = np.char.mod('%011d', np.abs(numeros))
+        return pd.Series(digitos, index=s.index, dtype=object).where(numeros != 0, np.nan)
+    texto = s.astype(str)
+    sujos = ~texto.str.isdecimal()
+    if sujos.any():
+        texto = texto.copy()
+        texto[sujos] = texto[sujos].str.replace(r'\D', '', regex=True)
+    texto = texto.str.zfill(11)
+    return texto.where(texto != '00000000000', np.nan)
+
+def _converter_datas(s: pd.Series) -> pd.Series:
+    """to_datetime(dayfirst) + .date calculados uma vez por valor distinto e espalhados pelos códigos"""
+    codigos, unicos = pd.factorize(s)
+    convertidos = pd.to_datetime(pd.Series(unicos), errors='coerce', dayfirst=True).dt.date
+    # código -1 (nulo) cai no NaT acrescentado no fim
+    valores = np.append(convertidos.to_numpy(dtype=object), pd.NaT)
+    return pd.Series(valores[codigos], index=s.index, dtype=object)
+
+def _valores_para_db(df: pd.DataFrame) -> pd.DataFrame:
+    """Passo único de nulos: NaN/NaT e textos vazios ('', 'nan', 'None') viram None, tudo em object"""
+    colunas = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == 'O' and s.isin(NULOS_TEXTO).any():
+            # só as colunas que têm texto vazio pagam o replace (que pode reinferir o dtype, como no tratar_df)
+            s = s.replace(dict.fromkeys(NULOS_TEXTO))
+        valores = s.to_numpy(dtype=object, copy=True)
+        valores[pd.isna(valores)] = None
+        colunas[col] = valores
+    return pd.DataFrame(colunas, index=df.index, columns=df.columns)
+
+def tratar_df_rapido(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None, cpfs_vistos: Optional[Set[str]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Mesma saída do tratar_df com menos passadas: CPF via numpy/sem regex quando já é numérico,
+    datas convertidas por valor distinto, e uma só normalização de nulos no final.
+    """
+    try:
+        if logger:
+            logger.data("Ajustando colunas e limpando dados...")
+        else:
+            print("[DATA] Ajustando colunas e limpando dados...")
+
+        original = len(df)
+        df = df.rename(columns=RENAME_MAP)
+        for col in EXPECTED_COLS:
+            if col not in df.columns:
+                df[col] = None
+        df = df[EXPECTED_COLS]
+
+        cpf = _normalizar_cpf(df['cpf'])
+        manter = cpf.notna().to_numpy()
+        df = df[manter].copy() if not manter.all() else df.copy()
+        df['cpf'] = cpf[manter]
+
+        for col in DATE_COLS:
+            df[col] = _converter_datas(df[col])
+
+        df['elegivel_clt'] = df['elegivel_clt'].map({True:1, False:0, 'True':1, 'False':0})
+
+        for col in DECIMAL_COLS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            df.loc[df[col].abs() > DECIMAL_LIMIT, col] = None
+
+        antes = len(df)
+        df = df.drop_duplicates(subset=['cpf'], keep='last')
+        dedup = antes - len(df)
+        if dedup > 0:
+            if logger:
+                logger.warning(f"Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
+            else:
+                print(f"[WARNING] Removidos {dedup} CPFs duplicados (de {antes} → {len(df)})")
+
+        ja_vistos = None
+        if cpfs_vistos is not None:
+            ja_vistos = int(df['cpf'].isin(cpfs_vistos).sum())
+            cpfs_vistos.update(df['cpf'].tolist())
+
+        df = _valores_para_db(df)
+        df['hash_linha'] = hash_linhas(df)
+
+        if logger:
+            logger.success(f"Excel: {original} linhas | Após tratamento: {len(df)} linhas")
+        else:
+            print(f"[SUCCESS] Excel: {original} linhas | Após tratamento: {len(df)} linhas")
+
+        meta = {"linhas_excel": original, "linhas_tratadas": len(df), "cpfs_dedup": dedup}
+        if ja_vistos is not None:
+            meta["cpfs_ja_vistos"] = ja_vistos
+        return df, meta
+    except FileNotFoundError as e:
+        return erro_retorno(id_consulta, "Arquivo não encontrado", "tratamento_dados", str(e)), {}
+    except pd.errors.EmptyDataError as e:
+        return erro_retorno(id_consulta, "Arquivo vazio ou corrompido", "tratamento_dados", str(e)), {}
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro no processo de tratamento", "tratamento_dados", str(e)), {}
+
+def tratar(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None, cpfs_vistos: Optional[Set[str]] = None):
+    """Motor de tratamento configurado (TRATAMENTO_RAPIDO)"""
+    motor = tratar_df_rapido if TRATAMENTO_RAPIDO else tratar_df
+    return motor(df, logger, id_consulta, cpfs_vistos=cpfs_vistos)
+
+def inicio_valido(inicio, total: Optional[int] = None) -> bool:
+    """Offset de retomada aceitável: inteiro entre 0 e o total de linhas (sem total, como no streaming, só >= 0)"""
+    if not isinstance(inicio, int) or isinstance(inicio, bool) or inicio < 0:
+        return False
+    return total is None or inicio <= total
+
+def _linhas_em_chunks(df: pd.DataFrame, tamanho: int):
+    """Gera listas de tuplas direto dos arrays das colunas (sem montar uma Series por linha)"""
+    linhas = df.itertuples(index=False, name=None)
+    while True:
+        chunk = list(islice(linhas, tamanho))
+        if not chunk:
+            return
+        yield chunk
+
+def _contar_existentes(cur, cpfs: List[str]) -> int:
+    """Quantos desses CPFs já existem em consulta_dia_clt (lista limitada ao tamanho de um chunk)"""
+    if not cpfs:
+        return 0
+    placeholders_in = ",".join(["%s"] * len(cpfs))
+    cur.execute(f"SELECT COUNT(*) FROM consulta_dia_clt WHERE cpf IN ({placeholders_in})", cpfs)
+    return cur.fetchone()[0]
+
+def _sql_upsert(colunas: List[str]) -> str:
+    placeholders = ','.join(['%s']*len(colunas))
+    colunas_str = ','.join([f'`{c}`' for c in colunas])
+    updates = ','.join([f"`{c}`=VALUES(`{c}`)" for c in colunas if c != 'cpf'])
+    return f"""
+    INSERT INTO consulta_dia_clt ({colunas_str})
+    VALUES ({placeholders})
+    ON DUPLICATE KEY UPDATE {updates}
+    """
+
+def inserir_mysql(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None, chunk_size: int = INSERT_CHUNK_SIZE,
+                  inicio: int = 0, ao_commit: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Upsert em chunks. `inicio` pula as linhas já confirmadas numa tentativa anterior e
+    `ao_commit(linhas_confirmadas)` é chamado após o commit de cada chunk (checkpoint).
+    """
+    if logger:
+        logger.db("Preparando inserção no MySQL...")
+    else:
+        print("[DB] Preparando inserção no MySQL...")
+    if not inicio_valido(inicio, len(df)):
+        # offset corrompido ou de outro arquivo: reenviar tudo é seguro (upsert), pular linhas não
+        msg = f"Offset de retomada inválido ({inicio!r}) para {len(df)} linhas, inserindo desde o início"
+        if logger:
+            logger.warning(msg)
+        else:
+            print(f"[WARNING] {msg}")
+        inicio = 0
+    if inicio:
+        msg = f"Retomando inserção a partir da linha {inicio} de {len(df)}"
+        if logger:
+            logger.db(msg)
+        else:
+            print(f"[DB] {msg}")
+
+    enviados = novos = atualizados = 0
+    try:
+        with db_conexao(logger) as conn:
+            cur = conn.cursor()
+            try:
+                colunas = list(df.columns)
+                sql = _sql_upsert(colunas)
+                idx_cpf = colunas.index('cpf')
+
+                # envio em chunks, cada um na sua transação (pacotes menores e locks curtos)
+                inicio_total = time.perf_counter()
+                chunks = []
+                for vals in _linhas_em_chunks(df.iloc[inicio:] if inicio else df, chunk_size):
+                    t0 = time.perf_counter()
+                    conn.start_transaction()
+                    # métricas de novos / existentes: consulta limitada ao chunk, dentro da mesma transação
+                    existentes = _contar_existentes(cur, [str(v[idx_cpf]) for v in vals if v[idx_cpf]])
+                    duracao_lookup = time.perf_counter() - t0
+                    metricas.observar("consulta_cpfs", duracao_lookup)
+                    with metricas.medir("executemany"):
+                        cur.executemany(sql, vals)
+                    with metricas.medir("commit"):
+                        conn.commit()
+                    duracao = time.perf_counter() - t0
+                    enviados += len(vals)
+                    if ao_commit:
+                        ao_commit(inicio + enviados)
+                    atualizados += existentes
+                    novos += len(vals) - existentes
+                    linhas_s = len(vals) / duracao if duracao > 0 else float(len(vals))
+                    chunks.append({"linhas": len(vals), "segundos": round(duracao, 3), "segundos_lookup": round(duracao_lookup, 3),
+                                   "linhas_por_segundo": round(linhas_s, 1), "novos": len(vals) - existentes, "atualizados": existentes})
+                    msg = f"Chunk {len(chunks)}: {len(vals)} linhas em {duracao:.2f}s ({linhas_s:.0f} linhas/s) | total {inicio + enviados}/{len(df)}"
+                    if logger:
+                        logger.db(msg)
+                    else:
+                        print(f"[DB] {msg}")
+                duracao_total = time.perf_counter() - inicio_total
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+        if logger:
+            logger.success(f"Inseridos/Atualizados com sucesso. Enviados: {enviados} | novos: {novos} | atualizados: {atualizados}")
+        else:
+            print(f"[SUCCESS] Inseridos/Atualizados com sucesso. Enviados: {enviados} | novos: {novos} | atualizados: {atualizados}")
+            
+        return {
+            "enviados": enviados,
+            "ok": True,
+            "retomado_de": inicio,
+            "novos": novos,
+            "atualizados": atualizados,
+            "chunk_size": chunk_size,
+            "duracao_segundos": round(duracao_total, 3),
+            "linhas_por_segundo": round(enviados / duracao_total, 1) if duracao_total > 0 else None,
+            "chunks": chunks
+        }
+    except mysql.connector.Error as e:
+        return erro_retorno(id_consulta, "Erro na conexão ou inserção de dados", "insercao_dados", f"{e} (linhas já confirmadas: {inicio + enviados})")
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro inesperado na inserção de dados", "insercao_dados", f"{e} (linhas já confirmadas: {inicio + enviados})")
+
+def _valor_load_data(v):
+    """Converte um valor para o formato de texto do LOAD DATA (NULL = \\N, escape com barra invertida)"""
+    if v is None:
+        return '\\N'
+    if isinstance(v, str):
+        return v.replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r')
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, (datetime, date)):
+        return v.isoformat(sep=' ') if isinstance(v, datetime) else v.isoformat()
+    return v
+
+def inserir_mysql_bulk(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None) -> Dict[str, Any]:
+    """
+    Escrita alternativa para lotes grandes: CSV temporário → LOAD DATA LOCAL INFILE numa tabela
+    temporária de staging → um único INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+    """
+    if logger:
+        logger.db("Preparando inserção bulk (LOAD DATA) no MySQL...")
+    else:
+        print("[DB] Preparando inserção bulk (LOAD DATA) no MySQL...")
+
+    inicio_total = time.perf_counter()
+    colunas = list(df.columns)
+    colunas_str = ','.join([f'`{c}`' for c in colunas])
+    updates = ','.join([f"`{c}`=VALUES(`{c}`)" for c in colunas if c != 'cpf'])
+    staging = f"stg_consulta_dia_clt_{uuid.uuid4().hex[:12]}"
+    tempos = {}
+
+    fd, csv_path = tempfile.mkstemp(prefix=f"lote_{id_consulta or 'x'}_", suffix=".csv", dir=DB_LOCAL_INFILE_DIR)
+    try:
+        inicio = time.perf_counter()
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            for linha in df.itertuples(index=False, name=None):
+                writer.writerow([_valor_load_data(v) for v in linha])
+        tempos["csv"] = round(time.perf_counter() - inicio, 3)
+
+        with db_conexao(logger) as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(f"CREATE TEMPORARY TABLE `{staging}` LIKE consulta_dia_clt")
+
+                inicio = time.perf_counter()
+                conn.start_transaction()
+                cur.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE `{staging}`
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({colunas_str})
+                """, (csv_path,))
+                tempos["load_data"] = round(time.perf_counter() - inicio, 3)
+
+                # novos / atualizados via join da staging com a tabela final (antes do merge)
+                inicio = time.perf_counter()
+                cur.execute(f"SELECT COUNT(*) FROM `{staging}` s JOIN consulta_dia_clt c ON c.cpf = s.cpf")
+                atualizados = cur.fetchone()[0]
+                cur.execute(f"SELECT COUNT(*) FROM `{staging}`")
+                carregados = cur.fetchone()[0]
+                novos = carregados - atualizados
+                tempos["lookup"] = round(time.perf_counter() - inicio, 3)
+
+                inicio = time.perf_counter()
+                cur.execute(f"""
+                INSERT INTO consulta_dia_clt ({colunas_str})
+                SELECT {colunas_str} FROM `{staging}`
+                ON DUPLICATE KEY UPDATE {updates}
+                """)
+                conn.commit()
+                tempos["merge"] = round(time.perf_counter() - inicio, 3)
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                # tabela temporária vive na conexão, que volta para o pool
+                cur.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging}`")
+                cur.close()
+
+        duracao_total = time.perf_counter() - inicio_total
+        tempos["total"] = round(duracao_total, 3)
+        for etapa, nome in (("csv", "bulk_csv"), ("load_data", "bulk_load_data"), ("lookup", "consulta_cpfs"), ("merge", "bulk_merge")):
+            metricas.observar(nome, tempos[etapa])
+        if logger:
+            logger.success(f"Inserção bulk concluída. Enviados: {len(df)} | novos: {novos} | atualizados: {atualizados} | tempos: {tempos}")
+        else:
+            print(f"[SUCCESS] Inserção bulk concluída. Enviados: {len(df)} | novos: {novos} | atualizados: {atualizados} | tempos: {tempos}")
+        return {
+            "enviados": len(df),
+            "ok": True,
+            "novos": novos,
+            "atualizados": atualizados,
+            "modo": "bulk",
+            "duracao_segundos": round(duracao_total, 3),
+            "linhas_por_segundo": round(len(df) / duracao_total, 1) if duracao_total > 0 else None,
+            "tempos": tempos
+        }
+    except mysql.connector.Error as e:
+        return erro_retorno(id_consulta, "Erro no LOAD DATA/merge da inserção bulk", "insercao_dados", str(e))
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro inesperado na inserção bulk", "insercao_dados", str(e))
+    finally:
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+def _hashes_gravados(cur, cpfs: List[str]) -> Dict[str, Optional[str]]:
+    """hash_linha atual de cada CPF do chunk que já existe em consulta_dia_clt"""
+    if not cpfs:
+        return {}
+    placeholders_in = ",".join(["%s"] * len(cpfs))
+    cur.execute(f"SELECT cpf, hash_linha FROM consulta_dia_clt WHERE cpf IN ({placeholders_in})", cpfs)
+    return dict(cur.fetchall())
+
+def inserir_mysql_delta(df: pd.DataFrame, logger: ProcessLogger = None, id_consulta=None,
+                        chunk_size: int = INSERT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Upsert incremental: compara o hash_linha de cada CPF com o gravado em consulta_dia_clt e
+    envia só os CPFs novos ou alterados. Reenviar o mesmo lote não reescreve nada (tudo ignorado).
+    """
+    if logger:
+        logger.db("Preparando inserção delta no MySQL...")
+    else:
+        print("[DB] Preparando inserção delta no MySQL...")
+
+    if 'hash_linha' not in df.columns:
+        # DataFrame tratado antes da coluna existir (ex.: entrada antiga do cache)
+        df = df.assign(hash_linha=hash_linhas(df))
+
+    enviados = novos = atualizados = ignorados = 0
+    try:
+        with db_conexao(logger) as conn:
+            cur = conn.cursor()
+            try:
+                colunas = list(df.columns)
+                sql = _sql_upsert(colunas)
+                idx_cpf = colunas.index('cpf')
+                idx_hash = colunas.index('hash_linha')
+
+                inicio_total = time.perf_counter()
+                chunks = []
+                for vals in _linhas_em_chunks(df, chunk_size):
+                    inicio = time.perf_counter()
+                    conn.start_transaction()
+                    gravados = _hashes_gravados(cur, [v[idx_cpf] for v in vals if v[idx_cpf]])
+                    duracao_lookup = time.perf_counter() - inicio
+                    metricas.observar("consulta_cpfs", duracao_lookup)
+                    enviar = []
+                    chunk_novos = chunk_atualizados = 0
+                    for v in vals:
+                        if v[idx_cpf] not in gravados:
+                            chunk_novos += 1
+                        elif gravados[v[idx_cpf]] != v[idx_hash]:
+                            chunk_atualizados += 1
+                        else:
+                            continue
+                        enviar.append(v)
+                    if enviar:
+                        with metricas.medir("executemany"):
+                            cur.executemany(sql, enviar)
+                    with metricas.medir("commit"):
+                        conn.commit()
+                    duracao = time.perf_counter() - inicio
+                    enviados += len(enviar)
+                    novos += chunk_novos
+                    atualizados += chunk_atualizados
+                    ignorados += len(vals) - len(enviar)
+                    chunks.append({"linhas": len(vals), "enviadas": len(enviar), "segundos": round(duracao, 3),
+                                   "segundos_lookup": round(duracao_lookup, 3), "novos": chunk_novos,
+                                   "atualizados": chunk_atualizados, "ignorados": len(vals) - len(enviar)})
+                    msg = (f"Chunk {len(chunks)}: {len(enviar)}/{len(vals)} linhas enviadas em {duracao:.2f}s "
+                           f"(ignoradas {len(vals) - len(enviar)})")
+                    if logger:
+                        logger.db(msg)
+                    else:
+                        print(f"[DB] {msg}")
+                duracao_total = time.perf_counter() - inicio_total
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                cur.close()
+
+        if logger:
+            logger.success(f"Inserção delta concluída. Enviados: {enviados} | novos: {novos} | atualizados: {atualizados} | ignorados: {ignorados}")
+        else:
+            print(f"[SUCCESS] Inserção delta concluída. Enviados: {enviados} | novos: {novos} | atualizados: {atualizados} | ignorados: {ignorados}")
+        return {
+            "enviados": enviados,
+            "ok": True,
+            "novos": novos,
+            "atualizados": atualizados,
+            "ignorados": ignorados,
+            "modo": "delta",
+            "chunk_size": chunk_size,
+            "duracao_segundos": round(duracao_total, 3),
+            "linhas_por_segundo": round(len(df) / duracao_total, 1) if duracao_total > 0 else None,
+            "chunks": chunks
+        }
+    except mysql.connector.Error as e:
+        return erro_retorno(id_consulta, "Erro na conexão ou inserção delta", "insercao_dados", f"{e} (linhas já confirmadas: {enviados})")
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro inesperado na inserção delta", "insercao_dados", f"{e} (linhas já confirmadas: {enviados})")
+
+MODOS_INSERCAO = {
+    "executemany": inserir_mysql,
+    "bulk": inserir_mysql_bulk,
+    "delta": inserir_mysql_delta,
+}
+
+def ler_excel_em_chunks(path, chunk_rows: int = EXCEL_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Lê a primeira aba do .xlsx em blocos de linhas (openpyxl read-only, sem carregar a planilha inteira)"""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+        n = len(colunas)
+        while True:
+            bloco = list(islice(linhas, chunk_rows))
+            if not bloco:
+                return
+            bloco = [r if len(r) == n else (tuple(r[:n]) + (None,) * (n - len(r))) for r in bloco]
+            yield pd.DataFrame.from_records(bloco, columns=colunas)
+    finally:
+        wb.close()
+
+def blocos_tratados(path, id_consulta=None, chunk_rows: int = EXCEL_CHUNK_ROWS,
+                    logger: ProcessLogger = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    Lado CPU do streaming: lê e trata o Excel bloco a bloco, gerando (df, meta_do_bloco).
+    O conjunto de CPFs vistos atravessa os blocos para a deduplicação bater com o modo em memória: CPFs que
+    já vieram em blocos anteriores ficam no fim do df (as últimas `cpfs_ja_vistos` linhas), para o consumidor
+    contá-los à parte. meta traz os tempos de leitura/tratamento e `cpfs_unicos` acumulado.
+    Em erro gera (erro_retorno, {}) e para.
+    Roda no pool de processos (Executores.pipeline), por isso não registra métricas: quem consome observa os tempos.
+    """
+    cpfs_vistos: Set[str] = set()
+    try:
+        inicio = time.perf_counter()
+        for bruto in ler_excel_em_chunks(path, chunk_rows):
+            leitura = time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            df, m = tratar(bruto, logger, id_consulta)
+            del bruto
+            if not m:
+                yield df, {}
+                return
+            repetidos = df['cpf'].isin(cpfs_vistos).to_numpy()
+            cpfs_vistos.update(df['cpf'].tolist())
+            m["cpfs_ja_vistos"] = int(repetidos.sum())
+            if m["cpfs_ja_vistos"]:
+                df = pd.concat([df[~repetidos], df[repetidos]])
+            m["tempos"] = {"leitura_excel": round(leitura, 3), "tratamento": round(time.perf_counter() - inicio, 3)}
+            m["cpfs_unicos"] = len(cpfs_vistos)
+            yield df, m
+            del df
+            inicio = time.perf_counter()
+    except FileNotFoundError as e:
+        yield erro_retorno(id_consulta, "Arquivo não encontrado", "tratamento_dados", str(e)), {}
+    except Exception as e:
+        yield erro_retorno(id_consulta, "Erro na leitura do Excel em streaming", "tratamento_dados", str(e)), {}
+
+def processar_excel_em_chunks(path, logger: ProcessLogger = None, id_consulta=None, chunk_rows: int = EXCEL_CHUNK_ROWS,
+                              inserir: Callable[..., Dict[str, Any]] = inserir_mysql,
+                              blocos: Optional[Iterable[Tuple[Any, Dict[str, Any]]]] = None,
+                              inicio: int = 0, ao_commit: Optional[Callable[[int], None]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Pipeline streaming: cada bloco tratado é inserido e descartado. `blocos` vem de blocos_tratados,
+    normalmente produzido no pool de processos enquanto este consumidor insere (Executores.pipeline);
+    sem ele o Excel é lido e tratado aqui mesmo. Retorna (meta, resultado_insercao) no formato do fluxo tradicional.
+
+    CPFs repetidos de blocos anteriores são regravados (a linha mais nova vence, como no drop_duplicates)
+    mas contados como `ignorados`, para novos/atualizados baterem com o modo em memória.
+    `inicio`/`ao_commit` seguem o inserir_mysql, contando as linhas tratadas na ordem do stream.
+    """
+    if logger:
+        logger.data(f"Lendo Excel em modo streaming (blocos de {chunk_rows} linhas)...")
+    else:
+        print(f"[DATA] Lendo Excel em modo streaming (blocos de {chunk_rows} linhas)...")
+    if blocos is None:
+        blocos = blocos_tratados(path, id_consulta, chunk_rows, logger)
+    if not inicio_valido(inicio):
+        msg = f"Offset de retomada inválido ({inicio!r}), inserindo desde o início"
+        if logger:
+            logger.warning(msg)
+        else:
+            print(f"[WARNING] {msg}")
+        inicio = 0
+
+    meta = {"linhas_excel": 0, "linhas_tratadas": 0, "cpfs_dedup": 0, "blocos_excel": 0}
+    resultado = {"enviados": 0, "ok": True, "retomado_de": inicio, "novos": 0, "atualizados": 0, "ignorados": 0,
+                 "duracao_segundos": 0.0, "chunks": []}
+    posicao = 0
+
+    def _inserir(parte: pd.DataFrame, repetidos: bool) -> Dict[str, Any]:
+        nonlocal posicao
+        base = posicao
+        posicao += len(parte)
+        if parte.empty or posicao <= inicio:
+            # vazio ou já confirmado numa tentativa anterior
+            return {"ok": True}
+        kwargs = {}
+        if inicio > base:
+            kwargs["inicio"] = inicio - base
+        if ao_commit:
+            kwargs["ao_commit"] = lambda n: ao_commit(base + n)
+        r = inserir(parte, logger, id_consulta, **kwargs)
+        if not r.get("ok"):
+            return r
+        resultado["enviados"] += r["enviados"]
+        if repetidos:
+            resultado["ignorados"] += r.get("novos", 0) + r.get("atualizados", 0) + r.get("ignorados", 0)
+        else:
+            resultado["novos"] += r.get("novos", 0)
+            resultado["atualizados"] += r.get("atualizados", 0)
+            resultado["ignorados"] += r.get("ignorados", 0)
+        resultado["duracao_segundos"] += r.get("duracao_segundos") or 0.0
+        resultado["chunks"].extend(r.get("chunks", []))
+        return r
+
+    try:
+        for df, m in blocos:
+            if not m:
+                return meta, df
+            for etapa, segundos in m["tempos"].items():
+                metricas.observar(etapa, segundos)
+            meta["linhas_tratadas"] = m["cpfs_unicos"]
+            meta["blocos_excel"] += 1
+            meta["linhas_excel"] += m["linhas_excel"]
+            meta["cpfs_dedup"] += m["cpfs_dedup"] + m["cpfs_ja_vistos"]
+
+            corte = len(df) - m["cpfs_ja_vistos"]
+            for parte, repetidos in ((df.iloc[:corte], False), (df.iloc[corte:], True)):
+                r = _inserir(parte, repetidos)
+                if not r.get("ok"):
+                    return meta, r
+            del df, parte
+    except Exception as e:
+        # produtor morreu no pool de processos (ex.: BrokenProcessPool)
+        return meta, erro_retorno(id_consulta, "Erro na leitura do Excel em streaming", "tratamento_dados", str(e))
+
+    if inicio > posicao:
+        # offset além do total do arquivo (checkpoint corrompido): nada foi gravado, refaz desde o início
+        msg = f"Offset de retomada {inicio} além das {posicao} linhas tratadas, inserindo desde o início"
+        if logger:
+            logger.warning(msg)
+        else:
+            print(f"[WARNING] {msg}")
+        return processar_excel_em_chunks(path, logger, id_consulta, chunk_rows, inserir, ao_commit=ao_commit)
+
+    duracao = resultado["duracao_segundos"]
+    resultado["duracao_segundos"] = round(duracao, 3)
+    resultado["linhas_por_segundo"] = round(resultado["enviados"] / duracao, 1) if duracao > 0 else None
+    return meta, resultado
+
+def ler_e_tratar(path, id_consulta=None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Leitura + tratamento em memória como uma única chamada de nível de módulo,
+    para poder rodar num ProcessPoolExecutor. Os tempos das duas etapas vão em meta["tempos"].
+    """
+    print(f"[DATA] Lendo relatório com pandas ({path})...")
+    inicio = time.perf_counter()
+    try:
+        df = pd.read_excel(path)
+    except FileNotFoundError as e:
+        return erro_retorno(id_consulta, "Arquivo não encontrado", "tratamento_dados", str(e)), {}
+    except Exception as e:
+        return erro_retorno(id_consulta, "Erro na leitura do Excel", "tratamento_dados", str(e)), {}
+    leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df, meta = tratar(df, None, id_consulta)
+    if meta:
+        meta["tempos"] = {
+            "leitura_excel": round(leitura, 3),
+            "tratamento": round(time.perf_counter() - inicio, 3)
+        }
+    return df, meta
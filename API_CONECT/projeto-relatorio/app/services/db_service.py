@@ -1,95 +1,392 @@
-import os
-import re
-import mysql.connector
-from typing import Optional, Dict
-from app.utils.logger import ProcessLogger
-
-def erro_db_retorno(id_consulta, titulo, etapa, mensagem):
-    return {
-        "id": id_consulta,
-        "titulo": titulo,
-        "etapa": etapa,
-        "mensagem": mensagem
-    }
-
-def db_connect(logger: ProcessLogger = None, id_consulta=None):
-    host = os.getenv("DB_HOST")
-    user = os.getenv("DB_USER")
-    password = os.getenv("DB_PASSWORD")
-    database = os.getenv("DB_NAME")
-    try:
-        if logger:
-            logger.db(f"Conectando ao banco {database}@{host} com usuário {user}")
-            if not password:
-                logger.warning("DB_PASSWORD não definido ou vazio!")
-        else:
-            print(f"[DB] Conectando ao banco {database}@{host} com usuário {user}")
-        return mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            autocommit=True
-        )
-    except mysql.connector.errors.InterfaceError as e:
-        return erro_db_retorno(id_consulta, "Falha ao conectar ao banco de dados", "db_connect", str(e))
-    except mysql.connector.errors.ProgrammingError as e:
-        return erro_db_retorno(id_consulta, "Erro de autenticação ou banco/tabela não encontrada", "db_connect", str(e))
-    except mysql.connector.errors.DatabaseError as e:
-        return erro_db_retorno(id_consulta, "Erro de banco de dados", "db_connect", str(e))
-    except Exception as e:
-        return erro_db_retorno(id_consulta, "Timeout ou erro inesperado na conexão", "db_connect", str(e))
-
-def get_um_pendente(conn, logger: ProcessLogger = None, id_consulta=None, limite_tentativas: int = 3) -> Optional[Dict]:
-    try:
-        if logger:
-            logger.db("Buscando 1 registro pendente no controle_consultas...")
-        else:
-            print("[DB] Buscando 1 registro pendente no controle_consultas...")
-
-        cur = conn.cursor(dictionary=True)
-        cur.execute("""
-            SELECT *
-            FROM controle_consultas
-            WHERE status IS NULL OR status NOT IN ('Finalizado','FINALIZADO')
-            ORDER BY id ASC
-        """)
-        rows = cur.fetchall()
-        cur.close()
-
-        # aplica controle de tentativas
-        for row in rows:
-            obs = row.get("observacao") or ""
-            match = re.search(r"tentativas=(\d+)", obs)
-            tentativas = int(match.group(1)) if match else 0
-            if tentativas < limite_tentativas:
-                return row
-        return None
-
-    except mysql.connector.errors.ProgrammingError as e:
-        return erro_db_retorno(id_consulta, "Erro de consulta SQL", "get_um_pendente", str(e))
-    except mysql.connector.errors.DatabaseError as e:
-        return erro_db_retorno(id_consulta, "Banco/tabela não encontrada ou permissão insuficiente", "get_um_pendente", str(e))
-    except Exception as e:
-        return erro_db_retorno(id_consulta, "Erro ao executar consulta ou fechar cursor", "get_um_pendente", str(e))
-
-def mark_finalizado(conn, row_id: int, logger: ProcessLogger = None):
-    try:
-        if logger:
-            logger.db(f"Marcando registro {row_id} como FINALIZADO...")
-        else:
-            print(f"[DB] Marcando registro {row_id} como FINALIZADO...")
-        cur = conn.cursor()
-        cur.execute("UPDATE controle_consultas SET status='FINALIZADO' WHERE id=%s", (row_id,))
-        conn.commit()
-        cur.close()
-        if logger:
-            logger.success("Status atualizado para FINALIZADO.")
-        else:
-            print("[SUCCESS] Status atualizado para FINALIZADO.")
-    except mysql.connector.errors.ProgrammingError as e:
-        return erro_db_retorno(row_id, "Erro de consulta SQL ao atualizar status", "mark_finalizado", str(e))
-    except mysql.connector.errors.DatabaseError as e:
-        return erro_db_retorno(row_id, "Banco/tabela não encontrada ou permissão insuficiente", "mark_finalizado", str(e))
-    except Exception as e:
-        return erro_db_retorno(row_id, "Erro ao executar update ou fechar cursor", "mark_finalizado", str(e))
+import os
+import time
+import socket
+import tempfile
+import threading
+import mysql.connector
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from app.utils.logger import ProcessLogger
+
+def erro_db_retorno(id_consulta, titulo, etapa, mensagem):
+    return {
+        "id": id_consulta,
+        "titulo": titulo,
+        "etapa": etapa,
+        "mensagem": mensagem
+    }
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1","true","yes","y")
+
+# LOAD DATA LOCAL INFILE só é permitido para arquivos dentro deste diretório (modo de inserção bulk)
+DB_LOCAL_INFILE_DIR = os.getenv("DB_LOCAL_INFILE_DIR", os.path.join(tempfile.gettempdir(), "relatorio_bulk"))
+os.makedirs(DB_LOCAL_INFILE_DIR, exist_ok=True)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def _nova_conexao():
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        charset='utf8mb4',
+        collation='utf8mb4_unicode_ci',
+        autocommit=True,
+        allow_local_infile_in_path=DB_LOCAL_INFILE_DIR
+    )
+
+def get_pool(logger: ProcessLogger = None):
+    """Engine SQLAlchemy usado apenas como pool de conexões mysql.connector (criado sob demanda)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                msg = (f"Criando pool MySQL {os.getenv('DB_NAME')}@{os.getenv('DB_HOST')} "
+                       f"(size={DB_POOL_SIZE}, overflow={DB_POOL_MAX_OVERFLOW}, recycle={DB_POOL_RECYCLE}s, pre_ping={DB_POOL_PRE_PING})")
+                if logger:
+                    logger.db(msg)
+                    if not os.getenv("DB_PASSWORD"):
+                        logger.warning("DB_PASSWORD não definido ou vazio!")
+                else:
+                    print(f"[DB] {msg}")
+                _engine = create_engine(
+                    "mysql+mysqlconnector://",
+                    creator=_nova_conexao,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_POOL_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                )
+    return _engine
+
+def fechar_pool():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+def pool_status() -> Dict:
+    if _engine is None:
+        return {"ativo": False}
+    pool = _engine.pool
+    return {
+        "ativo": True,
+        "tamanho": pool.size(),
+        "em_uso": pool.checkedout(),
+        "livres": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+def _obter_conexao(logger: ProcessLogger = None):
+    try:
+        return get_pool(logger).raw_connection()
+    except DBAPIError as e:
+        # devolve o erro original do mysql.connector para quem já trata esses tipos
+        raise (e.orig or e) from e
+
+@contextmanager
+def db_conexao(logger: ProcessLogger = None):
+    """Empresta uma conexão do pool e a devolve ao sair (inclusive em caso de erro)"""
+    conn = _obter_conexao(logger)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def db_connect(logger: ProcessLogger = None, id_consulta=None):
+    """Conexão do pool para quem gerencia o ciclo manualmente: `close()` devolve ao pool"""
+    try:
+        return _obter_conexao(logger)
+    except mysql.connector.errors.InterfaceError as e:
+        return erro_db_retorno(id_consulta, "Falha ao conectar ao banco de dados", "db_connect", str(e))
+    except mysql.connector.errors.ProgrammingError as e:
+        return erro_db_retorno(id_consulta, "Erro de autenticação ou banco/tabela não encontrada", "db_connect", str(e))
+    except mysql.connector.errors.DatabaseError as e:
+        return erro_db_retorno(id_consulta, "Erro de banco de dados", "db_connect", str(e))
+    except Exception as e:
+        return erro_db_retorno(id_consulta, "Timeout ou erro inesperado na conexão", "db_connect", str(e))
+
+STATUS_EM_PROCESSAMENTO = 'EM_PROCESSAMENTO'
+STATUS_FINALIZADO = ('Finalizado', 'FINALIZADO')
+
+# situação devolvida pelo claim_por_id
+RESERVADO = "reservado"
+NAO_RESERVADO_EM_PROCESSAMENTO = "em_processamento"
+NAO_RESERVADO_FINALIZADO = "finalizado"
+NAO_RESERVADO_LIMITE = "limite_tentativas"
+
+# identifica esta instância da API nos leases de controle_consultas
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_SEGUNDOS = int(os.getenv("LEASE_SEGUNDOS", "300"))
+
+CONTADORES_TTL_SEGUNDOS = float(os.getenv("CONTADORES_TTL_SEGUNDOS", "5"))
+_contadores_cache = {"valor": None, "expira_em": 0.0}
+_contadores_lock = threading.Lock()
+
+# colunas de controle criadas pela própria API (nome, definição)
+COLUNAS_CONTROLE = [
+    ("tentativas", "INT NOT NULL DEFAULT 0"),
+    ("worker_id", "VARCHAR(100) NULL"),
+    ("lease_expira_em", "DATETIME NULL"),
+    ("hash_arquivo", "CHAR(64) NULL"),   # sha256 do último Excel inserido com sucesso
+]
+
+# colunas criadas em consulta_dia_clt
+COLUNAS_CONSULTA = [
+    ("hash_linha", "CHAR(16) NULL"),     # impressão digital das colunas tratadas (modo delta)
+]
+
+def garantir_schema(conn, logger: ProcessLogger = None):
+    """Migração idempotente: cria as colunas da API que ainda não existem em controle_consultas e consulta_dia_clt"""
+    cur = conn.cursor()
+    try:
+        for tabela, colunas in (("controle_consultas", COLUNAS_CONTROLE), ("consulta_dia_clt", COLUNAS_CONSULTA)):
+            cur.execute("""
+                SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            """, (tabela,))
+            existentes = {row[0].lower() for row in cur.fetchall()}
+            for nome, definicao in colunas:
+                if nome in existentes:
+                    continue
+                if logger:
+                    logger.db(f"Criando coluna {tabela}.{nome}")
+                else:
+                    print(f"[DB] Criando coluna {tabela}.{nome}")
+                cur.execute(f"ALTER TABLE {tabela} ADD COLUMN `{nome}` {definicao}")
+                if nome == "tentativas":
+                    # aproveita o contador legado gravado na observacao ("tentativas=N | etapa: detalhe")
+                    cur.execute("""
+                        UPDATE controle_consultas
+                        SET tentativas = CAST(SUBSTRING_INDEX(SUBSTRING_INDEX(observacao, 'tentativas=', -1), ' ', 1) AS UNSIGNED)
+                        WHERE observacao LIKE '%tentativas=%'
+                    """)
+        conn.commit()
+    finally:
+        cur.close()
+
+def claim_pendentes(conn, limite: int = 1, logger: ProcessLogger = None, id_consulta=None, limite_tentativas: int = 3) -> List[Dict]:
+    """
+    Reserva atomicamente até `limite` pendentes: as linhas são travadas com
+    FOR UPDATE SKIP LOCKED (outros workers pulam as já travadas) e passam para EM_PROCESSAMENTO.
+    """
+    if logger:
+        logger.db(f"Reservando até {limite} registro(s) pendente(s) no controle_consultas...")
+    else:
+        print(f"[DB] Reservando até {limite} registro(s) pendente(s) no controle_consultas...")
+
+    cur = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        cur.execute("""
+            SELECT *
+            FROM controle_consultas
+            WHERE (status IS NULL OR status NOT IN ('Finalizado','FINALIZADO','EM_PROCESSAMENTO'))
+              AND tentativas < %s
+            ORDER BY id ASC
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (limite_tentativas, limite))
+        rows = cur.fetchall()
+        if rows:
+            ids = [row["id"] for row in rows]
+            placeholders = ",".join(["%s"] * len(ids))
+            cur.execute(f"""
+                UPDATE controle_consultas
+                SET status=%s, worker_id=%s, lease_expira_em = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({placeholders})
+            """, (STATUS_EM_PROCESSAMENTO, WORKER_ID, LEASE_SEGUNDOS, *ids))
+        conn.commit()
+        if rows:
+            invalidar_contadores()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    for row in rows:
+        row["status"] = STATUS_EM_PROCESSAMENTO
+        row["worker_id"] = WORKER_ID
+    return rows
+
+def claim_por_id(conn, row_id: int, logger: ProcessLogger = None, limite_tentativas: int = 3) -> Tuple[Optional[Dict], str]:
+    """
+    Reserva um registro específico com as mesmas regras do claim_pendentes. Retorna (registro, situacao):
+    registro None = não existe; situacao RESERVADO ou o motivo de não reservar (EM_PROCESSAMENTO com
+    lease válido, já FINALIZADO ou limite de tentativas atingido — esses dois só pelo /reprocessar).
+    """
+    if logger:
+        logger.db(f"Reservando registro {row_id} no controle_consultas...")
+    else:
+        print(f"[DB] Reservando registro {row_id} no controle_consultas...")
+
+    cur = conn.cursor(dictionary=True)
+    try:
+        conn.start_transaction()
+        cur.execute("""
+            SELECT *, (lease_expira_em IS NULL OR lease_expira_em < NOW()) AS lease_expirado
+            FROM controle_consultas WHERE id=%s FOR UPDATE
+        """, (row_id,))
+        row = cur.fetchone()
+        situacao = RESERVADO
+        if row is not None:
+            lease_expirado = row.pop("lease_expirado")
+            if row.get("status") == STATUS_EM_PROCESSAMENTO and not lease_expirado:
+                situacao = NAO_RESERVADO_EM_PROCESSAMENTO
+            elif row.get("status") in STATUS_FINALIZADO:
+                situacao = NAO_RESERVADO_FINALIZADO
+            elif (row.get("tentativas") or 0) >= limite_tentativas:
+                situacao = NAO_RESERVADO_LIMITE
+        if row is None or situacao != RESERVADO:
+            conn.rollback()
+            return row, situacao
+        cur.execute("""
+            UPDATE controle_consultas
+            SET status=%s, worker_id=%s, lease_expira_em = NOW() + INTERVAL %s SECOND
+            WHERE id=%s
+        """, (STATUS_EM_PROCESSAMENTO, WORKER_ID, LEASE_SEGUNDOS, row_id))
+        conn.commit()
+        invalidar_contadores()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    row["status"] = STATUS_EM_PROCESSAMENTO
+    row["worker_id"] = WORKER_ID
+    return row, RESERVADO
+
+class LeasePerdido(Exception):
+    """O registro deixou de pertencer a este worker (lease expirado e reassumido por outra réplica)"""
+
+    def __init__(self, row_id: int):
+        self.row_id = row_id
+        super().__init__(f"Lease do registro {row_id} perdido por {WORKER_ID}: expirado ou reassumido por outro worker")
+
+def renovar_lease(conn, row_id: int, worker_id: str = WORKER_ID, segundos: int = LEASE_SEGUNDOS) -> bool:
+    """Heartbeat: estende o lease se o registro ainda pertence a este worker"""
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE controle_consultas
+            SET lease_expira_em = NOW() + INTERVAL %s SECOND
+            WHERE id=%s AND worker_id=%s AND status=%s
+        """, (segundos, row_id, worker_id, STATUS_EM_PROCESSAMENTO))
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        cur.close()
+
+def liberar_leases_expirados(conn, logger: ProcessLogger = None) -> int:
+    """
+    Reaper: registros EM_PROCESSAMENTO cujo lease venceu (worker morreu ou travou) voltam
+    para a fila como ERRO, contando uma tentativa para não repetir indefinidamente um lote que derruba o worker.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE controle_consultas
+            SET status='ERRO',
+                tentativas = tentativas + 1,
+                observacao = CONCAT('tentativas=', tentativas, ' | lease: worker ', COALESCE(worker_id, '?'), ' parou de responder'),
+                worker_id = NULL,
+                lease_expira_em = NULL
+            WHERE status=%s AND (lease_expira_em IS NULL OR lease_expira_em < NOW())
+        """, (STATUS_EM_PROCESSAMENTO,))
+        conn.commit()
+        liberados = cur.rowcount
+    finally:
+        cur.close()
+    if liberados:
+        invalidar_contadores()
+        if logger:
+            logger.warning(f"{liberados} registro(s) com lease expirado devolvido(s) para a fila")
+        else:
+            print(f"[WARNING] {liberados} registro(s) com lease expirado devolvido(s) para a fila")
+    return liberados
+
+def contar_status(conn) -> Dict:
+    """Todos os contadores do controle_consultas numa única varredura (agregação condicional)"""
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT
+                SUM(status IS NULL OR status NOT IN ('FINALIZADO','Finalizado')) AS pendentes,
+                SUM(status = 'FINALIZADO') AS finalizados,
+                SUM(status = 'ERRO') AS erros,
+                SUM(status = 'EM_PROCESSAMENTO') AS em_processamento,
+                MAX(CASE WHEN status = 'FINALIZADO' THEN data_criacao END) AS ultimo_processamento
+            FROM controle_consultas
+        """)
+        row = cur.fetchone() or {}
+    finally:
+        cur.close()
+    return {
+        "pendentes": int(row.get("pendentes") or 0),
+        "finalizados": int(row.get("finalizados") or 0),
+        "erros": int(row.get("erros") or 0),
+        "em_processamento": int(row.get("em_processamento") or 0),
+        "ultimo_processamento": row.get("ultimo_processamento"),
+    }
+
+def obter_contadores(logger: ProcessLogger = None) -> Dict:
+    """Contadores com cache em memória (CONTADORES_TTL_SEGUNDOS); invalidado a cada mudança de status"""
+    with _contadores_lock:
+        if _contadores_cache["valor"] is not None and time.monotonic() < _contadores_cache["expira_em"]:
+            return dict(_contadores_cache["valor"])
+        # o lock fica preso durante a consulta: requisições simultâneas reaproveitam o mesmo resultado
+        with db_conexao(logger) as conn:
+            valor = contar_status(conn)
+        _contadores_cache["valor"] = valor
+        _contadores_cache["expira_em"] = time.monotonic() + CONTADORES_TTL_SEGUNDOS
+        return dict(valor)
+
+def invalidar_contadores():
+    _contadores_cache["expira_em"] = 0.0
+
+def get_um_pendente(conn, logger: ProcessLogger = None, id_consulta=None, limite_tentativas: int = 3) -> Optional[Dict]:
+    try:
+        pendentes = claim_pendentes(conn, 1, logger, id_consulta, limite_tentativas)
+        return pendentes[0] if pendentes else None
+
+    except mysql.connector.errors.ProgrammingError as e:
+        return erro_db_retorno(id_consulta, "Erro de consulta SQL", "get_um_pendente", str(e))
+    except mysql.connector.errors.DatabaseError as e:
+        return erro_db_retorno(id_consulta, "Banco/tabela não encontrada ou permissão insuficiente", "get_um_pendente", str(e))
+    except Exception as e:
+        return erro_db_retorno(id_consulta, "Erro ao executar consulta ou fechar cursor", "get_um_pendente", str(e))
+
+def mark_finalizado(conn, row_id: int, logger: ProcessLogger = None):
+    try:
+        if logger:
+            logger.db(f"Marcando registro {row_id} como FINALIZADO...")
+        else:
+            print(f"[DB] Marcando registro {row_id} como FINALIZADO...")
+        cur = conn.cursor()
+        cur.execute("UPDATE controle_consultas SET status='FINALIZADO' WHERE id=%s", (row_id,))
+        conn.commit()
+        cur.close()
+        if logger:
+            logger.success("Status atualizado para FINALIZADO.")
+        else:
+            print("[SUCCESS] Status atualizado para FINALIZADO.")
+    except mysql.connector.errors.ProgrammingError as e:
+        return erro_db_retorno(row_id, "Erro de consulta SQL ao atualizar status", "mark_finalizado", str(e))
+    except mysql.connector.errors.DatabaseError as e:
+        return erro_db_retorno(row_id, "Banco/tabela não encontrada ou permissão insuficiente", "mark_finalizado", str(e))
+    except Exception as e:
+        return erro_db_retorno(row_id, "Erro ao executar update ou fechar cursor", "mark_finalizado", str(e))
@@ -0,0 +1,183 @@
+import os
+import time
+import queue
+import asyncio
+import functools
+import multiprocessing
+from contextlib import suppress
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator
+from app.utils.logger import info, warn
+from app.services.db_service import DB_POOL_SIZE
+
+# 0 desliga o pool de processos: leitura/tratamento rodam no pool de threads
+EXECUTOR_PROCESSOS = int(os.getenv("EXECUTOR_PROCESSOS", str(min(2, os.cpu_count() or 1))))
+EXECUTOR_THREADS_DB = int(os.getenv("EXECUTOR_THREADS_DB", str(DB_POOL_SIZE)))
+LOOP_LAG_INTERVALO = float(os.getenv("LOOP_LAG_INTERVALO", "0.5"))
+LOOP_LAG_ALERTA = float(os.getenv("LOOP_LAG_ALERTA", "1.0"))
+# blocos já tratados aguardando inserção no pipeline streaming (limita a memória)
+PIPELINE_FILA = int(os.getenv("PIPELINE_FILA", "2"))
+
+
+class MonitorLoop:
+    """Mede o atraso do event loop: quanto um sleep curto demora além do pedido"""
+
+    def __init__(self, intervalo: float = LOOP_LAG_INTERVALO, alerta: float = LOOP_LAG_ALERTA):
+        self.intervalo = intervalo
+        self.alerta = alerta
+        self.ultimo = 0.0
+        self.maximo = 0.0
+        self.amostras = 0
+        self.soma = 0.0
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def _loop(self):
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(self.intervalo)
+            lag = max(time.perf_counter() - inicio - self.intervalo, 0.0)
+            self.ultimo = lag
+            self.maximo = max(self.maximo, lag)
+            self.amostras += 1
+            self.soma += lag
+            if lag >= self.alerta:
+                warn(f"Event loop bloqueado por {lag:.2f}s")
+
+    def start(self):
+        if self._tarefa is None and self.intervalo > 0:
+            self._tarefa = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._tarefa
+            self._tarefa = None
+
+    def resumo(self) -> Dict[str, Any]:
+        return {
+            "ativo": self._tarefa is not None,
+            "ultimo_segundos": round(self.ultimo, 4),
+            "max_segundos": round(self.maximo, 4),
+            "media_segundos": round(self.soma / self.amostras, 4) if self.amostras else None,
+            "amostras": self.amostras,
+        }
+
+
+def _colocar(fila, item, parar) -> bool:
+    """put com desistência: False se o consumidor parou de ler (fila cheia para sempre)"""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _alimentar_fila(gerar: Callable[[], Iterable], fila, parar) -> None:
+    """Roda no processo filho: itens do gerador vão para a fila, None marca o fim"""
+    try:
+        for item in gerar():
+            if not _colocar(fila, item, parar):
+                return
+    finally:
+        _colocar(fila, None, parar)
+
+
+def _itens_da_fila(fila, produtor: Future) -> Iterator:
+    while True:
+        try:
+            item = fila.get(timeout=1)
+        except queue.Empty:
+            if produtor.done():
+                # processo morreu sem marcar o fim: propaga o erro do pool
+                produtor.result()
+                return
+            continue
+        if item is None:
+            produtor.result()
+            return
+        yield item
+
+
+class Executores:
+    """
+    Pools dedicados para tirar trabalho bloqueante do event loop:
+    - processos: leitura do Excel + tratar_df (CPU, segura o GIL), inclusive os blocos do streaming
+    - threads: chamadas ao MySQL (I/O bloqueante do mysql-connector)
+    """
+
+    def __init__(self, processos: int = EXECUTOR_PROCESSOS, threads_db: int = EXECUTOR_THREADS_DB):
+        self.processos = processos
+        self.threads_db = threads_db
+        self._pool_processos: Optional[ProcessPoolExecutor] = None
+        self._pool_db: Optional[ThreadPoolExecutor] = None
+        self._manager = None
+        self.monitor = MonitorLoop()
+
+    def start(self):
+        if self._pool_db is None:
+            self._pool_db = ThreadPoolExecutor(max_workers=max(self.threads_db, 1), thread_name_prefix="db")
+        if self._pool_processos is None and self.processos > 0:
+            # spawn: o processo pai já tem threads (Playwright, pool do MySQL) e fork não é seguro
+            self._pool_processos = ProcessPoolExecutor(
+                max_workers=self.processos, mp_context=multiprocessing.get_context("spawn")
+            )
+        self.monitor.start()
+        info(f"Executores iniciados (processos={self.processos}, threads_db={self.threads_db})")
+
+    async def stop(self):
+        await self.monitor.stop()
+        # shutdown(wait=True) espera as tarefas em andamento: fora do event loop para não travar o lifespan
+        if self._pool_processos is not None:
+            await asyncio.to_thread(self._pool_processos.shutdown, wait=True, cancel_futures=True)
+            self._pool_processos = None
+        if self._manager is not None:
+            await asyncio.to_thread(self._manager.shutdown)
+            self._manager = None
+        if self._pool_db is not None:
+            await asyncio.to_thread(self._pool_db.shutdown, wait=True, cancel_futures=True)
+            self._pool_db = None
+
+    async def cpu(self, fn: Callable, *args, **kwargs):
+        """Roda fn no pool de processos (fn e argumentos precisam ser picklable)"""
+        pool = self._pool_processos or self._pool_db
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def db(self, fn: Callable, *args, **kwargs):
+        """Roda fn no pool de threads de banco"""
+        return await asyncio.get_running_loop().run_in_executor(self._pool_db, functools.partial(fn, *args, **kwargs))
+
+    async def pipeline(self, gerar: Callable[[], Iterable], consumir: Callable[[Iterator], Any], fila_max: int = PIPELINE_FILA):
+        """
+        Produtor CPU + consumidor de banco em paralelo: o gerador `gerar()` roda no pool de processos
+        e `consumir(itens)` no pool de threads, recebendo os itens por uma fila limitada conforme ficam prontos.
+        Sem pool de processos, `consumir` itera o gerador direto na thread. `gerar` precisa ser picklable.
+        """
+        if self._pool_processos is None:
+            return await self.db(lambda: consumir(gerar()))
+        if self._manager is None:
+            # fila entre processos do pool só via Manager (multiprocessing.Queue não pode ser argumento de submit)
+            self._manager = await asyncio.to_thread(multiprocessing.get_context("spawn").Manager)
+        fila, parar = self._manager.Queue(fila_max), self._manager.Event()
+        produtor = self._pool_processos.submit(_alimentar_fila, gerar, fila, parar)
+
+        def _consumir():
+            try:
+                return consumir(_itens_da_fila(fila, produtor))
+            finally:
+                # consumidor terminou (ou desistiu num erro de inserção): o produtor para no próximo put
+                parar.set()
+
+        return await self.db(_consumir)
+
+    def saude(self) -> Dict[str, Any]:
+        return {
+            "processos": self.processos if self._pool_processos is not None else 0,
+            "threads_db": self.threads_db if self._pool_db is not None else 0,
+            "loop_lag": self.monitor.resumo(),
+        }
+
+
+executores = Executores()
@@ -0,0 +1,134 @@
+import os
+import re
+from pathlib import Path
+from datetime import datetime
+from contextlib import suppress
+from typing import Optional, Dict, Any
+from urllib.parse import urljoin
+import httpx
+from app.utils.logger import ProcessLogger
+from app.services.browser_pool import BrowserPool
+
+EXPORT_HTTP = os.getenv("EXPORT_HTTP", "true").lower() in ("1","true","yes","y")
+# ex.: https://dashboard.../clt-lote/export?CltLoteSearch%5Bid%5D={id}; vazio = capturado do link "Exportar Excel"
+EXPORT_URL_TEMPLATE = os.getenv("EXPORT_URL_TEMPLATE", "")
+EXPORT_HTTP_TIMEOUT = float(os.getenv("EXPORT_HTTP_TIMEOUT", "120"))
+
+# o id do lote aparece na query como CltLoteSearch[id]=123 (com ou sem os colchetes codificados)
+_PARAM_ID = re.compile(r"(CltLoteSearch(?:\[|%5B)id(?:\]|%5D)=)(\d+)", re.I)
+_ASSINATURA_XLSX = b"PK\x03\x04"
+
+
+class ExportadorHttp:
+    """
+    Caminho rápido da exportação: baixa o Excel direto por HTTP reaproveitando os cookies da
+    sessão autenticada do pool de navegadores, sem clicar pela interface.
+
+    Só funciona depois que o pool tem uma sessão (`storage_state`) e um modelo de URL de
+    exportação (env ou capturado do href do link numa exportação pela UI). Qualquer resposta
+    inesperada devolve None e o chamador cai no fluxo da interface.
+    """
+
+    def __init__(self, pool: BrowserPool, url_template: str = EXPORT_URL_TEMPLATE,
+                 ativo: bool = EXPORT_HTTP, timeout: float = EXPORT_HTTP_TIMEOUT):
+        self.pool = pool
+        self.url_template = url_template or None
+        self.ativo = ativo
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._geracao_cookies = -1
+        self.sucessos = 0
+        self.fallbacks = 0
+        self.ultimo_erro: Optional[str] = None
+        self.ultimo_sucesso: Optional[datetime] = None
+
+    def registrar_link(self, href: Optional[str], row_id: int, base_url: str):
+        """Aprende o modelo de URL a partir do href do 'Exportar Excel' de um lote conhecido"""
+        if not href or self.url_template:
+            return
+        url = urljoin(base_url, href)
+        m = _PARAM_ID.search(url)
+        if m and m.group(2) == str(row_id):
+            self.url_template = url[:m.start(2)] + "{id}" + url[m.end(2):]
+            print(f"[WEB] Modelo de URL de exportação capturado: {self.url_template}")
+
+    def _cliente(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # um único cliente: conexões keep-alive reaproveitadas entre exportações
+            self._client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=False)
+        if self._geracao_cookies != self.pool.geracao_sessao:
+            self._client.cookies.clear()
+            for c in (self.pool.storage_state or {}).get("cookies", []):
+                self._client.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"))
+            self._geracao_cookies = self.pool.geracao_sessao
+        return self._client
+
+    def _falhou(self, motivo: str, logger: ProcessLogger = None) -> None:
+        self.fallbacks += 1
+        self.ultimo_erro = motivo
+        if logger:
+            logger.warning(f"Exportação HTTP indisponível ({motivo}); usando a interface")
+        else:
+            print(f"[WARNING] Exportação HTTP indisponível ({motivo}); usando a interface")
+        return None
+
+    @property
+    def pronto(self) -> bool:
+        return bool(self.ativo and self.url_template and self.pool.storage_state)
+
+    async def baixar(self, row_id: int, dest: Path, logger: ProcessLogger = None) -> Optional[Path]:
+        if not self.pronto:
+            return None
+        url = self.url_template.replace("{id}", str(row_id))
+        if logger:
+            logger.web(f"Exportando lote {row_id} por HTTP direto...")
+        else:
+            print(f"[WEB] Exportando lote {row_id} por HTTP direto...")
+
+        tmp = dest.with_suffix(dest.suffix + ".part")
+        try:
+            async with self._cliente().stream("GET", url) as resp:
+                if resp.status_code != 200:
+                    # 302 para /login = sessão expirada; o fluxo da UI refaz o login
+                    return self._falhou(f"HTTP {resp.status_code}", logger)
+                primeiro = True
+                with open(tmp, "wb") as f:
+                    async for bloco in resp.aiter_bytes():
+                        if primeiro:
+                            if not bloco.startswith(_ASSINATURA_XLSX):
+                                return self._falhou("resposta não é um .xlsx", logger)
+                            primeiro = False
+                        f.write(bloco)
+                if primeiro:
+                    return self._falhou("resposta vazia", logger)
+            os.replace(tmp, dest)
+        except (httpx.HTTPError, OSError) as e:
+            # OSError: falha ao gravar (disco cheio, permissão); a interface tenta de novo
+            return self._falhou(f"{type(e).__name__}: {e}", logger)
+        finally:
+            with suppress(OSError):
+                tmp.unlink()
+
+        self.sucessos += 1
+        self.ultimo_sucesso = datetime.now()
+        if logger:
+            logger.success(f"Arquivo baixado (HTTP): {dest}")
+        else:
+            print(f"[SUCCESS] Arquivo baixado (HTTP): {dest}")
+        return dest
+
+    async def fechar(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._geracao_cookies = -1
+
+    def saude(self) -> Dict[str, Any]:
+        return {
+            "ativo": self.ativo,
+            "url_template": self.url_template,
+            "sucessos": self.sucessos,
+            "fallbacks": self.fallbacks,
+            "ultimo_erro": self.ultimo_erro,
+            "ultimo_sucesso": self.ultimo_sucesso.isoformat() if self.ultimo_sucesso else None,
+        }
@@ -0,0 +1,273 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+from datetime import datetime
+from contextlib import suppress, nullcontext
+from typing import Optional, Dict, Any, List, Set, Callable, Awaitable, AsyncContextManager
+from app.utils.logger import info, warn, error
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "2"))
+JOBS_HISTORICO_MAX = int(os.getenv("JOBS_HISTORICO_MAX", "500"))
+# intervalo mínimo entre gravações do mesmo job (mudanças no meio do intervalo saem numa escrita só)
+JOBS_GRAVACAO_SEGUNDOS = float(os.getenv("JOBS_GRAVACAO_SEGUNDOS", "1"))
+
+JOB_NA_FILA = "na_fila"
+JOB_EXECUTANDO = "executando"
+JOB_CONCLUIDO = "concluido"
+JOB_ERRO = "erro"
+JOB_INTERROMPIDO = "interrompido"
+JOBS_ATIVOS = (JOB_NA_FILA, JOB_EXECUTANDO)
+
+# progresso(etapa, **dados): chamado pelo fluxo a cada troca de etapa
+ProgressoFn = Callable[..., None]
+# executar(progresso) -> coroutine que roda o fluxo e devolve o ProcessarResponse (dict)
+ExecutarFn = Callable[[ProgressoFn], Awaitable[Dict[str, Any]]]
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class Job:
+    def __init__(self, tipo: str, row_id: int, titulo: str = None, job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.tipo = tipo
+        self.row_id = row_id
+        self.titulo = titulo
+        self.status = JOB_NA_FILA
+        self.etapa: Optional[str] = None
+        self.etapas: Dict[str, Dict[str, Any]] = {}
+        self.progresso: Dict[str, Any] = {}
+        self.criado_em = _agora()
+        self.iniciado_em: Optional[str] = None
+        self.finalizado_em: Optional[str] = None
+        self.duracao_segundos: Optional[float] = None
+        self.detalhe: Optional[str] = None
+        self.resultado: Optional[Dict[str, Any]] = None
+        self._inicio_etapa: Optional[float] = None
+        self._inicio: Optional[float] = None
+
+    def _fechar_etapa(self):
+        if self.etapa and self._inicio_etapa is not None:
+            self.etapas[self.etapa]["fim"] = _agora()
+            self.etapas[self.etapa]["segundos"] = round(time.perf_counter() - self._inicio_etapa, 3)
+        self._inicio_etapa = None
+
+    def avancar(self, etapa: str, **dados):
+        if etapa != self.etapa:
+            self._fechar_etapa()
+            self.etapa = etapa
+            self.etapas[etapa] = {"inicio": _agora()}
+            self._inicio_etapa = time.perf_counter()
+        self.progresso.update(dados)
+
+    def iniciar(self):
+        self.status = JOB_EXECUTANDO
+        self.iniciado_em = _agora()
+        self._inicio = time.perf_counter()
+
+    def finalizar(self, status: str, resultado: Dict[str, Any] = None, detalhe: str = None):
+        self._fechar_etapa()
+        self.status = status
+        self.resultado = resultado
+        self.detalhe = detalhe
+        self.finalizado_em = _agora()
+        if self._inicio is not None:
+            self.duracao_segundos = round(time.perf_counter() - self._inicio, 3)
+
+    def to_dict(self, incluir_resultado: bool = False) -> Dict[str, Any]:
+        d = {
+            "id": self.id,
+            "tipo": self.tipo,
+            "row_id": self.row_id,
+            "titulo": self.titulo,
+            "status": self.status,
+            "etapa": self.etapa,
+            "etapas": self.etapas,
+            "progresso": self.progresso,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "finalizado_em": self.finalizado_em,
+            "duracao_segundos": self.duracao_segundos,
+            "detalhe": self.detalhe,
+        }
+        if incluir_resultado:
+            d["resultado"] = self.resultado
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Job":
+        job = cls(d["tipo"], d["row_id"], d.get("titulo"), job_id=d["id"])
+        for campo in ("status", "etapa", "etapas", "progresso", "criado_em", "iniciado_em",
+                      "finalizado_em", "duracao_segundos", "detalhe", "resultado"):
+            if campo in d:
+                setattr(job, campo, d[campo])
+        return job
+
+
+class JobRegistry:
+    """
+    Registro dos jobs de processamento em background.
+
+    Os jobs ficam em memória e as mudanças de estado são gravadas em `JOBS_DIR/{id}.json`
+    (numa thread, no máximo uma escrita por `JOBS_GRAVACAO_SEGUNDOS` por job), então status e
+    resultado continuam consultáveis depois de um restart. Jobs que estavam na fila ou executando
+    quando a API caiu voltam como `interrompido`.
+    """
+
+    def __init__(self, diretorio: str = JOBS_DIR, concorrencia: int = JOBS_CONCURRENCY,
+                 historico_max: int = JOBS_HISTORICO_MAX, intervalo_gravacao: float = JOBS_GRAVACAO_SEGUNDOS):
+        self.diretorio = diretorio
+        self.concorrencia = concorrencia
+        self.historico_max = historico_max
+        self.intervalo_gravacao = intervalo_gravacao
+        self._jobs: Dict[str, Job] = {}
+        self._tarefas: Dict[str, asyncio.Task] = {}
+        self._gravacoes: Dict[str, asyncio.Task] = {}
+        self._sujos: Set[str] = set()
+        self._gravado_em: Dict[str, float] = {}
+        self._semaforo: Optional[asyncio.Semaphore] = None
+
+    def _caminho(self, job_id: str) -> str:
+        return os.path.join(self.diretorio, f"{job_id}.json")
+
+    def _escrever(self, job_id: str, texto: str):
+        try:
+            tmp = self._caminho(job_id) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(texto)
+            os.replace(tmp, self._caminho(job_id))
+        except Exception as e:
+            warn(f"Falha ao gravar job {job_id}: {e}")
+
+    @staticmethod
+    def _serializar(job: Job) -> str:
+        # no event loop: o job só muda aqui, então a foto é consistente
+        return json.dumps(job.to_dict(incluir_resultado=True), ensure_ascii=False, default=str)
+
+    def _salvar(self, job: Job):
+        """Gravação síncrona (carga na subida, antes de haver jobs rodando)"""
+        self._escrever(job.id, self._serializar(job))
+
+    def _agendar_gravacao(self, job: Job) -> asyncio.Task:
+        """Marca o job para gravar fora do event loop; mudanças seguidas viram uma escrita só"""
+        self._sujos.add(job.id)
+        tarefa = self._gravacoes.get(job.id)
+        if tarefa is None or tarefa.done():
+            tarefa = self._gravacoes[job.id] = asyncio.create_task(self._gravar(job))
+        return tarefa
+
+    async def _gravar(self, job: Job):
+        # uma tarefa por job: as escritas saem em ordem e nunca uma foto antiga sobrescreve a nova
+        try:
+            while job.id in self._sujos:
+                espera = self._gravado_em.get(job.id, 0.0) + self.intervalo_gravacao - time.monotonic()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                self._sujos.discard(job.id)
+                await asyncio.to_thread(self._escrever, job.id, self._serializar(job))
+                self._gravado_em[job.id] = time.monotonic()
+        finally:
+            self._gravacoes.pop(job.id, None)
+
+    def carregar(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._semaforo = asyncio.Semaphore(max(self.concorrencia, 1))
+        carregados = 0
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.diretorio, nome), encoding="utf-8") as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                warn(f"Job ignorado ({nome}): {e}")
+                continue
+            if job.status in JOBS_ATIVOS:
+                job.status = JOB_INTERROMPIDO
+                job.detalhe = "API reiniciada durante a execução"
+                self._salvar(job)
+            self._jobs[job.id] = job
+            carregados += 1
+        self._podar()
+        if carregados:
+            info(f"Jobs: {carregados} carregado(s) de {self.diretorio}")
+
+    def _podar(self):
+        finalizados = sorted((j for j in self._jobs.values() if j.status not in JOBS_ATIVOS), key=lambda j: j.criado_em)
+        for job in finalizados[:max(len(finalizados) - self.historico_max, 0)]:
+            del self._jobs[job.id]
+            self._gravado_em.pop(job.id, None)
+            with suppress(FileNotFoundError):
+                os.remove(self._caminho(job.id))
+
+    def obter(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def listar(self, status: str = None, limite: int = 50) -> List[Job]:
+        jobs = sorted(self._jobs.values(), key=lambda j: j.criado_em, reverse=True)
+        if status:
+            jobs = [j for j in jobs if j.status == status]
+        return jobs[:limite]
+
+    def ativo_para(self, row_id: int) -> Optional[Job]:
+        """Job ainda na fila/executando para o registro (um retry do cliente reaproveita o mesmo job)"""
+        for job in self._jobs.values():
+            if job.row_id == row_id and job.status in JOBS_ATIVOS:
+                return job
+        return None
+
+    def criar(self, tipo: str, row_id: int, titulo: str, executar: ExecutarFn,
+              reter: Optional[Callable[[], AsyncContextManager]] = None) -> Job:
+        """`reter()` envolve também a espera na fila (ex.: lease do registro reservado)"""
+        if self._semaforo is None:
+            self.carregar()
+        job = Job(tipo, row_id, titulo)
+        self._jobs[job.id] = job
+        self._agendar_gravacao(job)
+        self._tarefas[job.id] = asyncio.create_task(self._rodar(job, executar, reter))
+        return job
+
+    async def _rodar(self, job: Job, executar: ExecutarFn, reter=None):
+        def _progresso(etapa: str, **dados):
+            job.avancar(etapa, **dados)
+            self._agendar_gravacao(job)
+
+        try:
+            async with (reter() if reter else nullcontext()), self._semaforo:
+                job.iniciar()
+                self._agendar_gravacao(job)
+                resultado = await executar(_progresso)
+            status = JOB_CONCLUIDO if resultado.get("status") in ("ok", "sem_alteracoes") else JOB_ERRO
+            job.finalizar(status, resultado, resultado.get("detalhe"))
+        except asyncio.CancelledError:
+            job.finalizar(JOB_INTERROMPIDO, detalhe="Job cancelado no shutdown da API")
+            raise
+        except Exception as e:
+            error(f"Job {job.id} falhou: {e}")
+            job.finalizar(JOB_ERRO, detalhe=str(e))
+        finally:
+            # estado final: espera a gravação (inclusive no cancelamento do shutdown)
+            await asyncio.shield(self._agendar_gravacao(job))
+            self._tarefas.pop(job.id, None)
+            self._podar()
+
+    async def stop(self):
+        tarefas = list(self._tarefas.values())
+        for tarefa in tarefas:
+            tarefa.cancel()
+        for tarefa in tarefas:
+            with suppress(asyncio.CancelledError):
+                await tarefa
+
+    def resumo(self) -> Dict[str, int]:
+        contagem: Dict[str, int] = {}
+        for job in self._jobs.values():
+            contagem[job.status] = contagem.get(job.status, 0) + 1
+        return contagem
+
+
+jobs = JobRegistry()
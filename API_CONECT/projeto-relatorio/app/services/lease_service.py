@@ -0,0 +1,101 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Optional, Dict
+from app.utils.logger import info, warn, error
+from app.services.db_service import db_conexao, renovar_lease, liberar_leases_expirados, LeasePerdido, WORKER_ID, LEASE_SEGUNDOS
+
+HEARTBEAT_SEGUNDOS = int(os.getenv("HEARTBEAT_SEGUNDOS", str(max(LEASE_SEGUNDOS // 3, 1))))
+REAPER_INTERVALO_SEGUNDOS = int(os.getenv("REAPER_INTERVALO_SEGUNDOS", "60"))
+
+# row_id -> tarefa que mantém o lease; um manter_lease aninhado na mesma tarefa reaproveita o de fora
+_leases_ativos: Dict[int, asyncio.Task] = {}
+
+
+def _renovar(row_id: int) -> bool:
+    with db_conexao() as conn:
+        return renovar_lease(conn, row_id)
+
+
+def _liberar_expirados() -> int:
+    with db_conexao() as conn:
+        return liberar_leases_expirados(conn)
+
+
+@asynccontextmanager
+async def manter_lease(row_id: int):
+    """
+    Renova o lease do registro em background enquanto o bloco executa (desde a reserva, inclusive a
+    espera por semáforo/fila). Se o registro deixar de pertencer a este worker, a tarefa que entrou
+    no bloco é cancelada e o bloco termina com LeasePerdido.
+    """
+    atual = asyncio.current_task()
+    if _leases_ativos.get(row_id) is atual:
+        yield
+        return
+
+    perdido = False
+
+    async def _heartbeat():
+        nonlocal perdido
+        while True:
+            await asyncio.sleep(HEARTBEAT_SEGUNDOS)
+            try:
+                renovado = await asyncio.to_thread(_renovar, row_id)
+            except Exception as e:
+                warn(f"Falha ao renovar lease do registro {row_id}: {e}")
+                continue
+            if not renovado:
+                perdido = True
+                warn(f"Lease do registro {row_id} não pertence mais a {WORKER_ID} (expirado ou reassumido), cancelando o processamento")
+                atual.cancel()
+                return
+
+    _leases_ativos[row_id] = atual
+    tarefa = asyncio.create_task(_heartbeat())
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not perdido:
+            raise
+        if hasattr(atual, "uncancel"):
+            atual.uncancel()
+        raise LeasePerdido(row_id) from None
+    finally:
+        if _leases_ativos.get(row_id) is atual:
+            del _leases_ativos[row_id]
+        tarefa.cancel()
+        with suppress(asyncio.CancelledError):
+            await tarefa
+
+
+class Reaper:
+    """Loop periódico que devolve à fila os registros com lease expirado"""
+
+    def __init__(self, intervalo: int = REAPER_INTERVALO_SEGUNDOS):
+        self.intervalo = intervalo
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def _loop(self):
+        while True:
+            try:
+                liberados = await asyncio.to_thread(_liberar_expirados)
+                if liberados:
+                    info(f"Reaper: {liberados} lease(s) expirado(s) devolvido(s) para a fila")
+            except Exception as e:
+                error(f"Reaper: falha ao liberar leases expirados: {e}")
+            await asyncio.sleep(self.intervalo)
+
+    def start(self):
+        if self._tarefa is None and self.intervalo > 0:
+            self._tarefa = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._tarefa
+            self._tarefa = None
+
+
+reaper = Reaper()
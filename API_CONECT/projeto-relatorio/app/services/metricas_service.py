@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Métricas do pipeline no registro padrão do prometheus_client, expostas em /metrics/prometheus.
+# Só valem para o processo da API: o que roda no ProcessPoolExecutor (ler_e_tratar) é observado
+# no processo principal a partir de meta["tempos"].
+
+BUCKETS_ETAPA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BUCKETS_LOTE = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+ETAPA_SEGUNDOS = Histogram(
+    "relatorio_etapa_duracao_segundos",
+    "Duração de cada etapa do pipeline (navegador, login, navegação, download, leitura, tratamento, banco)",
+    ["etapa"], buckets=BUCKETS_ETAPA,
+)
+LOTE_SEGUNDOS = Histogram(
+    "relatorio_lote_duracao_segundos",
+    "Duração total do processamento de um lote (ProcessLogger.finish)",
+    ["status"], buckets=BUCKETS_LOTE,
+)
+LOTES = Counter("relatorio_lotes", "Lotes processados por status final", ["status"])
+LINHAS = Counter(
+    "relatorio_linhas",
+    "Linhas por tipo: excel, tratadas, dedup (CPFs duplicados removidos), enviadas, novas, atualizadas, ignoradas",
+    ["tipo"],
+)
+EM_ANDAMENTO = Gauge("relatorio_em_andamento", "Operações em andamento agora (lote, download, tratamento, insercao)", ["etapa"])
+REGISTROS = Gauge("relatorio_registros", "Registros da tabela de controle por situação (mesmos números do /metrics)", ["situacao"])
+
+
+def observar(etapa: str, segundos: float):
+    ETAPA_SEGUNDOS.labels(etapa).observe(segundos)
+
+
+@contextmanager
+def medir(etapa: str):
+    """Cronometra o bloco no histograma de etapas (observa mesmo se o bloco falhar)"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(etapa, time.perf_counter() - inicio)
+
+
+def em_andamento(etapa: str):
+    """Context manager/decorator que incrementa o gauge enquanto a operação roda"""
+    return EM_ANDAMENTO.labels(etapa).track_inprogress()
+
+
+def contar_linhas(**quantidades):
+    for tipo, n in quantidades.items():
+        if n:
+            LINHAS.labels(tipo).inc(n)
+
+
+def registrar_lote(status: str, segundos: float):
+    LOTES.labels(status).inc()
+    LOTE_SEGUNDOS.labels(status).observe(segundos)
+
+
+def atualizar_registros(contadores: dict):
+    for situacao, n in contadores.items():
+        REGISTROS.labels(situacao).set(n)
+
+
+def exportar() -> bytes:
+    """Texto no formato de exposição do Prometheus"""
+    return generate_latest()
+
+
+TIPO_CONTEUDO = CONTENT_TYPE_LATEST
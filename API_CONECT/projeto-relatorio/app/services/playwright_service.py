@@ -1,146 +1,261 @@
-import os
-import re
-import asyncio
-from pathlib import Path
-from typing import Optional
-from playwright.async_api import async_playwright, Page
-from app.utils.logger import ProcessLogger
-
-OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "./downloads"))
-OUTPUT_DIR.mkdir(exist_ok=True)
-
-SITE_USER = os.getenv("SITE_USER")
-SITE_PASS = os.getenv("SITE_PASS")
-HEADLESS = os.getenv("HEADLESS", "true").lower() in ("1","true","yes","y")
-
-def erro_playwright_retorno(id_consulta, titulo, etapa, mensagem):
-    return {
-        "id": id_consulta,
-        "titulo": titulo,
-        "etapa": etapa,
-        "mensagem": mensagem
-    }
-
-async def wait_for_element(page, locator, timeout=30000, retries=5, sleep=2):
-    for attempt in range(retries):
-        try:
-            await locator.wait_for(state="visible", timeout=timeout)
-            return True
-        except Exception:
-            await asyncio.sleep(sleep)
-    return False
-
-async def _aplicar_filtro_por_id(page: Page, row_id: int, logger: ProcessLogger = None, id_consulta=None) -> Optional[dict]:
-    if logger:
-        logger.web(f"Aplicando filtro pelo ID: {row_id}")
-    else:
-        print(f"[WEB] Aplicando filtro pelo ID: {row_id}")
-        
-    try:
-        id_input = page.locator('#cltlotesearch-id')
-        if await id_input.count() == 0:
-            id_input = page.locator('input[name="CltLoteSearch[id]"]')
-
-        if await id_input.count() == 0:
-            filtro_btn = page.get_by_role("button", name=re.compile("Filtro|Filtros|Pesquisar|Buscar", re.I))
-            if await filtro_btn.count() > 0:
-                await filtro_btn.first.click()
-                await page.wait_for_timeout(400)
-                id_input = page.locator('#cltlotesearch-id')
-                if await id_input.count() == 0:
-                    id_input = page.locator('input[name="CltLoteSearch[id]"]')
-
-        id_input = id_input.first
-        # Redundância: aguarda elemento com retries e timeout maior
-        if not await wait_for_element(page, id_input, timeout=40000, retries=5, sleep=3):
-            return erro_playwright_retorno(id_consulta, "Campo de filtro por ID não encontrado", "playwright_service", "Timeout ao aguardar campo de filtro.")
-        await id_input.click()
-        await id_input.fill(str(row_id))
-        await id_input.press("Enter")
-        await page.wait_for_load_state("networkidle", timeout=40000)
-
-        search_btn = page.get_by_role("button", name=re.compile("Pesquisar|Buscar|Filtrar", re.I))
-        if await search_btn.count() > 0:
-            await search_btn.first.click()
-            await page.wait_for_load_state("networkidle", timeout=40000)
-
-        if logger:
-            logger.success("Filtro aplicado com sucesso.")
-        else:
-            print("[SUCCESS] Filtro aplicado com sucesso.")
-        return None
-    except Exception as e:
-        return erro_playwright_retorno(id_consulta, "Erro ao aplicar filtro por ID", "playwright_service", str(e))
-
-async def baixar_excel_por_id(row_id: int, titulo: str, logger: ProcessLogger = None, id_consulta=None) -> Optional[Path]:
-    try:
-        async with async_playwright() as p:
-            if logger:
-                logger.web("Iniciando navegador Playwright")
-            else:
-                print("[WEB] Iniciando navegador Playwright")
-            browser = await p.chromium.launch(headless=HEADLESS)
-            context = await browser.new_context(accept_downloads=True)
-            page = await context.new_page()
-            if logger:
-                logger.web("Fazendo login no site...")
-            else:
-                print("[WEB] Fazendo login no site...")
-            await page.goto("https://dashboard.conectpromotora.com.br/login", timeout=40000)
-            usuario_input = page.get_by_role("textbox", name="Usuário")
-            senha_input = page.get_by_role("textbox", name="Senha")
-            if not await wait_for_element(page, usuario_input, timeout=40000, retries=5, sleep=3):
-                await context.close(); await browser.close()
-                return erro_playwright_retorno(id_consulta, "Campo Usuário não encontrado", "playwright_service", "Timeout ao aguardar campo Usuário.")
-            if not await wait_for_element(page, senha_input, timeout=40000, retries=5, sleep=3):
-                await context.close(); await browser.close()
-                return erro_playwright_retorno(id_consulta, "Campo Senha não encontrado", "playwright_service", "Timeout ao aguardar campo Senha.")
-            await usuario_input.fill(SITE_USER)
-            await senha_input.fill(SITE_PASS)
-            await page.get_by_role("button", name="Acessar").click()
-            await page.wait_for_load_state("networkidle", timeout=40000)
-            if logger:
-                logger.web("Navegando para Consultas em Lote > CLT ...")
-            else:
-                print("[WEB] Navegando para Consultas em Lote > CLT ...")
-            await page.get_by_role("link", name="Consultas em Lote").click()
-            await page.wait_for_load_state("networkidle", timeout=40000)
-            await page.get_by_role("link", name="CLT").click()
-            await page.wait_for_load_state("networkidle", timeout=40000)
-            filtro_result = await _aplicar_filtro_por_id(page, row_id, logger, id_consulta)
-            if isinstance(filtro_result, dict):
-                await context.close(); await browser.close()
-                return filtro_result
-            consultas_link = page.get_by_role("link", name="Consultas")
-            if await consultas_link.count() > 1:
-                await consultas_link.nth(1).click()
-            else:
-                await consultas_link.first.click()
-            await page.wait_for_load_state("networkidle", timeout=40000)
-            if logger:
-                logger.web("Procurando botão 'Exportar Excel' e realizando download...")
-            else:
-                print("[WEB] Procurando botão 'Exportar Excel' e realizando download...")
-            export_btn = page.get_by_role("link", name="Exportar Excel")
-            if not await wait_for_element(page, export_btn, timeout=40000, retries=5, sleep=3):
-                await context.close(); await browser.close()
-                return erro_playwright_retorno(id_consulta, "Botão 'Exportar Excel' não encontrado", "playwright_service", "Timeout ao aguardar botão Exportar Excel.")
-            async with page.expect_download() as dlinfo:
-                await export_btn.first.click()
-            dl = await dlinfo.value
-            safe_name = re.sub(r'[\\/*?"<>|]+', '_', titulo)
-            dest = OUTPUT_DIR / f"{safe_name}.xlsx"
-            try:
-                await dl.save_as(str(dest))
-            except Exception as e:
-                await context.close(); await browser.close()
-                return erro_playwright_retorno(id_consulta, "Erro ao salvar arquivo baixado", "playwright_service", str(e))
-            if logger:
-                logger.success(f"Arquivo baixado: {dest}")
-            else:
-                print(f"[SUCCESS] Arquivo baixado: {dest}")
-            await context.close()
-            await browser.close()
-            return dest
-    except Exception as e:
-        return erro_playwright_retorno(id_consulta, "Erro geral no Playwright", "playwright_service", str(e))
+import os
+import re
+import asyncio
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from typing import Optional, List, Tuple, Dict, Union
+from playwright.async_api import Page
+from app.utils.logger import ProcessLogger
+from app.services.browser_pool import BrowserPool, PoolSessaoErro
+from app.services.export_http_service import ExportadorHttp
+from app.services import metricas_service as metricas
+
+OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", "./downloads"))
+OUTPUT_DIR.mkdir(exist_ok=True)
+
+SITE_USER = os.getenv("SITE_USER")
+SITE_PASS = os.getenv("SITE_PASS")
+
+# sempre com barra final: SITE_URL=http://127.0.0.1:8765 (dashboard local) também funciona
+SITE_URL = os.getenv("SITE_URL", "https://dashboard.conectpromotora.com.br/").rstrip("/") + "/"
+LOGIN_URL = SITE_URL + "login"
+
+# modo enxuto: bloqueia imagens/fontes/mídia/analytics e espera só o elemento de cada passo
+NAVEGACAO_ENXUTA = os.getenv("NAVEGACAO_ENXUTA", "false").lower() in ("1","true","yes","y")
+NAVEGACAO_TIMEOUT_MS = int(os.getenv("NAVEGACAO_TIMEOUT_MS", "15000"))
+
+SELETOR_FILTRO_ID = '#cltlotesearch-id, input[name="CltLoteSearch[id]"]'
+
+def erro_playwright_retorno(id_consulta, titulo, etapa, mensagem):
+    return {
+        "id": id_consulta,
+        "titulo": titulo,
+        "etapa": etapa,
+        "mensagem": mensagem
+    }
+
+async def wait_for_element(page, locator, timeout=30000, retries=5, sleep=2):
+    for attempt in range(retries):
+        try:
+            await locator.wait_for(state="visible", timeout=timeout)
+            return True
+        except Exception:
+            await asyncio.sleep(sleep)
+    return False
+
+async def _esperar_elemento(page, locator) -> bool:
+    if NAVEGACAO_ENXUTA:
+        return await wait_for_element(page, locator, timeout=NAVEGACAO_TIMEOUT_MS, retries=1, sleep=0)
+    return await wait_for_element(page, locator, timeout=40000, retries=5, sleep=3)
+
+async def _aguardar(page: Page, alvo=None, estado: str = "visible"):
+    """Após uma ação: no modo enxuto espera o elemento que o próximo passo usa; senão networkidle"""
+    if NAVEGACAO_ENXUTA and alvo is not None:
+        await alvo.first.wait_for(state=estado, timeout=NAVEGACAO_TIMEOUT_MS)
+    else:
+        await page.wait_for_load_state("networkidle", timeout=40000)
+
+async def _acionar_filtro(page: Page, acao):
+    """Dispara o filtro; no modo enxuto espera a resposta do grid filtrado em vez de networkidle"""
+    if NAVEGACAO_ENXUTA:
+        async with page.expect_response(lambda r: "CltLoteSearch" in r.url, timeout=NAVEGACAO_TIMEOUT_MS):
+            await acao()
+    else:
+        await acao()
+        await page.wait_for_load_state("networkidle", timeout=40000)
+
+@contextmanager
+def _medir(logger: ProcessLogger, etapa: str):
+    # histograma do Prometheus sempre; tempos do logger só quando há um (o pool loga sem logger)
+    with metricas.medir(etapa), (logger.medir(etapa) if logger else nullcontext()):
+        yield
+
+async def _aplicar_filtro_por_id(page: Page, row_id: int, logger: ProcessLogger = None, id_consulta=None) -> Optional[dict]:
+    if logger:
+        logger.web(f"Aplicando filtro pelo ID: {row_id}")
+    else:
+        print(f"[WEB] Aplicando filtro pelo ID: {row_id}")
+        
+    try:
+        id_input = page.locator(SELETOR_FILTRO_ID)
+
+        if await id_input.count() == 0:
+            filtro_btn = page.get_by_role("button", name=re.compile("Filtro|Filtros|Pesquisar|Buscar", re.I))
+            if await filtro_btn.count() > 0:
+                await filtro_btn.first.click()
+                if not NAVEGACAO_ENXUTA:
+                    await page.wait_for_timeout(400)
+                id_input = page.locator(SELETOR_FILTRO_ID)
+
+        id_input = id_input.first
+        # Redundância: aguarda elemento com retries e timeout maior
+        if not await _esperar_elemento(page, id_input):
+            return erro_playwright_retorno(id_consulta, "Campo de filtro por ID não encontrado", "playwright_service", "Timeout ao aguardar campo de filtro.")
+        await id_input.click()
+        await id_input.fill(str(row_id))
+        await _acionar_filtro(page, lambda: id_input.press("Enter"))
+
+        search_btn = page.get_by_role("button", name=re.compile("Pesquisar|Buscar|Filtrar", re.I))
+        if await search_btn.count() > 0:
+            await _acionar_filtro(page, lambda: search_btn.first.click())
+
+        if logger:
+            logger.success("Filtro aplicado com sucesso.")
+        else:
+            print("[SUCCESS] Filtro aplicado com sucesso.")
+        return None
+    except Exception as e:
+        return erro_playwright_retorno(id_consulta, "Erro ao aplicar filtro por ID", "playwright_service", str(e))
+
+async def _fazer_login(page: Page, logger: ProcessLogger = None, id_consulta=None) -> Optional[dict]:
+    with _medir(logger, "web_login"):
+        return await _login(page, logger, id_consulta)
+
+async def _login(page: Page, logger: ProcessLogger = None, id_consulta=None) -> Optional[dict]:
+    if logger:
+        logger.web("Fazendo login no site...")
+    else:
+        print("[WEB] Fazendo login no site...")
+    await page.goto(LOGIN_URL, timeout=40000)
+    usuario_input = page.get_by_role("textbox", name="Usuário")
+    senha_input = page.get_by_role("textbox", name="Senha")
+    if not await _esperar_elemento(page, usuario_input):
+        return erro_playwright_retorno(id_consulta, "Campo Usuário não encontrado", "playwright_service", "Timeout ao aguardar campo Usuário.")
+    if not await _esperar_elemento(page, senha_input):
+        return erro_playwright_retorno(id_consulta, "Campo Senha não encontrado", "playwright_service", "Timeout ao aguardar campo Senha.")
+    await usuario_input.fill(SITE_USER)
+    await senha_input.fill(SITE_PASS)
+    await page.get_by_role("button", name="Acessar").click()
+    if NAVEGACAO_ENXUTA:
+        try:
+            await page.wait_for_url(lambda url: "/login" not in url, timeout=NAVEGACAO_TIMEOUT_MS)
+        except Exception:
+            pass
+    else:
+        await page.wait_for_load_state("networkidle", timeout=40000)
+    if await _sessao_expirada(page):
+        return erro_playwright_retorno(id_consulta, "Login não concluído", "playwright_service", "Site permaneceu na tela de login após Acessar.")
+    return None
+
+async def _sessao_expirada(page: Page) -> bool:
+    return "/login" in page.url
+
+browser_pool = BrowserPool(SITE_URL, login=_fazer_login, sessao_expirada=_sessao_expirada,
+                           bloquear_recursos=NAVEGACAO_ENXUTA)
+exportador_http = ExportadorHttp(browser_pool)
+
+def _destino(titulo: str) -> Path:
+    safe_name = re.sub(r'[\\/*?"<>|]+', '_', titulo)
+    return OUTPUT_DIR / f"{safe_name}.xlsx"
+
+async def _navegar_para_clt(page: Page, logger: ProcessLogger = None):
+    if logger:
+        logger.web("Navegando para Consultas em Lote > CLT ...")
+    else:
+        print("[WEB] Navegando para Consultas em Lote > CLT ...")
+    with _medir(logger, "web_menu_clt"):
+        await page.get_by_role("link", name="Consultas em Lote").click()
+        await _aguardar(page, page.get_by_role("link", name="CLT"))
+        await page.get_by_role("link", name="CLT").click()
+        # o campo de filtro pode estar recolhido atrás do botão "Filtro": basta estar no DOM
+        await _aguardar(page, page.locator(SELETOR_FILTRO_ID), estado="attached")
+
+async def _exportar_lote(page: Page, row_id: int, titulo: str, logger: ProcessLogger = None, id_consulta=None):
+    """Filtro → Consultas → Exportar Excel numa página já posicionada em Consultas em Lote > CLT"""
+    with _medir(logger, "web_filtro"):
+        filtro_result = await _aplicar_filtro_por_id(page, row_id, logger, id_consulta)
+    if isinstance(filtro_result, dict):
+        return filtro_result
+    export_btn = page.get_by_role("link", name="Exportar Excel")
+    with _medir(logger, "web_consultas"):
+        consultas_link = page.get_by_role("link", name="Consultas")
+        if await consultas_link.count() > 1:
+            await consultas_link.nth(1).click()
+        else:
+            await consultas_link.first.click()
+        if not NAVEGACAO_ENXUTA:
+            await page.wait_for_load_state("networkidle", timeout=40000)
+        if logger:
+            logger.web("Procurando botão 'Exportar Excel' e realizando download...")
+        else:
+            print("[WEB] Procurando botão 'Exportar Excel' e realizando download...")
+        if not await _esperar_elemento(page, export_btn):
+            return erro_playwright_retorno(id_consulta, "Botão 'Exportar Excel' não encontrado", "playwright_service", "Timeout ao aguardar botão Exportar Excel.")
+    exportador_http.registrar_link(await export_btn.first.get_attribute("href"), row_id, page.url)
+    dest = _destino(titulo)
+    with _medir(logger, "web_download"):
+        async with page.expect_download() as dlinfo:
+            await export_btn.first.click()
+        dl = await dlinfo.value
+        try:
+            await dl.save_as(str(dest))
+        except Exception as e:
+            return erro_playwright_retorno(id_consulta, "Erro ao salvar arquivo baixado", "playwright_service", str(e))
+    if logger:
+        logger.success(f"Arquivo baixado: {dest}")
+    else:
+        print(f"[SUCCESS] Arquivo baixado: {dest}")
+    return dest
+
+async def baixar_excel_por_id(row_id: int, titulo: str, logger: ProcessLogger = None, id_consulta=None) -> Optional[Path]:
+    with metricas.em_andamento("download"):
+        return await _baixar_excel(row_id, titulo, logger, id_consulta)
+
+async def _baixar_excel(row_id: int, titulo: str, logger: ProcessLogger = None, id_consulta=None) -> Optional[Path]:
+    # caminho rápido: HTTP direto com os cookies da sessão do pool; None = segue pela interface
+    if exportador_http.pronto:
+        with _medir(logger, "web_export_http"):
+            dest = await exportador_http.baixar(row_id, _destino(titulo), logger)
+        if dest:
+            return dest
+    try:
+        async with browser_pool.pagina(logger, id_consulta) as page:
+            await _navegar_para_clt(page, logger)
+            return await _exportar_lote(page, row_id, titulo, logger, id_consulta)
+    except PoolSessaoErro as e:
+        return e.retorno
+    except Exception as e:
+        return erro_playwright_retorno(id_consulta, "Erro geral no Playwright", "playwright_service", str(e))
+
+async def baixar_excels_por_ids(itens: List[Tuple[int, str]], logger: ProcessLogger = None) -> Dict[int, Union[Path, dict]]:
+    """
+    Exporta vários lotes numa única sessão: login e navegação até CLT uma vez só, depois
+    filtro → Consultas → Exportar Excel para cada id. Retorna {row_id: caminho ou dict de erro}.
+    """
+    resultados: Dict[int, Union[Path, dict]] = {}
+    for row_id, titulo in itens:
+        dest = await exportador_http.baixar(row_id, _destino(titulo), logger)
+        if not dest:
+            break
+        resultados[row_id] = dest
+    itens = [(row_id, titulo) for row_id, titulo in itens if row_id not in resultados]
+    if not itens:
+        return resultados
+
+    try:
+        async with browser_pool.pagina(logger) as page:
+            await _navegar_para_clt(page, logger)
+            url_clt = page.url
+            for i, (row_id, titulo) in enumerate(itens):
+                try:
+                    if i > 0:
+                        # volta para a listagem de CLT sem refazer login nem o menu
+                        await page.goto(url_clt, timeout=40000)
+                        # o redirect para o login já aparece na URL depois do goto
+                        if await _sessao_expirada(page):
+                            for pendente_id, _ in itens[i:]:
+                                resultados[pendente_id] = erro_playwright_retorno(
+                                    pendente_id, "Sessão expirada durante o lote", "playwright_service",
+                                    "Site voltou para a tela de login no meio da exportação em lote.")
+                            break
+                        await _aguardar(page, page.locator(SELETOR_FILTRO_ID), estado="attached")
+                    resultados[row_id] = await _exportar_lote(page, row_id, titulo, logger, row_id)
+                except Exception as e:
+                    resultados[row_id] = erro_playwright_retorno(row_id, "Erro geral no Playwright", "playwright_service", str(e))
+    except PoolSessaoErro as e:
+        for row_id, _ in itens:
+            resultados.setdefault(row_id, {**e.retorno, "id": row_id})
+    except Exception as e:
+        for row_id, _ in itens:
+            resultados.setdefault(row_id, erro_playwright_retorno(row_id, "Erro geral no Playwright", "playwright_service", str(e)))
+    return resultados
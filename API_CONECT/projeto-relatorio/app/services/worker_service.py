@@ -0,0 +1,192 @@
+import os
+import asyncio
+from datetime import datetime
+from contextlib import suppress
+from typing import Optional, Dict, Any, Callable, Awaitable
+from app.utils.logger import info, warn, error
+from app.services.db_service import db_conexao, claim_pendentes
+from app.services.executor_service import executores
+
+WORKER_AUTOSTART = os.getenv("WORKER_AUTOSTART", "false").lower() in ("1","true","yes","y")
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_MIN = float(os.getenv("WORKER_POLL_MIN", "1"))
+WORKER_POLL_MAX = float(os.getenv("WORKER_POLL_MAX", "60"))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "300"))
+
+WORKER_PARADO = "parado"
+WORKER_EXECUTANDO = "executando"
+WORKER_PAUSADO = "pausado"
+WORKER_DRENANDO = "drenando"
+
+# executar(pendente) -> ProcessarResponse (dict); o main injeta o _executar_fluxo
+ExecutarFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _reservar(limite: int):
+    with db_conexao() as conn:
+        return claim_pendentes(conn, limite)
+
+
+class Worker:
+    """
+    Loop contínuo que esvazia a fila do controle_consultas.
+
+    Reserva até `concorrencia` pendentes por vez e roda o fluxo de cada um. Quando a fila
+    está vazia o intervalo de polling dobra a cada consulta vazia (de `poll_min` até
+    `poll_max`) e volta ao mínimo assim que algum pendente aparece. No stop para de
+    reservar e espera os lotes em andamento terminarem (até `drain_timeout`).
+    """
+
+    def __init__(self, concorrencia: int = WORKER_CONCURRENCY, poll_min: float = WORKER_POLL_MIN,
+                 poll_max: float = WORKER_POLL_MAX, drain_timeout: float = WORKER_DRAIN_TIMEOUT):
+        self.concorrencia = concorrencia
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.drain_timeout = drain_timeout
+        self.estado = WORKER_PARADO
+        self.intervalo = poll_min
+        self.processados = 0
+        self.sucesso = 0
+        self.erros = 0
+        self.iniciado_em: Optional[datetime] = None
+        self.ultimo_claim: Optional[datetime] = None
+        self._executar: Optional[ExecutarFn] = None
+        self._loop_tarefa: Optional[asyncio.Task] = None
+        self._parada: Optional[asyncio.Task] = None
+        self._em_andamento: Dict[int, asyncio.Task] = {}
+        self._acordar: Optional[asyncio.Event] = None
+
+    def start(self, executar: ExecutarFn = None) -> bool:
+        if executar is not None:
+            self._executar = executar
+        if self._loop_tarefa is not None or self._executar is None:
+            return False
+        self._acordar = asyncio.Event()
+        self.estado = WORKER_EXECUTANDO
+        self.intervalo = self.poll_min
+        self.iniciado_em = datetime.now()
+        self._loop_tarefa = asyncio.create_task(self._loop())
+        info(f"Worker iniciado (concorrência={self.concorrencia})")
+        return True
+
+    def pause(self) -> bool:
+        if self.estado != WORKER_EXECUTANDO:
+            return False
+        self.estado = WORKER_PAUSADO
+        self._acordar.set()
+        info("Worker pausado (lotes em andamento continuam)")
+        return True
+
+    def resume(self) -> bool:
+        if self.estado != WORKER_PAUSADO:
+            return False
+        self.estado = WORKER_EXECUTANDO
+        self.intervalo = self.poll_min
+        self._acordar.set()
+        info("Worker retomado")
+        return True
+
+    async def _loop(self):
+        while self.estado in (WORKER_EXECUTANDO, WORKER_PAUSADO):
+            self._acordar.clear()
+            livres = self.concorrencia - len(self._em_andamento)
+            if self.estado == WORKER_PAUSADO or livres <= 0:
+                await self._acordar.wait()
+                continue
+
+            try:
+                pendentes = await executores.db(_reservar, livres)
+            except Exception as e:
+                error(f"Worker: falha ao reservar pendentes: {e}")
+                pendentes = []
+            if pendentes:
+                self.ultimo_claim = datetime.now()
+                self.intervalo = self.poll_min
+                for pendente in pendentes:
+                    self._disparar(pendente)
+                continue
+
+            # fila vazia (ou banco fora): espera com backoff, acordando antes se um lote terminar
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                self.intervalo = min(self.intervalo * 2, self.poll_max)
+
+    def _disparar(self, pendente: Dict[str, Any]):
+        row_id = pendente["id"]
+        self._em_andamento[row_id] = asyncio.create_task(self._processar(pendente))
+
+    async def _processar(self, pendente: Dict[str, Any]):
+        row_id = pendente["id"]
+        try:
+            resultado = await self._executar(pendente)
+            self.processados += 1
+            if resultado.get("status") in ("ok", "sem_alteracoes"):
+                self.sucesso += 1
+            else:
+                self.erros += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.processados += 1
+            self.erros += 1
+            error(f"Worker: erro inesperado no registro {row_id}: {e}")
+        finally:
+            self._em_andamento.pop(row_id, None)
+            if self._acordar is not None:
+                self._acordar.set()
+
+    def solicitar_parada(self, drenar: bool = True) -> bool:
+        """Dispara o stop em background (o dreno pode levar minutos)"""
+        if self._loop_tarefa is None or self._parada is not None:
+            return False
+        self.estado = WORKER_DRENANDO
+        self._acordar.set()
+        self._parada = asyncio.create_task(self.stop(drenar))
+        return True
+
+    async def stop(self, drenar: bool = True):
+        if self._loop_tarefa is None:
+            return
+        if self._parada is not None and self._parada is not asyncio.current_task():
+            await self._parada
+            return
+
+        self.estado = WORKER_DRENANDO
+        self._acordar.set()
+        await self._loop_tarefa
+
+        tarefas = list(self._em_andamento.values())
+        pendentes = set(tarefas)
+        if tarefas and drenar:
+            info(f"Worker: aguardando {len(tarefas)} lote(s) em andamento (até {self.drain_timeout}s)")
+            _, pendentes = await asyncio.wait(tarefas, timeout=self.drain_timeout)
+        if pendentes:
+            # o lease desses registros expira e o reaper os devolve para a fila
+            warn(f"Worker: cancelando {len(pendentes)} lote(s) ainda em andamento")
+            for tarefa in pendentes:
+                tarefa.cancel()
+            for tarefa in pendentes:
+                with suppress(asyncio.CancelledError):
+                    await tarefa
+
+        self._loop_tarefa = None
+        self._parada = None
+        self.estado = WORKER_PARADO
+        info("Worker parado")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "estado": self.estado,
+            "concorrencia": self.concorrencia,
+            "em_andamento": sorted(self._em_andamento),
+            "intervalo_polling_segundos": self.intervalo,
+            "processados": self.processados,
+            "sucesso": self.sucesso,
+            "erros": self.erros,
+            "iniciado_em": self.iniciado_em.isoformat() if self.iniciado_em else None,
+            "ultimo_claim": self.ultimo_claim.isoformat() if self.ultimo_claim else None,
+        }
+
+
+worker = Worker()
@@ -0,0 +1,12 @@
+import hashlib
+
+BLOCO_LEITURA = 1024 * 1024
+
+
+def hash_arquivo(path, algoritmo: str = "sha256") -> str:
+    """Hash do conteúdo do arquivo, lido em blocos de 1 MB"""
+    h = hashlib.new(algoritmo)
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(BLOCO_LEITURA), b""):
+            h.update(bloco)
+    return h.hexdigest()
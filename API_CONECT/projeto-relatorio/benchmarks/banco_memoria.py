@@ -0,0 +1,101 @@
+"""
+Substituto em memória do MySQL para benchmarks sem servidor: implementa só o que
+inserir_mysql / inserir_mysql_delta usam (start_transaction, commit, execute dos SELECTs
+por CPF, executemany do upsert) sobre um dict cpf → linha.
+
+O custo de cliente do mysql-connector continua sendo pago: cada valor passa pelo
+MySQLConverter (to_mysql → escape → quote) como no executemany real, e cada ida ao
+servidor pode somar uma latência fixa (`latencia_ms`).
+"""
+import re
+import time
+import threading
+from contextlib import contextmanager
+from mysql.connector.conversion import MySQLConverter
+
+_COLUNAS_INSERT = re.compile(r"INSERT INTO consulta_dia_clt \(([^)]*)\)")
+
+
+class BancoMemoria:
+    def __init__(self, latencia_ms: float = 0.0):
+        self.linhas = {}
+        self.latencia = latencia_ms / 1000
+        self.idas_servidor = 0
+        self.bytes_enviados = 0
+        self._lock = threading.Lock()
+
+    def limpar(self):
+        with self._lock:
+            self.linhas.clear()
+            self.idas_servidor = 0
+            self.bytes_enviados = 0
+
+    def _ida(self):
+        self.idas_servidor += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    @contextmanager
+    def conexao(self, logger=None):
+        """Mesma assinatura do db_service.db_conexao"""
+        yield _Conexao(self)
+
+
+class _Conexao:
+    def __init__(self, banco: BancoMemoria):
+        self.banco = banco
+        self.in_transaction = False
+
+    def cursor(self, dictionary: bool = False):
+        return _Cursor(self.banco)
+
+    def start_transaction(self):
+        self.banco._ida()
+        self.in_transaction = True
+
+    def commit(self):
+        self.banco._ida()
+        self.in_transaction = False
+
+    def rollback(self):
+        self.banco._ida()
+        self.in_transaction = False
+
+
+class _Cursor:
+    def __init__(self, banco: BancoMemoria):
+        self.banco = banco
+        self.conversor = MySQLConverter("utf8mb4")
+        self._resultado = []
+
+    def execute(self, sql, params=()):
+        self.banco._ida()
+        linhas = self.banco.linhas
+        if "SELECT COUNT(*)" in sql:
+            self._resultado = [(sum(1 for cpf in params if cpf in linhas),)]
+        elif "SELECT cpf, hash_linha" in sql:
+            self._resultado = [(cpf, linhas[cpf].get("hash_linha")) for cpf in params if cpf in linhas]
+        else:
+            raise NotImplementedError(f"SQL não suportado pelo banco em memória: {sql.strip()[:80]}")
+
+    def executemany(self, sql, valores):
+        colunas = [c.strip(" `") for c in _COLUNAS_INSERT.search(sql).group(1).split(",")]
+        idx_cpf = colunas.index("cpf")
+        conv = self.conversor
+        tamanho = 0
+        with self.banco._lock:
+            for linha in valores:
+                # mesmo trabalho de cliente do executemany do mysql-connector ao montar o INSERT multi-linha
+                tamanho += sum(len(conv.quote(conv.escape(conv.to_mysql(v)))) for v in linha)
+                self.banco.linhas[linha[idx_cpf]] = dict(zip(colunas, linha))
+            self.banco.bytes_enviados += tamanho
+        self.banco._ida()
+
+    def fetchone(self):
+        return self._resultado[0] if self._resultado else None
+
+    def fetchall(self):
+        return self._resultado
+
+    def close(self):
+        pass
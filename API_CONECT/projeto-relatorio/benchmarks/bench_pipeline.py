@@ -0,0 +1,265 @@
+"""
+Benchmark do pipeline de ingestão: pd.read_excel → tratamento → inserção, cada etapa medida
+separadamente (melhor tempo de N execuções, linhas/s e pico de memória) sobre exports
+sintéticos .xlsx gerados por benchmarks/sintetico.py. O resultado vai para um JSON em
+benchmarks/resultados/ para comparar execuções ao longo do tempo.
+
+    python -m benchmarks.bench_pipeline                                   # 10k e 100k linhas, banco em memória
+    python -m benchmarks.bench_pipeline --linhas 50000 --modo delta --latencia-ms 1
+    python -m benchmarks.bench_pipeline --banco mysql                     # MySQL local (DB_HOST/DB_USER/DB_PASSWORD)
+    python -m benchmarks.bench_pipeline --comparar benchmarks/resultados/pipeline_20250101_120000.json
+
+--banco memoria usa benchmarks/banco_memoria.py (sem servidor, custo de cliente do mysql-connector
+incluído). --banco mysql grava numa base própria (--database, padrão bench_relatorio), criada e
+esvaziada pelo benchmark; só aceita servidor local, a não ser com --permitir-remoto.
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import mysql.connector
+from app.services import data_service
+from app.services.data_service import EXPECTED_COLS, DECIMAL_COLS, DATE_COLS, INSERT_CHUNK_SIZE
+from benchmarks.sintetico import gerar_export
+from benchmarks.banco_memoria import BancoMemoria
+
+PASTA = Path(__file__).resolve().parent
+DADOS_DIR = PASTA / "dados"
+RESULTADOS_DIR = PASTA / "resultados"
+HOSTS_LOCAIS = ("localhost", "127.0.0.1", "::1")
+
+
+def _arquivo_export(n: int, seed: int) -> Path:
+    """Gera (uma vez) e reaproveita o .xlsx sintético de n linhas"""
+    DADOS_DIR.mkdir(exist_ok=True)
+    caminho = DADOS_DIR / f"export_{n}_s{seed}.xlsx"
+    if not caminho.exists():
+        print(f"Gerando {caminho.name}...")
+        gerar_export(str(caminho) + ".tmp.xlsx", n, seed)
+        os.replace(str(caminho) + ".tmp.xlsx", caminho)
+    return caminho
+
+
+def _silencioso(fn, *args, **kwargs):
+    # os prints [DATA]/[DB] por chunk distorcem o tempo e poluem a saída
+    with redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def _medir(fn, repeticoes: int, preparar=None):
+    """Melhor tempo de N execuções + pico de memória (tracemalloc) numa execução à parte"""
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = _silencioso(fn)
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    try:
+        _silencioso(fn)
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return resultado, melhor, pico
+
+
+def _etapa(segundos: float, pico: int, linhas: int):
+    return {
+        "segundos": round(segundos, 4),
+        "linhas_por_segundo": round(linhas / segundos, 1) if segundos > 0 else None,
+        "pico_memoria_mb": round(pico / 1024 / 1024, 1),
+    }
+
+
+# ----------------------------------------------------------------------------------------------
+# banco
+# ----------------------------------------------------------------------------------------------
+def _ddl_consulta() -> str:
+    tipos = {c: "DECIMAL(10,2)" for c in DECIMAL_COLS}
+    tipos.update({c: "DATE" for c in DATE_COLS})
+    tipos.update({"elegivel_clt": "TINYINT", "erro_simulacao": "TEXT"})
+    colunas = ["`cpf` CHAR(11) NOT NULL"]
+    colunas += [f"`{c}` {tipos.get(c, 'VARCHAR(255)')} NULL" for c in EXPECTED_COLS if c != "cpf"]
+    colunas += ["`hash_linha` CHAR(16) NULL", "PRIMARY KEY (`cpf`)"]
+    return "CREATE TABLE IF NOT EXISTS consulta_dia_clt (\n  " + ",\n  ".join(colunas) + "\n)"
+
+
+class BancoMysql:
+    """Base de benchmark num MySQL local: cria a base/tabela e esvazia entre as rodadas"""
+
+    def __init__(self, database: str, permitir_remoto: bool):
+        host = os.getenv("DB_HOST") or "localhost"
+        if host not in HOSTS_LOCAIS and not permitir_remoto:
+            sys.exit(f"DB_HOST={host} não é local; use --permitir-remoto se for mesmo um servidor de teste.")
+        os.environ["DB_HOST"] = host
+        os.environ["DB_NAME"] = database
+        self.database = database
+        conn = mysql.connector.connect(host=host, user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"))
+        cur = conn.cursor()
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4")
+        cur.execute(f"USE `{database}`")
+        cur.execute(_ddl_consulta())
+        conn.commit()
+        cur.close()
+        self._conn = conn
+        self.idas_servidor = None
+
+    def limpar(self):
+        cur = self._conn.cursor()
+        cur.execute("TRUNCATE TABLE consulta_dia_clt")
+        cur.close()
+
+    def fechar(self):
+        self._conn.close()
+
+
+# ----------------------------------------------------------------------------------------------
+# execução
+# ----------------------------------------------------------------------------------------------
+def _rodar_tamanho(n: int, args, banco, inserir, tratar):
+    caminho = _arquivo_export(n, args.seed)
+    print(f"\n{n} linhas ({caminho.stat().st_size / 1024 / 1024:.1f} MB)")
+
+    bruto, t_leitura, pico_leitura = _medir(lambda: pd.read_excel(caminho), args.repeticoes)
+    (df, meta), t_trat, pico_trat = _medir(lambda: tratar(bruto.copy()), args.repeticoes)
+    if not meta:
+        sys.exit(f"Tratamento falhou: {df}")
+
+    # 1ª inserção com a tabela vazia (tudo novo); 2ª com o mesmo DataFrame (tudo já existe)
+    novos, t_novos, pico_novos = _medir(lambda: inserir(df), args.repeticoes, preparar=banco.limpar)
+    if not novos.get("ok"):
+        sys.exit(f"Inserção falhou: {novos}")
+    existentes, t_exist, pico_exist = _medir(lambda: inserir(df), args.repeticoes)
+
+    linhas_tratadas = meta["linhas_tratadas"]
+    etapas = {
+        "leitura_excel": _etapa(t_leitura, pico_leitura, n),
+        "tratamento": _etapa(t_trat, pico_trat, n),
+        "insercao_novos": _etapa(t_novos, pico_novos, linhas_tratadas),
+        "insercao_existentes": _etapa(t_exist, pico_exist, linhas_tratadas),
+    }
+    for nome, e in etapas.items():
+        print(f"  {nome:<20} {e['segundos']:>9.3f}s  {e['linhas_por_segundo'] or 0:>11,.0f} linhas/s  "
+              f"pico {e['pico_memoria_mb']:>8.1f} MB")
+    return {
+        "linhas": n,
+        "arquivo_mb": round(caminho.stat().st_size / 1024 / 1024, 2),
+        "linhas_tratadas": linhas_tratadas,
+        "cpfs_dedup": meta.get("cpfs_dedup"),
+        "etapas": etapas,
+        "insercao": {
+            "novos": {k: novos.get(k) for k in ("enviados", "novos", "atualizados", "ignorados")},
+            "existentes": {k: existentes.get(k) for k in ("enviados", "novos", "atualizados", "ignorados")},
+        },
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _comparar(atual: dict, caminho_anterior: str):
+    with open(caminho_anterior, encoding="utf-8") as f:
+        anterior = json.load(f)
+    print(f"\nComparação com {caminho_anterior} (commit {anterior.get('commit')}, {anterior.get('executado_em')}):")
+    por_tamanho = {r["linhas"]: r for r in anterior.get("resultados", [])}
+    for r in atual["resultados"]:
+        antes = por_tamanho.get(r["linhas"])
+        if not antes:
+            continue
+        for nome, e in r["etapas"].items():
+            a = antes["etapas"].get(nome)
+            if not a or not a["segundos"]:
+                continue
+            variacao = (e["segundos"] - a["segundos"]) / a["segundos"] * 100
+            print(f"  {r['linhas']:>9} {nome:<20} {a['segundos']:>9.3f}s → {e['segundos']:>9.3f}s ({variacao:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor tempo de N execuções por etapa")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--banco", choices=["memoria", "mysql"], default="memoria")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência por ida ao servidor (banco em memória)")
+    parser.add_argument("--database", default="bench_relatorio", help="base usada com --banco mysql")
+    parser.add_argument("--permitir-remoto", action="store_true")
+    parser.add_argument("--modo", choices=sorted(data_service.MODOS_INSERCAO), default="executemany")
+    parser.add_argument("--motor", choices=["configurado", "original", "rapido"], default="configurado",
+                        help="tratamento: TRATAMENTO_RAPIDO do ambiente, tratar_df ou tratar_df_rapido")
+    parser.add_argument("--saida", help="JSON de resultado (padrão: benchmarks/resultados/pipeline_<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para mostrar a variação por etapa")
+    args = parser.parse_args()
+
+    if args.banco == "memoria":
+        if args.modo == "bulk":
+            sys.exit("O modo bulk (LOAD DATA) precisa de --banco mysql.")
+        banco = BancoMemoria(args.latencia_ms)
+        data_service.db_conexao = banco.conexao
+    else:
+        banco = BancoMysql(args.database, args.permitir_remoto)
+
+    tratar = {"configurado": data_service.tratar, "original": data_service.tratar_df,
+              "rapido": data_service.tratar_df_rapido}[args.motor]
+    inserir = data_service.MODOS_INSERCAO[args.modo]
+
+    resultados = [_rodar_tamanho(n, args, banco, inserir, tratar) for n in args.linhas]
+    if isinstance(banco, BancoMysql):
+        banco.fechar()
+
+    saida = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "banco": args.banco,
+            "latencia_ms": args.latencia_ms if args.banco == "memoria" else None,
+            "modo_insercao": args.modo,
+            "motor_tratamento": args.motor if args.motor != "configurado" else
+                                ("rapido" if data_service.TRATAMENTO_RAPIDO else "original"),
+            "insert_chunk_size": INSERT_CHUNK_SIZE,
+            "repeticoes": args.repeticoes,
+            "seed": args.seed,
+        },
+        "resultados": resultados,
+        # ru_maxrss é em KB no Linux
+        "pico_rss_processo_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+    caminho = Path(args.saida) if args.saida else RESULTADOS_DIR / f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado salvo em {caminho}")
+
+    if args.comparar:
+        _comparar(saida, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
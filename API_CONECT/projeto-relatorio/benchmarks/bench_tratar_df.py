@@ -0,0 +1,93 @@
+"""
+Benchmark + teste de equivalência do tratamento: tratar_df (original) x tratar_df_rapido.
+
+Para cada tamanho, gera um export sintético (CPF em texto e numérico), confere que os dois
+motores devolvem exatamente o mesmo DataFrame (valores, tipos de cada célula, índice e meta)
+e mede o tempo de cada um. Sai com código 1 se houver qualquer diferença.
+
+    python -m benchmarks.bench_tratar_df                      # 10k / 100k / 1M
+    python -m benchmarks.bench_tratar_df --linhas 10000 --repeticoes 5 --saida bench_tratar.json
+"""
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+from app.services.data_service import tratar_df, tratar_df_rapido
+from benchmarks.sintetico import gerar_df_bruto
+
+
+def diferencas(esperado: pd.DataFrame, obtido: pd.DataFrame):
+    """Lista legível das diferenças entre as saídas (vazia = idênticas)"""
+    if list(esperado.columns) != list(obtido.columns):
+        return [f"colunas: {list(esperado.columns)} != {list(obtido.columns)}"]
+    if not esperado.index.equals(obtido.index):
+        return ["índice diferente"]
+    erros = []
+    for col in esperado.columns:
+        a, b = esperado[col], obtido[col]
+        if a.dtype != b.dtype:
+            erros.append(f"{col}: dtype {a.dtype} != {b.dtype}")
+        elif not a.map(type).equals(b.map(type)):
+            erros.append(f"{col}: tipos das células diferentes")
+        elif not a.equals(b):
+            pos = next(i for i, (x, y) in enumerate(zip(a, b)) if x != y)
+            erros.append(f"{col}: linha {pos}: {a.iloc[pos]!r} != {b.iloc[pos]!r}")
+    return erros
+
+
+def _medir(fn, bruto: pd.DataFrame, repeticoes: int):
+    tempos = []
+    for _ in range(repeticoes):
+        entrada = bruto.copy()
+        inicio = time.perf_counter()
+        df, meta = fn(entrada)
+        tempos.append(time.perf_counter() - inicio)
+    return df, meta, min(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor tempo de N execuções")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    falhou = False
+    for n in args.linhas:
+        for cpf_numerico in (False, True):
+            bruto = gerar_df_bruto(n, args.seed, cpf_numerico=cpf_numerico)
+            original, meta_original, t_original = _medir(lambda d: tratar_df(d), bruto, args.repeticoes)
+            rapido, meta_rapido, t_rapido = _medir(lambda d: tratar_df_rapido(d), bruto, args.repeticoes)
+
+            erros = diferencas(original, rapido)
+            if meta_original != meta_rapido:
+                erros.append(f"meta: {meta_original} != {meta_rapido}")
+            falhou |= bool(erros)
+            r = {
+                "linhas": n,
+                "cpf": "numerico" if cpf_numerico else "texto",
+                "linhas_tratadas": meta_original.get("linhas_tratadas"),
+                "tratar_df_s": round(t_original, 3),
+                "tratar_df_rapido_s": round(t_rapido, 3),
+                "ganho": round(t_original / t_rapido, 2) if t_rapido > 0 else None,
+                "equivalente": not erros,
+                "diferencas": erros[:10],
+            }
+            resultados.append(r)
+            status = "OK" if not erros else "DIFERENTE"
+            print(f"{n:>9} linhas | CPF {r['cpf']:<8} | tratar_df {t_original:7.3f}s | "
+                  f"rapido {t_rapido:7.3f}s | {r['ganho']}x | {status}")
+            for e in erros[:10]:
+                print(f"    - {e}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"repeticoes": args.repeticoes, "seed": args.seed, "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
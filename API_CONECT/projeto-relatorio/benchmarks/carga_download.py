@@ -0,0 +1,164 @@
+"""
+Teste de carga offline do download de Excel: sobe o dashboard local (benchmarks/dashboard_local.py)
+numa thread, aponta o playwright_service para ele (SITE_URL) e dispara N exportações
+concorrentes por baixar_excel_por_id, com o pool de navegadores de verdade.
+
+    python -m benchmarks.carga_download --downloads 40 --concorrencia 4 --pool 2
+    python -m benchmarks.carga_download --downloads 20 --taxa-erro 0.1 --sessao-ttl-s 5 --enxuta
+    python -m benchmarks.carga_download --url http://127.0.0.1:8765/   # dashboard já rodando
+
+Mostra latência (p50/p95/máx) por download, vazão, falhas por motivo, quantos logins o pool
+fez, quantos downloads saíram pelo HTTP direto x interface, e grava tudo em
+benchmarks/resultados/carga_<data>.json. Precisa do Chromium do Playwright instalado
+(`playwright install chromium`).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+from benchmarks.dashboard_local import criar_app, adicionar_argumentos, config_dos_argumentos
+
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _subir_dashboard(config):
+    """uvicorn numa thread daemon; devolve (url, app) quando o servidor já está aceitando conexões"""
+    import uvicorn
+    porta = _porta_livre()
+    app = criar_app(config)
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=porta, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    inicio = time.monotonic()
+    while not servidor.started:
+        if time.monotonic() - inicio > 15:
+            sys.exit("Dashboard local não subiu em 15s")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{porta}/", app
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))], 3)
+
+
+async def _carga(args):
+    # importado só depois de SITE_URL/BROWSER_POOL_SIZE/... estarem no ambiente
+    from app.services.playwright_service import baixar_excel_por_id, browser_pool, exportador_http
+
+    semaforo = asyncio.Semaphore(args.concorrencia)
+    duracoes, falhas = [], Counter()
+
+    async def _um(i: int):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                r = await baixar_excel_por_id(i, f"carga_{i}", None, i)
+            except Exception as e:
+                r = {"mensagem": f"{type(e).__name__}: {e}"}
+            duracao = time.perf_counter() - inicio
+            if r and not isinstance(r, dict):
+                duracoes.append(duracao)
+            else:
+                falhas[(r or {}).get("titulo") or (r or {}).get("mensagem") or "sem retorno"] += 1
+
+    await browser_pool.start()
+    try:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(_um(i) for i in range(1, args.downloads + 1)))
+        total = time.perf_counter() - inicio
+        pool = await browser_pool.saude()
+    finally:
+        await exportador_http.fechar()
+        await browser_pool.stop()
+
+    return {
+        "downloads": args.downloads,
+        "sucesso": len(duracoes),
+        "falhas": sum(falhas.values()),
+        "falhas_por_motivo": dict(falhas),
+        "duracao_total_s": round(total, 3),
+        "downloads_por_segundo": round(len(duracoes) / total, 2) if total > 0 else None,
+        "latencia_s": {
+            "p50": _percentil(duracoes, 50),
+            "p95": _percentil(duracoes, 95),
+            "max": round(max(duracoes), 3) if duracoes else None,
+            "media": round(statistics.mean(duracoes), 3) if duracoes else None,
+        },
+        "pool": {**pool, "logins": browser_pool.logins},
+        "export_http": exportador_http.saude(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--downloads", type=int, default=20)
+    parser.add_argument("--concorrencia", type=int, default=4, help="downloads simultâneos")
+    parser.add_argument("--pool", type=int, default=2, help="BROWSER_POOL_SIZE")
+    parser.add_argument("--enxuta", action="store_true", help="NAVEGACAO_ENXUTA=true")
+    parser.add_argument("--sem-http", action="store_true", help="EXPORT_HTTP=false (só interface)")
+    parser.add_argument("--timeout-ms", type=int, default=15000, help="NAVEGACAO_TIMEOUT_MS")
+    parser.add_argument("--url", help="usa um dashboard já rodando em vez de subir um local")
+    parser.add_argument("--saida", help="JSON de resultado (padrão: benchmarks/resultados/carga_<data>.json)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+
+    config = config_dos_argumentos(args)
+    app = None
+    url = args.url
+    if not url:
+        url, app = _subir_dashboard(config)
+    print(f"Dashboard: {url}")
+
+    os.environ.update({
+        "SITE_URL": url,
+        "SITE_USER": config.usuario,
+        "SITE_PASS": config.senha,
+        "BROWSER_POOL_SIZE": str(args.pool),
+        "NAVEGACAO_ENXUTA": "true" if args.enxuta else "false",
+        "NAVEGACAO_TIMEOUT_MS": str(args.timeout_ms),
+        "EXPORT_HTTP": "false" if args.sem_http else "true",
+        "OUTPUT_DIR": tempfile.mkdtemp(prefix="carga_download_"),
+    })
+
+    resultado = asyncio.run(_carga(args))
+    resultado["dashboard"] = dict(app.state.stats) if app else None
+    saida = {
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k != "saida"},
+        "resultado": resultado,
+    }
+
+    r = resultado
+    print(f"{r['sucesso']}/{r['downloads']} downloads em {r['duracao_total_s']}s "
+          f"({r['downloads_por_segundo']}/s) | p50 {r['latencia_s']['p50']}s p95 {r['latencia_s']['p95']}s "
+          f"máx {r['latencia_s']['max']}s | logins {r['pool']['logins']} | "
+          f"HTTP direto {r['export_http']['sucessos']} / fallbacks {r['export_http']['fallbacks']}")
+    for motivo, qtd in r["falhas_por_motivo"].items():
+        print(f"  falha x{qtd}: {motivo}")
+
+    caminho = Path(args.saida) if args.saida else RESULTADOS_DIR / f"carga_{datetime.now():%Y%m%d_%H%M%S}.json"
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Resultado salvo em {caminho}")
+
+
+if __name__ == "__main__":
+    main()
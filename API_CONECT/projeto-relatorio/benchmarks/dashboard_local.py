@@ -0,0 +1,221 @@
+"""
+Réplica local e mínima do dashboard da ConectPromotora, para rodar o caminho do Playwright
+(login → Consultas em Lote > CLT → filtro por ID → Consultas → Exportar Excel) sem acessar o
+site real. Os textos, rótulos e seletores são os que o playwright_service procura.
+
+    python -m benchmarks.dashboard_local --porta 8765 --latencia-ms 80 --taxa-erro 0.05
+    SITE_URL=http://127.0.0.1:8765/ SITE_USER=bench SITE_PASS=bench uvicorn app.main:app
+
+Injeção de falhas/latência (também ajustável em execução via POST /_config com JSON):
+  latencia_ms / jitter_ms     atraso em toda página
+  latencia_export_ms          atraso extra na geração do Excel
+  taxa_erro                   fração de respostas 500 (páginas e export)
+  taxa_lento / lento_s        fração de respostas que demoram lento_s (para estourar timeouts)
+  taxa_erro_export            fração de exports que devolvem HTML em vez do .xlsx
+  sessao_ttl_s                sessão expira depois disso (0 = nunca)
+GET /_stats devolve os contadores (logins, exports, falhas injetadas).
+"""
+import asyncio
+import random
+import secrets
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from dataclasses import dataclass, asdict, fields
+from collections import Counter
+from datetime import datetime
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse
+from benchmarks.sintetico import gerar_export
+
+COOKIE = "dashboard_sessao"
+
+
+@dataclass
+class ConfigDashboard:
+    usuario: str = "bench"
+    senha: str = "bench"
+    latencia_ms: float = 50.0
+    jitter_ms: float = 20.0
+    latencia_export_ms: float = 300.0
+    taxa_erro: float = 0.0
+    taxa_lento: float = 0.0
+    lento_s: float = 60.0
+    taxa_erro_export: float = 0.0
+    sessao_ttl_s: float = 0.0
+    linhas_export: int = 1000
+
+
+def _pagina(titulo: str, corpo: str, menu: bool = True) -> HTMLResponse:
+    nav = '<nav><a href="/">Início</a> | <a href="/consultas-lote">Consultas em Lote</a></nav>' if menu else ""
+    return HTMLResponse(f"<!doctype html><html><head><meta charset='utf-8'><title>{titulo}</title></head>"
+                        f"<body>{nav}<h1>{titulo}</h1>{corpo}</body></html>")
+
+
+def criar_app(config: ConfigDashboard = None) -> FastAPI:
+    config = config or ConfigDashboard()
+    app = FastAPI(title="Dashboard local", docs_url=None, redoc_url=None, openapi_url=None)
+    sessoes = {}
+    stats = Counter()
+    exports = {}
+    lock_export = threading.Lock()
+
+    def _arquivo_export() -> Path:
+        # um .xlsx sintético por tamanho, gerado na primeira exportação
+        with lock_export:
+            caminho = exports.get(config.linhas_export)
+            if caminho is None or not caminho.exists():
+                caminho = Path(tempfile.gettempdir()) / f"dashboard_local_{config.linhas_export}.xlsx"
+                if not caminho.exists():
+                    gerar_export(caminho, config.linhas_export)
+                exports[config.linhas_export] = caminho
+            return caminho
+
+    def _autenticado(request: Request) -> bool:
+        criada = sessoes.get(request.cookies.get(COOKIE))
+        if criada is None:
+            return False
+        if config.sessao_ttl_s and (datetime.now() - criada).total_seconds() > config.sessao_ttl_s:
+            sessoes.pop(request.cookies.get(COOKIE), None)
+            stats["sessoes_expiradas"] += 1
+            return False
+        return True
+
+    @app.middleware("http")
+    async def _injetar(request: Request, call_next):
+        if request.url.path.startswith("/_"):
+            return await call_next(request)
+        stats["requisicoes"] += 1
+        atraso = config.latencia_ms + random.uniform(0, config.jitter_ms)
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+        if config.taxa_lento and random.random() < config.taxa_lento:
+            stats["lentas_injetadas"] += 1
+            await asyncio.sleep(config.lento_s)
+        if config.taxa_erro and random.random() < config.taxa_erro:
+            stats["erros_injetados"] += 1
+            return HTMLResponse("<h1>500 Internal Server Error</h1>", status_code=500)
+        return await call_next(request)
+
+    @app.get("/login")
+    async def login_form(erro: int = 0):
+        aviso = "<p>Usuário ou senha incorretos.</p>" if erro else ""
+        return _pagina("Login", f"""{aviso}
+            <form method="post" action="/login">
+              <label for="usuario">Usuário</label> <input type="text" id="usuario" name="usuario">
+              <label for="senha">Senha</label> <input type="password" id="senha" name="senha">
+              <button type="submit">Acessar</button>
+            </form>""", menu=False)
+
+    @app.post("/login")
+    async def login(request: Request):
+        dados = parse_qs((await request.body()).decode("utf-8"))
+        if dados.get("usuario", [""])[0] != config.usuario or dados.get("senha", [""])[0] != config.senha:
+            stats["logins_recusados"] += 1
+            return RedirectResponse("/login?erro=1", status_code=303)
+        token = secrets.token_hex(16)
+        sessoes[token] = datetime.now()
+        stats["logins"] += 1
+        resp = RedirectResponse("/", status_code=303)
+        resp.set_cookie(COOKIE, token, httponly=True)
+        return resp
+
+    @app.get("/")
+    async def inicio(request: Request):
+        if not _autenticado(request):
+            return RedirectResponse("/login", status_code=302)
+        return _pagina("Início", "<p>Bem-vindo.</p>")
+
+    @app.get("/consultas-lote")
+    async def consultas_lote(request: Request):
+        if not _autenticado(request):
+            return RedirectResponse("/login", status_code=302)
+        return _pagina("Consultas em Lote", '<ul><li><a href="/clt-lote/index">CLT</a></li></ul>')
+
+    @app.get("/clt-lote/index")
+    async def clt_index(request: Request):
+        if not _autenticado(request):
+            return RedirectResponse("/login", status_code=302)
+        filtro = request.query_params.get("CltLoteSearch[id]", "")
+        ids = [int(filtro)] if filtro.isdigit() else list(range(1, 6))
+        linhas = "".join(f'<tr><td>{i}</td><td>Lote {i}</td><td><a href="/clt-lote/consultas?id={i}">Consultas</a></td></tr>'
+                         for i in ids)
+        return _pagina("CLT", f"""
+            <form method="get" action="/clt-lote/index">
+              <label for="cltlotesearch-id">ID</label>
+              <input type="text" id="cltlotesearch-id" name="CltLoteSearch[id]" value="{filtro}">
+              <button type="submit">Pesquisar</button>
+            </form>
+            <table><tr><th>ID</th><th>Título</th><th></th></tr>{linhas}</table>""")
+
+    @app.get("/clt-lote/consultas")
+    async def clt_consultas(request: Request, id: int):
+        if not _autenticado(request):
+            return RedirectResponse("/login", status_code=302)
+        return _pagina(f"Consultas do lote {id}",
+                       f'<a href="/clt-lote/export?CltLoteSearch%5Bid%5D={id}">Exportar Excel</a>')
+
+    @app.get("/clt-lote/export")
+    async def clt_export(request: Request):
+        if not _autenticado(request):
+            return RedirectResponse("/login", status_code=302)
+        lote = request.query_params.get("CltLoteSearch[id]", "0")
+        if config.latencia_export_ms:
+            await asyncio.sleep(config.latencia_export_ms / 1000)
+        if config.taxa_erro_export and random.random() < config.taxa_erro_export:
+            stats["exports_invalidos_injetados"] += 1
+            return HTMLResponse("<p>Não foi possível gerar o arquivo.</p>")
+        caminho = await asyncio.to_thread(_arquivo_export)
+        stats["exports"] += 1
+        return FileResponse(caminho, filename=f"lote_{lote}.xlsx",
+                            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    @app.get("/_stats")
+    async def estatisticas():
+        return {"sessoes_ativas": len(sessoes), **stats}
+
+    @app.get("/_config")
+    async def ver_config():
+        return asdict(config)
+
+    @app.post("/_config")
+    async def ajustar_config(request: Request):
+        campos = {f.name: f.type for f in fields(config)}
+        ajustes = await request.json()
+        desconhecidos = set(ajustes) - set(campos)
+        if desconhecidos:
+            return JSONResponse({"erro": f"campos desconhecidos: {sorted(desconhecidos)}"}, status_code=400)
+        for nome, valor in ajustes.items():
+            setattr(config, nome, valor)
+        return asdict(config)
+
+    app.state.config = config
+    app.state.stats = stats
+    return app
+
+
+def adicionar_argumentos(parser: argparse.ArgumentParser):
+    """Opções de ConfigDashboard na linha de comando (--latencia-ms, --taxa-erro, ...)"""
+    for f in fields(ConfigDashboard):
+        parser.add_argument("--" + f.name.replace("_", "-"), dest=f.name, type=type(f.default), default=f.default)
+
+
+def config_dos_argumentos(args) -> ConfigDashboard:
+    return ConfigDashboard(**{f.name: getattr(args, f.name) for f in fields(ConfigDashboard)})
+
+
+def main():
+    import uvicorn
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8765)
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    print(f"Dashboard local em http://{args.host}:{args.porta}/ (usuário {args.usuario})")
+    uvicorn.run(criar_app(config_dos_argumentos(args)), host=args.host, port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
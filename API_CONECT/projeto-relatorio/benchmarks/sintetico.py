@@ -0,0 +1,89 @@
+"""
+Gerador de exports sintéticos no formato do "Exportar Excel" do dashboard (mesmos cabeçalhos
+do RENAME_MAP), com a sujeira que aparece nos arquivos reais: CPF formatado ou numérico,
+CPFs repetidos, datas em texto misturadas com células de data do Excel, strings vazias/'nan',
+valores fora do limite do DECIMAL.
+"""
+import numpy as np
+import pandas as pd
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Íris", "João"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Costa", "Ribeiro"]
+EMPRESAS = ["Comércio Alfa LTDA", "Indústria Beta S/A", "Serviços Gama ME", "Transportes Delta"]
+PROFISSOES = ["Vendedor", "Motorista", "Auxiliar Administrativo", "Operador de Caixa", ""]
+
+
+def _cpfs(rng, n: int, numerico: bool, duplicados: float):
+    base = rng.integers(1_000_000, 99_999_999_999, size=n, dtype=np.int64)
+    # parte das linhas repete um CPF anterior (mesma pessoa consultada de novo no lote)
+    rep = rng.random(n) < duplicados
+    base[rep] = base[rng.integers(0, n, size=int(rep.sum()))]
+    if numerico:
+        return base
+    cpfs = pd.Series(base).map("{:011d}".format)
+    formatados = rng.random(n) < 0.5
+    cpfs[formatados] = cpfs[formatados].str.replace(r"(\d{3})(\d{3})(\d{3})(\d{2})", r"\1.\2.\3-\4", regex=True)
+    sujos = rng.random(n)
+    cpfs[sujos < 0.01] = ""
+    cpfs[(sujos >= 0.01) & (sujos < 0.015)] = "nan"
+    cpfs[(sujos >= 0.015) & (sujos < 0.02)] = None
+    return cpfs.to_numpy(dtype=object)
+
+
+def _datas_texto(rng, n: int, inicio: str, dias: int, nulos: float = 0.02, celulas_data: float = 0.0):
+    """Datas em texto dd/mm/aaaa; `celulas_data` é a fração que vem como data de verdade do Excel"""
+    datas = pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, size=n), unit="D")
+    texto = pd.Series(datas.strftime("%d/%m/%Y"), dtype=object)
+    if celulas_data:
+        reais = rng.random(n) < celulas_data
+        texto[reais] = pd.Series(datas, dtype=object)[reais]
+    texto[rng.random(n) < nulos] = None
+    return texto.to_numpy()
+
+
+def _valores(rng, n: int, escala: float, fora_limite: float = 0.001):
+    v = np.round(rng.gamma(2.0, escala, size=n), 2)
+    v[rng.random(n) < fora_limite] = 1e12
+    v[rng.random(n) < 0.02] = np.nan
+    return v
+
+
+def gerar_df_bruto(n: int, seed: int = 42, cpf_numerico: bool = False, duplicados: float = 0.03, lote: int = 1) -> pd.DataFrame:
+    """DataFrame como o pd.read_excel devolve para um export de `n` linhas"""
+    rng = np.random.default_rng(seed)
+    nomes = rng.choice(NOMES, n) + " " + rng.choice(SOBRENOMES, n)
+    criacao = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 30 * 86400, size=n), unit="s")
+    return pd.DataFrame({
+        "Lote": np.full(n, lote),
+        "CPF": _cpfs(rng, n, cpf_numerico, duplicados),
+        "Matrícula": np.where(rng.random(n) < 0.5, rng.integers(1000, 99999, size=n).astype(str), ""),
+        "Nome": nomes,
+        "Data Nascimento": _datas_texto(rng, n, "1960-01-01", 40 * 365),
+        "Data Admissão": _datas_texto(rng, n, "2005-01-01", 20 * 365, nulos=0.1, celulas_data=0.2),
+        "Valor Renda": _valores(rng, n, 1500),
+        "Valor Base Margem": _valores(rng, n, 500),
+        "Valor Margem Disponível": _valores(rng, n, 400),
+        "Valor Máximo Prestação": _valores(rng, n, 300),
+        "CNPJ Empresa": rng.integers(10**13, 10**14 - 1, size=n).astype(str),
+        "Elegível": rng.choice(np.array([True, False, "True", "False", None], dtype=object), n),
+        "CNAE": rng.choice(["4711301", "4930202", "8211300", "nan"], n),
+        "Erro": rng.choice(np.array(["", "Margem insuficiente", None, "Sem vínculo ativo"], dtype=object), n),
+        "Data Criação": criacao,
+        "Data Modificação": criacao + pd.Timedelta(hours=1),
+        "Código Categoria Trabalhador": rng.choice([101, 102, 103], n),
+        "Sexo": rng.choice(["M", "F", "None"], n),
+        "Nome Empregador": rng.choice(EMPRESAS, n),
+        "Nome Mãe": rng.choice(NOMES, n) + " " + rng.choice(SOBRENOMES, n),
+        "CBO Descrição": rng.choice(PROFISSOES, n),
+        "CNAE Descrição": rng.choice(["Comércio varejista", "Transporte rodoviário", "Serviços de escritório"], n),
+        "Empréstimos Legados": rng.integers(0, 4, size=n),
+        "Qtd Empréstimos Ativos Suspensos": rng.integers(0, 2, size=n),
+        "Prazo Máximo": rng.choice([24, 36, 48, 60, 72], n),
+        "Valor Liberado": _valores(rng, n, 3000),
+    })
+
+
+def gerar_export(caminho, n: int, seed: int = 42, **kwargs) -> str:
+    """Grava o export sintético em .xlsx (openpyxl), como o arquivo baixado do dashboard"""
+    gerar_df_bruto(n, seed, **kwargs).to_excel(caminho, index=False)
+    return str(caminho)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# permite `pytest` tanto da pasta do projeto quanto da raiz do repositório
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services.export_http_service import ExportadorHttp
+
+BASE = "http://dashboard.local/clt-lote/index"
+XLSX = b"PK\x03\x04" + b"\x00" * 2048
+
+
+def _exportador(handler, template=None):
+    """Exportador com sessão fake no pool e o dashboard substituído por um MockTransport"""
+    pool = SimpleNamespace(
+        storage_state={"cookies": [{"name": "PHPSESSID", "value": "sessao-ok", "domain": "dashboard.local"}]},
+        geracao_sessao=1,
+    )
+    exp = ExportadorHttp(pool, url_template=template, ativo=True, timeout=5)
+    exp._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=False)
+    return exp
+
+
+def _baixar(exp, row_id, dest):
+    async def _rodar():
+        try:
+            return await exp.baixar(row_id, dest)
+        finally:
+            await exp.fechar()
+    return asyncio.run(_rodar())
+
+
+def _sem_parciais(pasta):
+    return not [p for p in os.listdir(pasta) if p.endswith(".part")]
+
+
+def test_captura_modelo_do_href_e_baixa(tmp_path):
+    pedidos = []
+
+    def handler(request):
+        pedidos.append(request)
+        return httpx.Response(200, content=XLSX)
+
+    exp = _exportador(handler)
+    assert not exp.pronto
+    # href de outro lote não serve de modelo
+    exp.registrar_link("/clt-lote/export?CltLoteSearch%5Bid%5D=41", 42, BASE)
+    assert exp.url_template is None
+    exp.registrar_link("/clt-lote/export?CltLoteSearch%5Bid%5D=42&formato=xlsx", 42, BASE)
+    assert exp.url_template == "http://dashboard.local/clt-lote/export?CltLoteSearch%5Bid%5D={id}&formato=xlsx"
+
+    dest = tmp_path / "lote_7.xlsx"
+    assert _baixar(exp, 7, dest) == dest
+    assert dest.read_bytes() == XLSX
+    assert str(pedidos[0].url) == "http://dashboard.local/clt-lote/export?CltLoteSearch%5Bid%5D=7&formato=xlsx"
+    assert "PHPSESSID=sessao-ok" in pedidos[0].headers["cookie"]
+    assert exp.sucessos == 1 and exp.fallbacks == 0
+    assert _sem_parciais(tmp_path)
+
+
+@pytest.mark.parametrize("resposta, motivo", [
+    (httpx.Response(302, headers={"Location": "/login"}), "HTTP 302"),
+    (httpx.Response(200, content=b"<html>login</html>"), "resposta não é um .xlsx"),
+    (httpx.Response(200, content=b""), "resposta vazia"),
+], ids=["redirect_login", "nao_xlsx", "vazia"])
+def test_resposta_inesperada_cai_na_interface(tmp_path, resposta, motivo):
+    exp = _exportador(lambda request: resposta, template=BASE + "?CltLoteSearch[id]={id}")
+    dest = tmp_path / "lote.xlsx"
+    assert _baixar(exp, 7, dest) is None
+    assert exp.fallbacks == 1 and exp.ultimo_erro == motivo
+    assert not dest.exists()
+    assert _sem_parciais(tmp_path)
+
+
+def test_erro_de_gravacao_limpa_parcial_e_cai_na_interface(tmp_path, monkeypatch):
+    exp = _exportador(lambda request: httpx.Response(200, content=XLSX), template=BASE + "?CltLoteSearch[id]={id}")
+
+    def sem_espaco(origem, destino):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(os, "replace", sem_espaco)
+    dest = tmp_path / "lote.xlsx"
+    assert _baixar(exp, 7, dest) is None
+    assert exp.fallbacks == 1 and exp.ultimo_erro.startswith("OSError")
+    assert not dest.exists()
+    assert _sem_parciais(tmp_path)
+
+
+def test_falha_de_conexao_cai_na_interface(tmp_path):
+    def handler(request):
+        raise httpx.ConnectError("recusada", request=request)
+
+    exp = _exportador(handler, template=BASE + "?CltLoteSearch[id]={id}")
+    assert _baixar(exp, 7, tmp_path / "lote.xlsx") is None
+    assert exp.ultimo_erro.startswith("ConnectError")
+    assert _sem_parciais(tmp_path)
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import data_service
+from app.services.data_service import hash_linhas, tratar_df, tratar_df_rapido
+
+
+def _export(prazo_outro):
+    return pd.DataFrame({
+        "CPF": ["111.111.111-11", "222.222.222-22"],
+        "Nome": ["Fulano", "Beltrano"],
+        "Data Nascimento": ["01/02/1980", "03/04/1990"],
+        "Valor Renda": [3500.5, 4200.0],
+        "Prazo Máximo": [24, prazo_outro],
+        "Qtd Empréstimos Ativos Suspensos": [1, 0],
+    })
+
+
+def _hash_por_cpf(df):
+    return dict(zip(df["cpf"], df["hash_linha"]))
+
+
+@pytest.mark.parametrize("tratar", [tratar_df, tratar_df_rapido])
+def test_hash_nao_depende_do_dtype_da_coluna(tratar):
+    # um NaN em outra linha faz o pandas ler "Prazo Máximo" como float64 (24 → 24.0)
+    inteiro, _ = tratar(_export(36))
+    com_nulo, _ = tratar(_export(np.nan))
+    assert _export(np.nan)["Prazo Máximo"].dtype == np.float64
+    assert _hash_por_cpf(inteiro)["11111111111"] == _hash_por_cpf(com_nulo)["11111111111"]
+    assert _hash_por_cpf(inteiro)["22222222222"] != _hash_por_cpf(com_nulo)["22222222222"]
+
+
+def test_hash_normaliza_numeros_e_datas():
+    a = pd.DataFrame({"cpf": ["1"], "renda": [24], "prazo_maximo_clt": [np.int64(12)],
+                      "data_criacao": [datetime(2024, 5, 1, 8, 30)]})
+    b = pd.DataFrame({"cpf": ["1"], "renda": [24.0], "prazo_maximo_clt": [12.0],
+                      "data_criacao": [pd.Timestamp("2024-05-01 08:30")]}).astype(object)
+    assert hash_linhas(a).tolist() == hash_linhas(b).tolist()
+    c = b.assign(renda=[24.5])
+    assert hash_linhas(a).tolist() != hash_linhas(c).tolist()
+
+
+def test_hash_igual_no_streaming_e_no_read_excel(tmp_path):
+    caminho = tmp_path / "lote.xlsx"
+    _export(np.nan).to_excel(caminho, index=False)
+
+    inteiro, _ = data_service.ler_e_tratar(caminho)
+    blocos = [tratar_df_rapido(bloco)[0] for bloco in data_service.ler_excel_em_chunks(caminho, chunk_rows=1)]
+    assert _hash_por_cpf(inteiro) == _hash_por_cpf(pd.concat(blocos))
@@ -0,0 +1,189 @@
+from contextlib import contextmanager
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from app.services import checkpoint_service as checkpoints
+from app.services import data_service
+
+
+class _Cursor:
+    def __init__(self, banco):
+        self.banco = banco
+
+    def execute(self, sql, params=()):
+        self._resultado = [(sum(1 for cpf in params if cpf in self.banco.linhas),)]
+
+    def fetchone(self):
+        return self._resultado[0]
+
+    def executemany(self, sql, valores):
+        if self.banco.falhar_no_chunk == self.banco.chunks:
+            raise RuntimeError("conexão perdida")
+        self.banco.chunks += 1
+        for v in valores:
+            self.banco.linhas[v[self.banco.coluna_cpf]] = v
+
+    def close(self):
+        pass
+
+
+class _Conexao:
+    def __init__(self, banco):
+        self.banco = banco
+        self.in_transaction = False
+
+    def cursor(self):
+        return _Cursor(self.banco)
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.in_transaction = False
+
+    def rollback(self):
+        self.in_transaction = False
+
+
+class _Banco:
+    def __init__(self, falhar_no_chunk=None):
+        self.linhas = {}
+        self.chunks = 0
+        self.falhar_no_chunk = falhar_no_chunk
+        self.coluna_cpf = 0
+
+    @contextmanager
+    def conexao(self, logger=None):
+        yield _Conexao(self)
+
+
+@pytest.fixture
+def checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_DIR", str(tmp_path / "checkpoints"))
+    arquivo = tmp_path / "lote.xlsx"
+    arquivo.write_bytes(b"export")
+    checkpoints.registrar_download(7, arquivo)
+    return 7
+
+
+def _df(n):
+    return pd.DataFrame({"cpf": [f"{i:011d}" for i in range(n)], "nome": [f"nome {i}" for i in range(n)]})
+
+
+def test_retoma_insercao_do_checkpoint(checkpoint, monkeypatch):
+    df = _df(10)
+    banco = _Banco(falhar_no_chunk=2)
+    monkeypatch.setattr(data_service, "db_conexao", banco.conexao)
+    ao_commit = lambda n: checkpoints.registrar_insercao(checkpoint, n)
+
+    r = data_service.inserir_mysql(df, chunk_size=3, ao_commit=ao_commit)
+    assert not r.get("ok")
+    assert "linhas já confirmadas: 6" in r["mensagem"]
+    confirmadas = checkpoints.carregar(checkpoint)["linhas_inseridas"]
+    assert confirmadas == 6
+    assert isinstance(confirmadas, int)
+
+    # nova tentativa: continua da linha confirmada, sem reenviar os chunks já gravados
+    banco.falhar_no_chunk = None
+    r = data_service.inserir_mysql(df, chunk_size=3, inicio=confirmadas, ao_commit=ao_commit)
+    assert r["ok"]
+    assert r["retomado_de"] == 6
+    assert r["enviados"] == 4
+    assert banco.chunks == 4
+    assert sorted(banco.linhas) == sorted(df["cpf"])
+    assert checkpoints.carregar(checkpoint)["linhas_inseridas"] == 10
+
+
+@pytest.mark.parametrize("inicio", [812345.6789, 10**9, -1, "6", True])
+def test_offset_invalido_insere_desde_o_inicio(inicio, monkeypatch):
+    # checkpoints antigos guardavam perf_counter() em linhas_inseridas: nunca pular linhas por isso
+    df = _df(10)
+    banco = _Banco()
+    monkeypatch.setattr(data_service, "db_conexao", banco.conexao)
+
+    r = data_service.inserir_mysql(df, chunk_size=3, inicio=inicio)
+    assert r["ok"]
+    assert r["retomado_de"] == 0
+    assert r["enviados"] == 10
+    assert sorted(banco.linhas) == sorted(df["cpf"])
+
+
+def test_inicio_valido():
+    assert data_service.inicio_valido(0, 10)
+    assert data_service.inicio_valido(10, 10)
+    assert not data_service.inicio_valido(11, 10)
+    assert not data_service.inicio_valido(6.0, 10)
+    assert not data_service.inicio_valido(None, 10)
+
+
+# streaming: CPFs 1 e 2 voltam no segundo bloco (a linha mais nova vence, como no drop_duplicates)
+CPFS_STREAM = ["1", "2", "3", "1", "4", "2", "5"]
+
+
+@pytest.fixture
+def excel_stream(tmp_path):
+    caminho = tmp_path / "export.xlsx"
+    pd.DataFrame({"CPF": CPFS_STREAM, "Nome": [f"nome {i}" for i in range(len(CPFS_STREAM))]}).to_excel(caminho, index=False)
+    return caminho
+
+
+def _banco_tratado(monkeypatch, **kw):
+    banco = _Banco(**kw)
+    banco.coluna_cpf = data_service.EXPECTED_COLS.index("cpf")
+    monkeypatch.setattr(data_service, "db_conexao", banco.conexao)
+    return banco
+
+
+def _nomes(banco):
+    idx = data_service.EXPECTED_COLS.index("nome")
+    return {cpf: v[idx] for cpf, v in banco.linhas.items()}
+
+
+def test_streaming_conta_repetidos_como_ignorados(excel_stream, monkeypatch):
+    memoria = _banco_tratado(monkeypatch)
+    df, _ = data_service.tratar_df(pd.read_excel(excel_stream))
+    esperado = data_service.inserir_mysql(df)
+
+    banco = _banco_tratado(monkeypatch)
+    meta, r = data_service.processar_excel_em_chunks(excel_stream, chunk_rows=3)
+    assert r["ok"]
+    assert (r["novos"], r["atualizados"]) == (esperado["novos"], esperado["atualizados"]) == (5, 0)
+    assert r["ignorados"] == 2
+    assert meta["linhas_tratadas"] == len(df) == 5
+    assert _nomes(banco) == _nomes(memoria)
+
+
+def test_streaming_retoma_do_checkpoint(excel_stream, checkpoint, monkeypatch):
+    # o 2º commit cai no meio do primeiro bloco
+    banco = _banco_tratado(monkeypatch, falhar_no_chunk=1)
+    inserir = partial(data_service.inserir_mysql, chunk_size=2)
+    ao_commit = lambda n: checkpoints.registrar_insercao(checkpoint, n)
+
+    _, r = data_service.processar_excel_em_chunks(excel_stream, chunk_rows=3, inserir=inserir, ao_commit=ao_commit)
+    assert not r.get("ok")
+    confirmadas = checkpoints.carregar(checkpoint)["linhas_inseridas"]
+    assert confirmadas == 2
+
+    # nova tentativa: nenhuma linha antes do offset é reenviada
+    banco.falhar_no_chunk = None
+    _, r = data_service.processar_excel_em_chunks(excel_stream, chunk_rows=3, inserir=inserir,
+                                                  inicio=confirmadas, ao_commit=ao_commit)
+    assert r["ok"]
+    assert r["retomado_de"] == 2
+    assert r["enviados"] == 5
+    assert banco.chunks == 5
+    assert checkpoints.carregar(checkpoint)["linhas_inseridas"] == 7
+    assert _nomes(banco) == {"00000000001": "nome 3", "00000000002": "nome 5", "00000000003": "nome 2",
+                             "00000000004": "nome 4", "00000000005": "nome 6"}
+
+
+@pytest.mark.parametrize("inicio", [812345.6789, 10**9, -3])
+def test_streaming_offset_invalido_insere_tudo(excel_stream, monkeypatch, inicio):
+    banco = _banco_tratado(monkeypatch)
+    _, r = data_service.processar_excel_em_chunks(excel_stream, chunk_rows=3, inicio=inicio)
+    assert r["ok"]
+    assert r["retomado_de"] == 0
+    assert r["enviados"] == 7
+    assert len(banco.linhas) == 5
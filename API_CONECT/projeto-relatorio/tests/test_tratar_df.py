@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from app.services.data_service import tratar_df, tratar_df_rapido
+from benchmarks.sintetico import gerar_df_bruto
+
+
+def _entrada(cpfs):
+    """Export fixo com a sujeira dos arquivos reais (golden: saída esperada abaixo)"""
+    n = len(cpfs)
+    return pd.DataFrame({
+        "Lote": [1] * n,
+        "CPF": cpfs,
+        "Nome": ["Ana", "Bruno", "", "Diego", "nan", "Fábio"][:n],
+        "Data Nascimento": ["31/01/1980", None, "05/06/1990", datetime(1975, 3, 4), "data ruim", "31/01/1980"][:n],
+        "Valor Renda": [1500.5, 1e12, np.nan, 2000.0, 10.0, 99999999.99][:n],
+        "Elegível": [True, "False", None, False, "True", True][:n],
+        "Sexo": ["M", "None", "F", "NaN", "M", "F"][:n],
+        "Empréstimos Legados": [0, 1, 2, 3, 0, 1][:n],
+    })
+
+
+CPFS = ["123.456.789-01", 98765432100, "", "nan", "00000000000", "123.456.789-01"]
+
+
+def _tratar(motor, bruto):
+    df, meta = motor(bruto.copy())
+    assert meta, df
+    return df, meta
+
+
+def test_golden_tratar_df():
+    df, meta = _tratar(tratar_df, _entrada(pd.Series(CPFS, dtype=object)))
+    assert meta == {"linhas_excel": 6, "linhas_tratadas": 2, "cpfs_dedup": 1}
+    assert df["cpf"].tolist() == ["98765432100", "12345678901"]
+    assert df["nome"].tolist() == ["Bruno", "Fábio"]
+    assert df["nascimento"].tolist() == [None, date(1980, 1, 31)]
+    assert df["renda"].tolist() == [None, 99999999.99]
+    assert df["elegivel_clt"].tolist() == [0, 1]
+    assert df["sexo"].tolist() == [None, "F"]
+    assert df["matricula"].tolist() == [None, None]
+    assert df["hash_linha"].str.fullmatch(r"[0-9a-f]{16}").all()
+
+
+@pytest.mark.parametrize("cpfs", [
+    pd.Series(CPFS, dtype=object),
+    pd.Series([12345678901, 98765432100, 0, 1, 5, 12345678901], dtype="int64"),
+    pd.Series([12345678901, 98765432100, pd.NA, 1, pd.NA, 12345678901], dtype="Int64"),
+    pd.Series([12345678901, 98765432100, 0, 1, 5, 12345678901], dtype="Int64"),
+    pd.Series([12345678901.0, 98765432100.0, np.nan, 1.0, np.nan, 12345678901.0], dtype="float64"),
+], ids=["texto", "int64", "Int64_com_NA", "Int64", "float64_com_NaN"])
+def test_rapido_igual_ao_original(cpfs):
+    esperado, meta_esperada = _tratar(tratar_df, _entrada(cpfs))
+    obtido, meta_obtida = _tratar(tratar_df_rapido, _entrada(cpfs))
+    assert_frame_equal(obtido, esperado)
+    assert meta_obtida == meta_esperada
+
+
+@pytest.mark.parametrize("cpf_numerico", [False, True])
+def test_rapido_igual_ao_original_sintetico(cpf_numerico):
+    bruto = gerar_df_bruto(2000, seed=7, cpf_numerico=cpf_numerico)
+    esperado, meta_esperada = _tratar(tratar_df, bruto)
+    obtido, meta_obtida = _tratar(tratar_df_rapido, bruto)
+    assert_frame_equal(obtido, esperado)
+    assert meta_obtida == meta_esperada